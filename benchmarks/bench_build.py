@@ -0,0 +1,93 @@
+"""Benchmark building a fixture project with every conda build backend.
+
+Builds offline against a local channel, which must provide `python`, `pip` and
+`setuptools` (e.g. a directory indexed with `conda index`):
+
+    python benchmarks/bench_build.py --channel ~/conda-channel
+    python benchmarks/bench_build.py --channel ~/conda-channel --backend boa
+
+Backends which aren't installed are skipped.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from textwrap import dedent
+
+from eq.devtools.conda import build_package
+from eq.devtools.conda._build import BACKENDS
+
+
+PYPROJECT = """
+[build-system]
+requires = ["setuptools"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "bench-fixture"
+version = "0.1.0"
+description = "A fixture project to benchmark conda builds."
+license = {file = "LICENSE"}
+urls = {repository = "https://github.com/energy-quants/eq-devtools"}
+
+[tool.setuptools]
+packages = ["bench_fixture"]
+"""
+
+
+def make_project(path: Path) -> None:
+    (path / "pyproject.toml").write_text(dedent(PYPROJECT).lstrip())
+    (path / "LICENSE").write_text("MIT\n")
+    (path / "bench_fixture").mkdir()
+    (path / "bench_fixture" / "__init__.py").write_text("VALUE = 42\n")
+    requirements = path / "requirements.d" / "pypi"
+    requirements.mkdir(parents=True)
+    (requirements / "host.txt").write_text("python\npip\nsetuptools\n")
+    (requirements / "run.txt").write_text("python\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channel", type=Path, required=True)
+    parser.add_argument("--backend", choices=BACKENDS, nargs="+", default=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    channel = args.channel.expanduser().resolve().as_uri()
+    # conda (for boa) shouldn't reach out to any other channel
+    os.environ["CONDA_OFFLINE"] = "true"
+    print(f"{'backend':>14} {'seconds':>8} {'speedup':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp) / "project"
+        project.mkdir()
+        make_project(project)
+        os.chdir(project)
+        for name in args.backend:
+            if shutil.which(BACKENDS[name].executable) is None:
+                print(f"{name:>14} {'skipped, not installed':>17}")
+                continue
+            elapsed = []
+            for idx in range(args.repeat):
+                start = time.perf_counter()
+                build_package(
+                    version="0.1.0",
+                    output_path=Path(tmp) / name / f"dist-{idx}",
+                    work_path=Path(tmp) / name / f"work-{idx}",
+                    debug=False,
+                    use_cache=False,
+                    backend=name,
+                    channels=[channel],
+                    log_prefix=f"[{name}] ",
+                )
+                elapsed.append(time.perf_counter() - start)
+            best = min(elapsed)
+            baseline = baseline or best
+            print(f"{name:>14} {best:>8.1f} {baseline / best:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
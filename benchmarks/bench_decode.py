@@ -0,0 +1,91 @@
+"""Benchmark decoding package version listings with full and lean models.
+
+Decodes a synthetic listing, split into pages as returned by the API:
+
+    python benchmarks/bench_decode.py --versions 100000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+
+import msgspec
+
+from eq.devtools.github.api import (
+    PackageVersion,
+    PackageVersionSummary,
+    version_projection,
+)
+from eq.devtools.testing import FakeGitHub
+
+
+def make_pages(num_versions: int, per_page: int = 100) -> list[bytes]:
+    github = FakeGitHub()
+    github.add_package(
+        "energy-quants",
+        "conda/eq-devtools",
+        num_versions=num_versions,
+        tags={idx: ["latest"] for idx in range(0, num_versions, 1000)},
+    )
+    versions = github.versions["energy-quants", "conda/eq-devtools"]
+    return [
+        msgspec.json.encode(versions[start : start + per_page])
+        for start in range(0, len(versions), per_page)
+    ]
+
+
+def decoders() -> dict[str, Callable[[bytes], list]]:
+    projection = list[version_projection("id", "tags", "updated_at")]
+    return {
+        "PackageVersion (decode)": lambda page: msgspec.json.decode(
+            page, type=list[PackageVersion]
+        ),
+        "PackageVersion (Decoder)": msgspec.json.Decoder(list[PackageVersion]).decode,
+        "PackageVersionSummary": msgspec.json.Decoder(
+            list[PackageVersionSummary]
+        ).decode,
+        "id,tags,updated_at": msgspec.json.Decoder(projection).decode,
+    }
+
+
+def decode_all(decode: Callable[[bytes], list], pages: list[bytes]) -> list:
+    res = []
+    for page in pages:
+        res.extend(decode(page))
+    return res
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = make_pages(args.versions)
+    size = sum(map(len, pages)) / 2**20
+    print(f"{args.versions} versions in {len(pages)} pages ({size:.1f} MiB)")
+    print(f"{'model':>26} {'seconds':>8} {'peak MiB':>9} {'speedup':>8}")
+    baseline = None
+    for name, decode in decoders().items():
+        elapsed = []
+        for _ in range(args.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            res = decode_all(decode, pages)
+            elapsed.append(time.perf_counter() - start)
+            del res
+        gc.collect()
+        tracemalloc.start()
+        res = decode_all(decode, pages)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del res
+        best = min(elapsed)
+        baseline = baseline or best
+        print(f"{name:>26} {best:>8.3f} {peak / 2**20:>9.1f} {baseline / best:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark mirroring a package with blob mounting vs copying the blobs.
+
+Runs fully offline against a local `FakeGitHub` and `FakeRegistry` server:
+
+    python benchmarks/bench_mirror.py --tags 50 --size-mib 4
+"""
+
+import argparse
+import time
+
+import trio
+
+from eq.devtools.github import packages as pkgs
+from eq.devtools.github.client import Session
+from eq.devtools.testing import (
+    FakeGitHub,
+    FakeRegistry,
+)
+
+
+SOURCE = "staging"
+PACKAGE = "conda/eq-devtools"
+
+
+async def mirror(
+    github: FakeGitHub,
+    registry: FakeRegistry,
+    to_owner: str,
+    max_parallel: int,
+) -> list[pkgs.MirrorResult]:
+    async with Session(
+        github_user="bench",
+        github_token="bench",
+        base_url=github.url,
+    ):
+        return await pkgs.mirror_package(
+            SOURCE,
+            PACKAGE,
+            to_owner=to_owner,
+            registry_url=registry.url,
+            max_parallel=max_parallel,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--size-mib", type=float, default=4)
+    parser.add_argument("--parallel", type=int, default=8)
+    args = parser.parse_args()
+
+    tags = [f"1.{idx}" for idx in range(args.tags)]
+    size = int(args.size_mib * 2**20)
+    print(
+        f"{'mode':>6} {'tags':>5} {'mounted':>8} {'copied':>7} "
+        f"{'seconds':>8} {'MiB/s':>8}"
+    )
+    for mode in ("mount", "copy"):
+        with FakeGitHub() as github, FakeRegistry(mount=mode == "mount") as registry:
+            github.add_package(
+                SOURCE,
+                PACKAGE,
+                num_versions=len(tags),
+                tags={idx: [tag] for idx, tag in enumerate(tags)},
+            )
+            for tag in tags:
+                content = tag.encode().ljust(size, b"\0")
+                registry.add_artifact(f"{SOURCE}/{PACKAGE}", tag, content)
+
+            start = time.perf_counter()
+            results = trio.run(mirror, github, registry, "prod", args.parallel)
+            elapsed = time.perf_counter() - start
+            assert all(result.ok for result in results), results
+            mounted = sum(result.mounted for result in results)
+            copied = sum(result.copied for result in results)
+            rate = len(tags) * size / 2**20 / elapsed
+            print(
+                f"{mode:>6} {len(results):>5d} {mounted:>8d} {copied:>7d} "
+                f"{elapsed:>8.2f} {rate:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark listing package versions with sequential vs concurrent pagination.
+
+Runs fully offline against a local `FakeGitHub` server:
+
+    python benchmarks/bench_pagination.py --versions 20000 --latency 0.05
+"""
+
+import argparse
+import time
+
+import trio
+
+from eq.devtools.github import packages as pkgs
+from eq.devtools.github.client import Session
+from eq.devtools.testing import FakeGitHub
+
+
+OWNER = "energy-quants"
+PACKAGE = "conda/eq-devtools"
+
+
+async def list_versions(github: FakeGitHub, max_parallel_pages: int) -> int:
+    async with Session(
+        github_user="bench",
+        github_token="bench",
+        base_url=github.url,
+    ) as session:
+        versions = await pkgs.list_package_versions(
+            OWNER,
+            PACKAGE,
+            session=session,
+            max_parallel_pages=max_parallel_pages,
+        )
+    return len(versions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--parallel", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with FakeGitHub(latency=args.latency) as github:
+        github.add_package(OWNER, PACKAGE, num_versions=args.versions)
+        print(
+            f"{'max_parallel_pages':>18} {'versions':>9} {'seconds':>8} {'speedup':>8}"
+        )
+        baseline = None
+        for max_parallel_pages in args.parallel:
+            start = time.perf_counter()
+            num_versions = trio.run(list_versions, github, max_parallel_pages)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{max_parallel_pages:>18d} {num_versions:>9d} "
+                f"{elapsed:>8.2f} {baseline / elapsed:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Run the GitHub client benchmark suite and compare it against a baseline.
+
+Runs fully offline against a local `FakeGitHub` server:
+
+    python benchmarks/suite.py --save-baseline
+    python benchmarks/suite.py --scale small large
+
+Every benchmark is timed (best of `--repeat` runs) and its peak traced memory is
+measured in a separate run. Results which are slower, or use more memory, than
+the baseline by more than `--threshold` are flagged as regressions, in which case
+the exit status is 1.
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import (
+    Awaitable,
+    Callable,
+)
+from contextlib import ExitStack
+from dataclasses import (
+    asdict,
+    dataclass,
+)
+from pathlib import Path
+
+import msgspec
+import trio
+
+from eq.devtools.github import packages as pkgs
+from eq.devtools.github.api import (
+    PackageVersion,
+    PackageVersionSummary,
+)
+from eq.devtools.github.client import Session
+from eq.devtools.testing import FakeGitHub
+
+
+OWNER = "energy-quants"
+PACKAGE = "conda/eq-devtools"
+
+SCALES = {"small": 1, "large": 10}
+
+DEFAULT_BASELINE = Path(".build/benchmarks/baseline.json")
+
+
+@dataclass
+class Result:
+    name: str
+    size: int
+    seconds: float
+    peak_mib: float
+    requests: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]"
+
+    @property
+    def throughput(self) -> float:
+        return self.size / self.seconds
+
+
+@dataclass
+class Benchmark:
+    """A benchmark of an async operation against a fresh fake server.
+
+    `setup` prepares the server for `size` items before every run, and `run`
+    performs the measured operation within an open session. `offline`
+    benchmarks run without a server (or session).
+    """
+
+    name: str
+    size: int
+    run: Callable[[int], Awaitable[object]]
+    setup: Callable[[FakeGitHub | None, int], None] | None = None
+    offline: bool = False
+
+
+def add_versions(github: FakeGitHub, size: int) -> None:
+    github.add_package(
+        OWNER,
+        PACKAGE,
+        num_versions=size,
+        tags={idx: ["latest"] for idx in range(0, size, 100)},
+    )
+
+
+def add_packages(github: FakeGitHub, size: int) -> None:
+    for idx in range(size):
+        github.add_package(OWNER, f"conda/package-{idx}")
+
+
+async def list_packages(size: int) -> None:
+    packages = await pkgs.list_packages(OWNER)
+    assert len(packages) == size
+
+
+async def list_package_versions(size: int) -> None:
+    versions = await pkgs.list_package_versions(OWNER, PACKAGE)
+    assert len(versions) == size
+
+
+async def delete_package_versions(size: int) -> None:
+    versions = await pkgs.list_package_versions(OWNER, PACKAGE)
+    results = await pkgs.delete_package_versions(*versions, max_parallel=30)
+    assert len(results) == size
+
+
+async def cleanup_package_versions(size: int) -> None:
+    results = await pkgs.cleanup_package_versions(OWNER, PACKAGE, max_age=-1)
+    assert len(results) == size - len(range(0, size, 100))
+
+
+_pages: dict[int, list[bytes]] = {}
+
+
+def encode_pages(github: None, size: int) -> None:
+    # encode the pages of a listing once, outside of the measured runs
+    if size not in _pages:
+        fake = FakeGitHub()
+        add_versions(fake, size)
+        versions = fake.versions[OWNER, PACKAGE]
+        _pages[size] = [
+            msgspec.json.encode(versions[start : start + 100])
+            for start in range(0, size, 100)
+        ]
+
+
+def decoder(model: type) -> Callable[[int], Awaitable[None]]:
+    decoder = msgspec.json.Decoder(list[model])
+
+    async def decode(size: int) -> None:
+        versions = []
+        for page in _pages[size]:
+            versions.extend(decoder.decode(page))
+        assert len(versions) == size
+
+    return decode
+
+
+def benchmarks(scale: int) -> list[Benchmark]:
+    return [
+        Benchmark("list_packages", 200 * scale, list_packages, add_packages),
+        Benchmark(
+            "list_package_versions",
+            2000 * scale,
+            list_package_versions,
+            add_versions,
+        ),
+        Benchmark(
+            "decode[PackageVersion]",
+            10_000 * scale,
+            decoder(PackageVersion),
+            encode_pages,
+            offline=True,
+        ),
+        Benchmark(
+            "decode[PackageVersionSummary]",
+            10_000 * scale,
+            decoder(PackageVersionSummary),
+            encode_pages,
+            offline=True,
+        ),
+        Benchmark(
+            "delete_package_versions",
+            200 * scale,
+            delete_package_versions,
+            add_versions,
+        ),
+        Benchmark(
+            "cleanup_package_versions",
+            200 * scale,
+            cleanup_package_versions,
+            add_versions,
+        ),
+    ]
+
+
+def run_once(
+    github: FakeGitHub | None,
+    benchmark: Benchmark,
+    *,
+    trace_memory: bool,
+) -> tuple[float, float, int]:
+    if benchmark.setup is not None:
+        benchmark.setup(github, benchmark.size)
+    if github is not None:
+        github.requests.clear()
+
+    async def main():
+        if github is None:
+            await benchmark.run(benchmark.size)
+            return
+        async with Session(
+            github_user="bench",
+            github_token="bench",
+            base_url=github.url,
+        ):
+            await benchmark.run(benchmark.size)
+
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    trio.run(main)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        # includes the allocations of the in-process fake server
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    requests = 0 if github is None else len(github.requests)
+    return elapsed, peak / 2**20, requests
+
+
+def run(benchmark: Benchmark, *, latency: float, repeat: int) -> Result:
+    with ExitStack() as stack:
+        github = None
+        if not benchmark.offline:
+            github = stack.enter_context(FakeGitHub(latency=latency))
+        timings = [
+            run_once(github, benchmark, trace_memory=False) for _ in range(repeat)
+        ]
+        _, peak_mib, _ = run_once(github, benchmark, trace_memory=True)
+    seconds, _, requests = min(timings)
+    return Result(benchmark.name, benchmark.size, seconds, peak_mib, requests)
+
+
+def compare(
+    results: list[Result],
+    baseline: dict[str, dict],
+    *,
+    threshold: float,
+) -> dict[str, list[str]]:
+    regressions = {}
+    for result in results:
+        if (base := baseline.get(result.key)) is None:
+            continue
+        flags = []
+        if result.seconds > base["seconds"] * (1 + threshold):
+            flags.append(f"time {result.seconds / base['seconds'] - 1:+.0%}")
+        if result.peak_mib > base["peak_mib"] * (1 + threshold):
+            flags.append(f"memory {result.peak_mib / base['peak_mib'] - 1:+.0%}")
+        if flags:
+            regressions[result.key] = flags
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, nargs="+", default=["small"])
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", type=str, default="", help="A name substring.")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--output", type=Path, help="A JSON file for the results.")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+
+    print(
+        f"{'benchmark':>36} {'seconds':>8} {'items/s':>10} {'peak MiB':>9} "
+        f"{'requests':>8} {'vs baseline':>11}"
+    )
+    results = []
+    for scale in args.scale:
+        for benchmark in benchmarks(SCALES[scale]):
+            if args.filter not in benchmark.name:
+                continue
+            result = run(benchmark, latency=args.latency, repeat=args.repeat)
+            results.append(result)
+            base = baseline.get(result.key)
+            change = f"{result.seconds / base['seconds'] - 1:+.0%}" if base else ""
+            print(
+                f"{result.key:>36} {result.seconds:>8.3f} "
+                f"{result.throughput:>10.0f} {result.peak_mib:>9.1f} "
+                f"{result.requests:>8d} {change:>11}"
+            )
+
+    records = {result.key: asdict(result) for result in results}
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(records, indent=2))
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(records, indent=2))
+        print(f"Saved the baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, threshold=args.threshold)
+    for key, flags in regressions.items():
+        print(f"REGRESSION {key}: {', '.join(flags)}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
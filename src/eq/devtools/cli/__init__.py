@@ -1,9 +1,9 @@
+from pathlib import Path
+
 import click
 
 from .. import __version__
-from ._test import test
-from .conda import conda
-from .github import github
+from ._lazy import LazyGroup
 
 
 __all__ = ("cli",)
@@ -12,12 +12,53 @@ __all__ = ("cli",)
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
-@click.group(context_settings=CONTEXT_SETTINGS)
+# the subcommands are only imported when they're invoked, to keep startup fast
+@click.group(
+    cls=LazyGroup,
+    context_settings=CONTEXT_SETTINGS,
+    lazy_subcommands={
+        "conda": "eq.devtools.cli.conda:conda",
+        "github": "eq.devtools.cli.github:github",
+        "test": "eq.devtools.cli._test:test",
+    },
+)
 @click.version_option(version=__version__)
-def cli():
-    pass
+@click.option(
+    "--profile",
+    is_flag=True,
+    help=(
+        "Whether to print a summary of the GitHub API requests (latency "
+        "percentiles, throughput and time waiting on rate limits) to stderr."
+    ),
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help=(
+        "A file to write a Chrome trace of the GitHub API requests and trio tasks "
+        "to, which can be opened in https://ui.perfetto.dev."
+    ),
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, trace: Path | None):
+    if not profile and trace is None:
+        return
+    # only import the tracer (and trio) when it's needed
+    from eq.devtools.github.tracing import (
+        set_tracer,
+        Tracer,
+    )
+
+    tracer = Tracer()
+    set_tracer(tracer)
 
+    def report() -> None:
+        set_tracer(None)
+        if profile:
+            click.echo(str(tracer.summary()), err=True)
+        if trace is not None:
+            tracer.write_chrome_trace(trace)
+            click.echo(f"Wrote the trace to {trace}", err=True)
 
-cli.add_command(test)
-cli.add_command(conda)
-cli.add_command(github)
+    ctx.call_on_close(report)
@@ -0,0 +1,43 @@
+import importlib
+
+import click
+
+
+__all__ = ("LazyGroup",)
+
+
+class LazyGroup(click.Group):
+    """A click group which only imports its subcommands when they're used.
+
+    Parameters
+    ----------
+    lazy_subcommands : dict[str, str]
+        Maps the names of the subcommands to their import paths, e.g.
+        `{"conda": "eq.devtools.cli.conda:conda"}`.
+
+    """
+
+    def __init__(
+        self,
+        *args,
+        lazy_subcommands: dict[str, str] | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_subcommands})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in self.lazy_subcommands:
+            return self._load(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        module_name, attr = self.lazy_subcommands[cmd_name].split(":")
+        command = getattr(importlib.import_module(module_name), attr)
+        if not isinstance(command, click.Command):
+            msg = f"{self.lazy_subcommands[cmd_name]!r} is not a click command"
+            raise TypeError(msg)
+        return command
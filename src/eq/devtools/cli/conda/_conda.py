@@ -1,13 +1,8 @@
+from pathlib import Path
 from typing import Optional
 
 import click
 
-from eq.devtools.conda import (
-    build_package,
-    publish_oci_artifact,
-    render_recipe,
-)
-
 
 __all__ = ("conda",)
 
@@ -17,6 +12,15 @@ def conda():
     pass
 
 
+def _parse_matrix(specs: tuple[str, ...]) -> list:
+    from eq.devtools.conda import parse_matrix
+
+    try:
+        return parse_matrix(specs)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="'--matrix'") from exc
+
+
 @conda.command(name="render")
 @click.option(
     "--version",
@@ -32,34 +36,97 @@ def conda():
 )
 @click.option(
     "--pyproject-file",
+    "pyproject_files",
     type=str,
-    default="./pyproject.toml",
-    help="The filepath of the `pyproject.toml` file",
+    multiple=True,
+    help=(
+        "The filepath of the `pyproject.toml` file. May be given several times "
+        "to render the recipes of several projects in parallel. "
+        "[default: ./pyproject.toml]"
+    ),
+)
+@click.option(
+    "--workspace",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help=(
+        "Render the recipes of all of the projects under this directory, i.e. "
+        "of every `pyproject.toml` file with a `[project]` table."
+    ),
 )
 @click.option(
     "--output-path",
     type=str,
     default="./.build/conda/recipe/recipe.yaml",
+    help=(
+        "The recipe file to write. With several projects, it's relative to the "
+        "directory of each of them."
+    ),
 )
 @click.option(
+    "--show/--no-show",
     "--debug/--no-debug",
-    default=True,
+    "show",
+    default=False,
+    help="Whether to print the rendered recipes (with `bat`).",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["boa", "rattler-build"]),
+    default="boa",
+    help="The tool the recipe is for.",
+)
+@click.option(
+    "--max-workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="The maximum number of recipes to render at the same time.",
 )
 def render(
     version: str,
     build_num: int,
-    pyproject_file: str,
+    pyproject_files: tuple[str, ...],
+    workspace: str | None,
     output_path: str,
-    debug: bool,
+    show: bool,
+    backend: str,
+    max_workers: int | None,
 ) -> None:
-    """Renders a Conda recipe from a `pyproject.toml` file."""
-    render_recipe(
+    """Renders Conda recipes from `pyproject.toml` files."""
+    from eq.devtools.conda import (
+        find_pyproject_files,
+        render_recipe,
+        render_recipes,
+    )
+
+    files = [Path(path) for path in pyproject_files]
+    if workspace is not None:
+        if not (found := find_pyproject_files(workspace)):
+            msg = f"No projects found in {workspace!r}."
+            raise click.BadParameter(msg, param_hint="'--workspace'")
+        files += found
+    if workspace is None and len(files) <= 1:
+        render_recipe(
+            version=version,
+            build_number=build_num,
+            pyproject_file=files[0] if files else "./pyproject.toml",
+            output_path=output_path,
+            show=show,
+            backend=backend,
+        )
+        return
+
+    recipe_files = render_recipes(
+        dict.fromkeys(files),
         version=version,
         build_number=build_num,
-        pyproject_file=pyproject_file,
         output_path=output_path,
-        debug=debug,
+        show=show,
+        backend=backend,
+        max_workers=max_workers,
     )
+    for recipe_file in recipe_files:
+        click.echo(recipe_file.as_posix())
 
 
 @conda.command(name="build")
@@ -81,26 +148,140 @@ def render(
 )
 @click.option(
     "--debug/--no-debug",
+    default=False,
+    help="Whether to print the rendered recipe (with `bat`).",
+)
+@click.option(
+    "--cache/--no-cache",
     default=True,
+    help=(
+        "Whether to skip the build if the package was already built from the "
+        "same sources, recipe, version and build number."
+    ),
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    default=None,
+    help=(
+        "The directory built packages are cached in. Defaults to "
+        "`~/.cache/eq-devtools/conda`."
+    ),
+)
+@click.option(
+    "--matrix",
+    type=str,
+    multiple=True,
+    help=(
+        "Build a variant for every combination of the values of the keys, e.g. "
+        "`--matrix python=3.11,3.12 --matrix build_number=0`. The variants are "
+        "built in parallel, each into its own directory under the output path."
+    ),
+)
+@click.option(
+    "--max-parallel-builds",
+    type=click.IntRange(min=1),
+    default=None,
+    help="The maximum number of variants to build at once, the CPUs by default.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["boa", "rattler-build"]),
+    default="boa",
+    help="The tool to build the package with.",
+)
+@click.option(
+    "-c",
+    "--channel",
+    "channels",
+    type=str,
+    multiple=True,
+    help=(
+        "A channel to fetch the dependencies from, e.g. a local directory. By "
+        "default the channels configured for the backend are used."
+    ),
+)
+@click.option(
+    "--log-level",
+    type=click.Choice(["quiet", "progress", "full"]),
+    default="progress",
+    help=(
+        "How much of the output of the build tools to show: only the last lines "
+        "on failure, a progress line as well, or all of it. The whole output is "
+        "always written to `./.build/conda/logs`."
+    ),
 )
 def build(
     recipe_file,
     build_num,
     output_path,
     debug,
+    cache,
+    cache_dir,
+    matrix,
+    max_parallel_builds,
+    backend,
+    channels,
+    log_level,
 ) -> None:
     """Build a conda package for the current project."""
+    if matrix:
+        from eq.devtools.conda import (
+            build_matrix,
+            format_summary,
+        )
+
+        if recipe_file is not None:
+            msg = "A `--recipe-file` can't be used with a `--matrix`."
+            raise click.UsageError(msg)
+        results = build_matrix(
+            _parse_matrix(matrix),
+            output_path=output_path,
+            max_workers=max_parallel_builds,
+            debug=debug,
+            use_cache=cache,
+            cache_dir=cache_dir,
+            backend=backend,
+            channels=channels,
+            log_level=log_level,
+        )
+        click.echo(format_summary(results))
+        if failed := [result.variant.name for result in results if result.error]:
+            raise click.ClickException(f"Failed to build {', '.join(failed)}.")
+        return
+
+    from eq.devtools.conda import build_package
+
     build_package(
         build_number=build_num,
         recipe_file=recipe_file,
         output_path=output_path,
         debug=debug,
+        use_cache=cache,
+        cache_dir=cache_dir,
+        backend=backend,
+        channels=channels,
+        log_level=log_level,
     )
 
 
 @conda.command(name="publish")
 @click.option(
-    "--filepath", type=str, help="The filepath to the `.conda` package to publish."
+    "--filepath",
+    "filepaths",
+    type=str,
+    multiple=True,
+    required=True,
+    help=(
+        "The `.conda` package to publish, or a directory or glob of packages, "
+        "e.g. `.build/conda/dist/**/*.conda`. May be given several times."
+    ),
+)
+@click.option(
+    "--max-parallel",
+    type=click.IntRange(min=1),
+    default=4,
+    help="The maximum number of packages to upload at the same time.",
 )
 @click.option(
     "--owner",
@@ -118,7 +299,7 @@ def build(
     "--verbose",
     is_flag=True,
     default=False,
-    help="A flag to enable verbose output for the `powerloader` command.",
+    help="A flag to print the progress of every uploaded chunk.",
 )
 @click.option(
     "--token",
@@ -134,20 +315,258 @@ def build(
     is_flag=True,
     default=False,
 )
+@click.option(
+    "--log-level",
+    type=click.Choice(["quiet", "progress", "full"]),
+    default="progress",
+    help=(
+        "How much progress to show: none, a line per package, or a line per "
+        "uploaded chunk as well."
+    ),
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help=(
+        "Upload the packages even if their tag already has the same content, "
+        "which is skipped by default."
+    ),
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="The size (in MiB) of the chunks to upload.",
+)
 def publish(
-    filepath,
+    filepaths,
+    max_parallel,
     owner,
     tag,
     verbose,
     token,
     debug,
+    log_level,
+    force,
+    chunk_size,
 ) -> None:
-    """Publish a conda package as an OCI artifact to `ghcr.io`."""
-    publish_oci_artifact(
-        filepath=filepath,
+    """Publish conda packages as OCI artifacts to `ghcr.io`."""
+    from eq.devtools.conda import (
+        find_packages,
+        format_publish_summary,
+        publish_oci_artifacts,
+    )
+
+    try:
+        packages = find_packages(*filepaths)
+    except FileNotFoundError as exc:
+        raise click.BadParameter(str(exc), param_hint="'--filepath'") from exc
+    if not packages:
+        raise click.BadParameter("No packages found.", param_hint="'--filepath'")
+    results = publish_oci_artifacts(
+        packages,
         owner=owner,
+        max_parallel=max_parallel,
         tag=tag,
         verbose=verbose,
         token=token,
         debug=debug,
+        log_level=log_level,
+        force=force,
+        chunk_size=chunk_size * 2**20,
+    )
+    click.echo(format_publish_summary(results))
+    if failed := [result.path.name for result in results if result.error]:
+        raise click.ClickException(f"Failed to publish {', '.join(failed)}.")
+
+
+@conda.command(name="release")
+@click.option(
+    "--owner",
+    type=str,
+    required=True,
+    help="The GitHub user or organisation to publish the packages to.",
+)
+@click.option(
+    "--build-num",
+    type=int,
+    default=0,
+    help="The build number of the package.",
+)
+@click.option(
+    "--pyproject-file",
+    type=str,
+    default="./pyproject.toml",
+    help="The filepath of the `pyproject.toml` file",
+)
+@click.option(
+    "--output-path",
+    type=str,
+    default="./.build/conda/dist",
+)
+@click.option(
+    "--tag",
+    type=str,
+    default=None,
+    help="An optional tag to use instead of the package version.",
+)
+@click.option(
+    "--token",
+    type=Optional[str],
+    default=None,
+    help=(
+        "The GitHub token to use. "
+        "If not specified, the `GITHUB_TOKEN` env var will be used."
+    ),
+)
+@click.option(
+    "--publish/--no-publish",
+    default=True,
+    help="Whether to publish the built packages.",
+)
+@click.option(
+    "--max-parallel-uploads",
+    type=click.IntRange(min=1),
+    default=4,
+    help="The maximum number of packages to upload at the same time.",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help=(
+        "Whether to skip the build if the package was already built from the "
+        "same sources, recipe, version and build number."
+    ),
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    default=None,
+    help=(
+        "The directory built packages are cached in. Defaults to "
+        "`~/.cache/eq-devtools/conda`."
+    ),
+)
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    default=False,
+    help="A flag to print the progress of every uploaded chunk.",
+)
+@click.option(
+    "--debug/--no-debug",
+    default=False,
+)
+@click.option(
+    "--matrix",
+    type=str,
+    multiple=True,
+    help=(
+        "Build a variant for every combination of the values of the keys, e.g. "
+        "`--matrix python=3.11,3.12 --matrix build_number=0`. The variants are "
+        "built in parallel, each into its own directory under the output path."
+    ),
+)
+@click.option(
+    "--max-parallel-builds",
+    type=click.IntRange(min=1),
+    default=None,
+    help="The maximum number of variants to build at once, the CPUs by default.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["boa", "rattler-build"]),
+    default="boa",
+    help="The tool to build the package with.",
+)
+@click.option(
+    "-c",
+    "--channel",
+    "channels",
+    type=str,
+    multiple=True,
+    help=(
+        "A channel to fetch the dependencies from, e.g. a local directory. By "
+        "default the channels configured for the backend are used."
+    ),
+)
+@click.option(
+    "--log-level",
+    type=click.Choice(["quiet", "progress", "full"]),
+    default="progress",
+    help=(
+        "How much of the output of the build tools to show: only the last lines "
+        "on failure, a progress line as well, or all of it. The whole output is "
+        "always written to `./.build/conda/logs`."
+    ),
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help=(
+        "Upload the packages even if their tag already has the same content, "
+        "which is skipped by default."
+    ),
+)
+def release(
+    owner,
+    build_num,
+    pyproject_file,
+    output_path,
+    tag,
+    token,
+    publish,
+    max_parallel_uploads,
+    cache,
+    cache_dir,
+    verbose,
+    debug,
+    matrix,
+    max_parallel_builds,
+    backend,
+    channels,
+    log_level,
+    force,
+) -> None:
+    """Render, build and publish the conda packages of the current project."""
+    from eq.devtools.conda import (
+        format_summary,
+        release,
+    )
+
+    result = release(
+        owner=owner,
+        build_number=build_num,
+        pyproject_file=pyproject_file,
+        output_path=output_path,
+        tag=tag,
+        token=token,
+        publish=publish,
+        max_parallel_uploads=max_parallel_uploads,
+        use_cache=cache,
+        cache_dir=cache_dir,
+        verbose=verbose,
+        debug=debug,
+        variants=_parse_matrix(matrix) if matrix else None,
+        max_parallel_builds=max_parallel_builds,
+        backend=backend,
+        channels=channels,
+        log_level=log_level,
+        force=force,
     )
+    if result.variants:
+        click.echo(format_summary(result.variants))
+    click.echo(f"Released {result.version}:")
+    for artifact in result.artifacts:
+        if artifact in result.published:
+            state = "published"
+        elif artifact in result.skipped:
+            state = "already published"
+        else:
+            state = "built"
+        click.echo(f"  {artifact.as_posix()} ({state})")
+    click.echo(str(result.timings))
@@ -1,14 +1,14 @@
 import click
 
-from .packages import packages
+from .._lazy import LazyGroup
 
 
 __all__ = ("github",)
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={"packages": "eq.devtools.cli.github.packages:packages"},
+)
 def github():
     pass
-
-
-github.add_command(packages)
@@ -0,0 +1,136 @@
+import sys
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Iterator,
+)
+from typing import Any
+
+import click
+import msgspec
+from rich import print_json
+from rich.console import Console
+from rich.pretty import pprint
+from rich.table import Table
+
+
+__all__ = (
+    "FORMATS",
+    "format_options",
+    "write_result",
+)
+
+
+FORMATS = ("json", "ndjson", "table", "ids")
+
+
+_encoder = msgspec.json.Encoder()
+
+
+def format_options(fn):
+    fn = click.option(
+        "--json",
+        type=str,
+        is_flag=True,
+        help="Whether to print the result as JSON. Short for `--format json`.",
+    )(fn)
+    fn = click.option(
+        "--format",
+        "output_format",
+        type=click.Choice(FORMATS),
+        default=None,
+        help=(
+            "The format of the result: a JSON document, a JSON document per line "
+            "(streamed as results arrive), a table or one id per line. By default "
+            "the result is pretty-printed to a terminal and written as JSON "
+            "otherwise."
+        ),
+    )(fn)
+    return fn
+
+
+async def _aiter_pages(res: Any) -> AsyncGenerator[list, None]:
+    if isinstance(res, AsyncIterable):
+        async for page in res:
+            yield page
+    elif isinstance(res, list):
+        yield res
+    elif res is not None:
+        yield [res]
+
+
+async def _collect(res: Any) -> Any:
+    if not isinstance(res, AsyncIterable):
+        return res
+    return [item async for page in res for item in page]
+
+
+def _ids(obj: Any) -> Iterator[int]:
+    # the ids of the listed, or deleted, package versions
+    if isinstance(obj, int):
+        yield obj
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _ids(item)
+    elif isinstance(obj, dict):
+        if "id" in obj:
+            yield obj["id"]
+        elif "deleted" in obj:
+            yield from _ids(obj["deleted"])
+        else:
+            for value in obj.values():
+                yield from _ids(value)
+    elif (id_ := getattr(obj, "id", None)) is not None:
+        yield id_
+
+
+def _table(res: Any) -> Table:
+    rows = msgspec.to_builtins(res if isinstance(res, list) else [res])
+    rows = [row if isinstance(row, dict) else dict(value=row) for row in rows]
+    table = Table()
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    for column in columns:
+        table.add_column(column)
+    for row in rows:
+        table.add_row(
+            *(
+                (
+                    _encoder.encode(row[column]).decode("utf-8")
+                    if isinstance(row.get(column), dict | list)
+                    else str(row.get(column, ""))
+                )
+                for column in columns
+            )
+        )
+    return table
+
+
+async def write_result(res: Any, output_format: str | None) -> None:
+    """Write the result of a command to stdout in the given format.
+
+    The result may be an async iterable of pages (lists) of items, which are
+    written as they arrive in the `ndjson` and `ids` formats.
+    """
+    isatty = sys.stdout.isatty()
+    stream = sys.stdout.buffer
+    if output_format in ("ndjson", "ids"):
+        buffer = bytearray()
+        async for page in _aiter_pages(res):
+            for item in page if output_format == "ndjson" else _ids(page):
+                _encoder.encode_into(item, buffer, -1)
+                buffer.extend(b"\n")
+            stream.write(buffer)
+            stream.flush()
+            buffer.clear()
+        return
+
+    res = await _collect(res)
+    if output_format == "table":
+        Console().print(_table(res))
+    elif not isatty:
+        stream.write(_encoder.encode(res) + b"\n")
+        stream.flush()
+    elif output_format == "json":
+        print_json(_encoder.encode(res).decode("utf-8"))
+    elif res is not None:
+        pprint(res)
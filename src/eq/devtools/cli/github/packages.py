@@ -1,30 +1,118 @@
-from functools import partial
+import re
+import sys
+import time
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+)
+from pathlib import Path
 
 import click
-import msgspec
 import trio
 import wrapt
-from rich import print_json
-from rich.pretty import pprint
 
 from eq.devtools.github import packages as pkgs
+from eq.devtools.github.api import (
+    VERSION_FIELDS,
+    version_projection,
+)
+from eq.devtools.github.cache import (
+    default_cache_dir,
+    ResponseCache,
+)
+from eq.devtools.github.client import Session
+from eq.devtools.github.snapshot import (
+    default_snapshot_path,
+    Snapshot,
+)
+from eq.devtools.github.tracing import current_tracer
+
+from ._output import (
+    format_options,
+    write_result,
+)
 
 
 @click.group()
-def packages():
-    pass
+@click.option(
+    "--cache/--no-cache",
+    default=None,
+    help=(
+        "Whether to cache responses on disk and revalidate them with conditional "
+        "requests. Enabled by default if `--cache-dir` is given."
+    ),
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help=f"The directory of the response cache. [default: {default_cache_dir()}]",
+)
+@click.option(
+    "--snapshot/--no-snapshot",
+    default=None,
+    help=(
+        "Whether to sync the package versions to a local snapshot incrementally "
+        "and read them from it. Enabled by default if `--snapshot-path` is given."
+    ),
+)
+@click.option(
+    "--snapshot-path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help=f"The path of the snapshot. [default: {default_snapshot_path()}]",
+)
+@click.pass_context
+def packages(
+    ctx: click.Context,
+    cache: bool | None,
+    cache_dir: Path | None,
+    snapshot: bool | None,
+    snapshot_path: Path | None,
+):
+    if cache is None:
+        cache = cache_dir is not None
+    if snapshot is None:
+        snapshot = snapshot_path is not None
+    ctx.ensure_object(dict)
+    ctx.obj["cache"] = ResponseCache(cache_dir) if cache else None
+    ctx.obj["snapshot"] = Snapshot(snapshot_path) if snapshot else None
+    if snapshot:
+        ctx.call_on_close(ctx.obj["snapshot"].close)
+
+
+def get_snapshot() -> Snapshot | None:
+    obj = click.get_current_context().find_object(dict) or {}
+    return obj.get("snapshot")
 
 
 @wrapt.decorator
 def run_async(async_fn, instance, args, kwargs):
-    json = kwargs.pop("json", False)
-    res = trio.run(partial(async_fn, *args, **kwargs))
-    if json:
-        json = msgspec.json.encode(res).decode("utf-8")
-        print_json(json)
-    else:
-        if res is not None:
-            pprint(res)
+    output_format = kwargs.pop("output_format", None)
+    if kwargs.pop("json", False):
+        output_format = "json"
+    obj = click.get_current_context().find_object(dict) or {}
+
+    async def main():
+        # share one pooled session between all requests of the command
+        async with Session(cache=obj.get("cache")) as session:
+            res = await async_fn(*args, **kwargs)
+            # results may be streamed, so write them while the session is open
+            await write_result(res, output_format)
+            return session.scheduler.stats()
+
+    tracer = current_tracer()
+    stats = trio.run(main, instruments=[] if tracer is None else [tracer])
+    # the scheduler stats are part of the profile
+    if tracer is not None:
+        click.echo(str(stats), err=True)
+
+
+def summarize(results: list[pkgs.DeleteResult]) -> dict:
+    return dict(
+        deleted=[result.version or result.id for result in results if result.ok],
+        errors={result.id: result.error for result in results if not result.ok},
+    )
 
 
 @packages.command(name="list")
@@ -34,16 +122,59 @@ def run_async(async_fn, instance, args, kwargs):
     required=True,
     help="The owner to list packages for.",
 )
-@click.option(
-    "--json",
-    type=str,
-    is_flag=True,
-    help="Whether to print the result as JSON.",
-)
+@format_options
 @run_async
 async def list_packages(owner: str):
-    res = await pkgs.list_packages(owner=owner)
-    return res
+    return pkgs.aiter_packages(owner)
+
+
+def _parse_fields(
+    ctx: click.Context,
+    param: click.Parameter,
+    value: str | None,
+) -> list[str] | None:
+    if value is None:
+        return None
+    fields = [name.strip() for name in value.split(",") if name.strip()]
+    if not fields:
+        raise click.BadParameter(f"Invalid fields: {value!r}")
+    if unknown := [name for name in fields if name not in VERSION_FIELDS]:
+        raise click.BadParameter(
+            f"Unknown fields: {', '.join(unknown)} (expected any of "
+            f"{', '.join(VERSION_FIELDS)})"
+        )
+    return fields
+
+
+async def aiter_versions(
+    owner: str,
+    package: str,
+    fields: list[str] | None,
+) -> AsyncGenerator[list, None]:
+    """Stream the pages of the versions of a package as they arrive."""
+    if fields is not None:
+        model = list[version_projection(*fields)]
+        async for page in pkgs.aiter_package_versions(owner, package, model=model):
+            yield page
+        return
+
+    package_obj = await pkgs.get_package(owner, package)
+    async for page in pkgs.aiter_package_versions(owner, package):
+        for package_version in page:
+            package_version.package = package_obj
+        yield page
+
+
+def project(versions: list, fields: list[str]) -> list[dict]:
+    return [{name: getattr(version, name) for name in fields} for version in versions]
+
+
+async def aiter_projected(
+    pages: AsyncIterable[list],
+    fields: list[str],
+) -> AsyncGenerator[list[dict], None]:
+    async for page in pages:
+        yield project(page, fields)
 
 
 @packages.command(name="list-versions")
@@ -60,18 +191,127 @@ async def list_packages(owner: str):
     help="The name of the package to delete.",
 )
 @click.option(
-    "--json",
+    "--fields",
+    type=str,
+    default=None,
+    callback=_parse_fields,
+    help=(
+        "The (comma-separated) fields of the versions to output, of "
+        f"{', '.join(VERSION_FIELDS)}. Only these fields are decoded."
+    ),
+)
+@format_options
+@run_async
+async def list_package_versions(owner: str, package: str, fields: list[str] | None):
+    if (snapshot := get_snapshot()) is not None:
+        stats = await snapshot.sync(owner, package)
+        click.echo(f"Synced snapshot: {stats}", err=True)
+        if fields is None:
+            return snapshot.list_versions(owner, package)
+        model = version_projection(*fields)
+        return project(snapshot.list_versions(owner, package, model=model), fields)
+
+    pages = aiter_versions(owner, package, fields)
+    return pages if fields is None else aiter_projected(pages, fields)
+
+
+@packages.command(name="sync")
+@click.option(
+    "--owner",
+    type=str,
+    required=True,
+    help="The owner of the package to sync.",
+)
+@click.option(
+    "--package",
     type=str,
+    required=True,
+    help="The name of the package to sync.",
+)
+@click.option(
+    "--full",
     is_flag=True,
-    help="Whether to print the result as JSON.",
+    help=(
+        "Whether to list all of the versions, instead of stopping at the first "
+        "unchanged page."
+    ),
 )
+@format_options
 @run_async
-async def list_package_versions(owner: str, package: str):
-    res = await pkgs.list_package_versions(
-        owner=owner,
-        package=package,
-    )
-    return res
+async def sync(owner: str, package: str, full: bool):
+    """Sync the versions of a package to the local snapshot."""
+    snapshot = get_snapshot() or Snapshot()
+    try:
+        return await snapshot.sync(owner, package, full=full)
+    finally:
+        snapshot.close()
+
+
+class Progress:
+    """Print a running summary of bulk deletes to stderr."""
+
+    def __init__(self) -> None:
+        self.deleted = 0
+        self.failed = 0
+        self._started_at = time.monotonic()
+        self._isatty = sys.stderr.isatty()
+        self.interval = 1.0 if self._isatty else 10.0
+
+    def __call__(self, result: pkgs.DeleteResult) -> None:
+        if result.ok:
+            self.deleted += 1
+        else:
+            self.failed += 1
+
+    def __str__(self) -> str:
+        elapsed = time.monotonic() - self._started_at
+        rate = (self.deleted + self.failed) / elapsed if elapsed else 0.0
+        return (
+            f"{self.deleted} deleted, {self.failed} failed "
+            f"in {elapsed:.1f}s ({rate:.1f}/s)"
+        )
+
+    def print(self, *, final: bool = False) -> None:
+        if self._isatty:
+            # keep updating the same line
+            click.echo(f"\r{self}", nl=final, err=True)
+        else:
+            click.echo(str(self), err=True)
+
+    async def run(self) -> None:
+        while True:
+            await trio.sleep(self.interval)
+            self.print()
+
+
+def _parse_id(token: bytes | str) -> int:
+    try:
+        return int(token)
+    except ValueError:
+        if isinstance(token, bytes):
+            token = token.decode(errors="replace")
+        raise click.BadParameter(f"Invalid version id: {token!r}") from None
+
+
+async def read_ids(path: str) -> AsyncGenerator[int, None]:
+    """Stream the whitespace or comma separated ids in a file (`-` for stdin)."""
+    if path == "-":
+        file = trio.wrap_file(sys.stdin.buffer)
+    else:
+        file = await trio.open_file(path, "rb")
+    try:
+        remainder = b""
+        while chunk := await file.read(2**16):
+            # the last token may continue in the next chunk
+            *tokens, remainder = re.split(rb"[\s,]+", remainder + chunk)
+            for token in tokens:
+                if token:
+                    yield _parse_id(token)
+        if remainder:
+            yield _parse_id(remainder)
+    finally:
+        if path != "-":
+            await file.aclose()
 
 
 @packages.command(name="delete")
@@ -87,45 +327,66 @@ async def list_package_versions(owner: str, package: str):
     required=True,
     help="The name of the package to delete.",
 )
-@click.option(
-    "--json",
-    type=str,
-    is_flag=True,
-    help="Whether to print the result as JSON.",
-)
+@format_options
 @click.option(
     "--ids",
     type=str,
-    required=True,
+    default=None,
     help="The (comma-separated) version ids of the package to delete.",
 )
+@click.option(
+    "--ids-file",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default=None,
+    help=(
+        "A file of (whitespace or comma separated) version ids to delete, "
+        "or `-` for stdin. Used if `--ids` isn't given. [default: -]"
+    ),
+)
+@click.option(
+    "--max-parallel",
+    type=click.IntRange(min=1),
+    default=50,
+    show_default=True,
+    help="The maximum number of concurrent deletes.",
+)
 @run_async
 async def delete(
     owner: str,
     package: str,
-    ids: list[int],
-    limiter: trio.CapacityLimiter = None,
+    ids: str | None,
+    ids_file: str | None,
+    max_parallel: int,
 ):
-    deleted = []
-    limiter = limiter or trio.CapacityLimiter(50)
-    async with trio.open_nursery() as nursery:
-        for version_id in ids.split(","):
-            version_id = version_id.strip()
-            if not version_id:
-                continue
-            version_id = int(version_id)
-            async with limiter:
-                nursery.start_soon(
-                    partial(
-                        pkgs.delete_package_version,
-                        owner=owner,
-                        package=package,
-                        version_id=version_id,
-                    )
-                )
-            deleted.append(version_id)
-
-    return dict(deleted=deleted, errors={})
+    """Delete package versions by id, streaming the ids from a file or stdin."""
+    if ids is not None:
+        version_ids = [_parse_id(id_) for id_ in ids.split(",") if id_.strip()]
+    else:
+        version_ids = read_ids(ids_file or "-")
+
+    progress = Progress()
+    try:
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(progress.run)
+            results = await pkgs.delete_package_version_ids(
+                owner,
+                package,
+                version_ids,
+                max_parallel=max_parallel,
+                on_result=progress,
+            )
+            nursery.cancel_scope.cancel()
+    except BaseExceptionGroup as group:
+        # streamed ids are only parsed by the delete workers, so an invalid id
+        # is raised from inside of their nurseries
+        invalid, _ = group.split(click.BadParameter)
+        if invalid is None:
+            raise
+        while isinstance(invalid, BaseExceptionGroup):
+            invalid = invalid.exceptions[0]
+        raise invalid from None
+    progress.print(final=True)
+    return summarize(results)
 
 
 @packages.command(name="cleanup")
@@ -138,9 +399,27 @@ async def delete(
 @click.option(
     "--package",
     type=str,
-    required=True,
+    default=None,
     help="The name of the package to delete.",
 )
+@click.option(
+    "--all",
+    "all_packages",
+    is_flag=True,
+    help="Whether to cleanup all packages of the owner instead of `--package`.",
+)
+@click.option(
+    "--repository",
+    type=str,
+    default=None,
+    help="With `--all`, only cleanup the packages of this repository (owner/name).",
+)
+@click.option(
+    "--name-regex",
+    type=str,
+    default=None,
+    help="With `--all`, only cleanup the packages whose name matches this regex.",
+)
 @click.option(
     "--max-age",
     type=int,
@@ -148,22 +427,125 @@ async def delete(
     help="The age (in days) after which the package may be deleted.",
 )
 @click.option(
-    "--json",
-    type=str,
-    is_flag=True,
-    help="Whether to print the result as JSON.",
+    "--max-parallel",
+    type=click.IntRange(min=1),
+    default=30,
+    show_default=True,
+    help="The maximum number of concurrent deletes per package.",
 )
+@click.option(
+    "--max-parallel-packages",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="With `--all`, the maximum number of packages cleaned up concurrently.",
+)
+@format_options
 @run_async
 async def cleanup(
     owner: str,
-    package: str,
+    package: str | None,
+    all_packages: bool,
+    repository: str | None,
+    name_regex: str | None,
     max_age: int,
+    max_parallel: int,
+    max_parallel_packages: int,
+):
+    """Delete the expired, untagged versions of one or all packages."""
+    tags_to_keep = ["latest", r"\d+\.\d+\.\d+"]
+    if all_packages == (package is not None):
+        raise click.UsageError("Exactly one of `--package` and `--all` is required.")
+    if not all_packages and (repository is not None or name_regex is not None):
+        raise click.UsageError("`--repository` and `--name-regex` require `--all`.")
+
+    if not all_packages:
+        results = await pkgs.cleanup_package_versions(
+            owner=owner,
+            package=package,
+            tags_to_keep=tags_to_keep,
+            max_age=max_age,
+            max_parallel=max_parallel,
+            snapshot=get_snapshot(),
+        )
+        return summarize(results)
+
+    progress = Progress()
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(progress.run)
+        results_by_package = await pkgs.cleanup_packages(
+            owner,
+            repository=repository,
+            name_regex=name_regex,
+            max_parallel_packages=max_parallel_packages,
+            tags_to_keep=tags_to_keep,
+            max_age=max_age,
+            max_parallel=max_parallel,
+            on_result=progress,
+            snapshot=get_snapshot(),
+        )
+        nursery.cancel_scope.cancel()
+    progress.print(final=True)
+    return {
+        package: summarize(results) for package, results in results_by_package.items()
+    }
+
+
+@packages.command(name="mirror")
+@click.option(
+    "--from-owner",
+    type=str,
+    required=True,
+    help="The owner to copy the package from.",
+)
+@click.option(
+    "--to-owner",
+    type=str,
+    required=True,
+    help="The owner to copy the package to.",
+)
+@click.option(
+    "--package",
+    type=str,
+    required=True,
+    help="The name of the package to mirror, e.g. `conda/eq-devtools`.",
+)
+@click.option(
+    "--max-parallel",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="The maximum number of tags copied concurrently.",
+)
+@click.option(
+    "--registry-url",
+    type=str,
+    default="https://ghcr.io",
+    show_default=True,
+    help="The URL of the container registry of the packages.",
+)
+@format_options
+@run_async
+async def mirror(
+    from_owner: str,
+    to_owner: str,
+    package: str,
+    max_parallel: int,
+    registry_url: str,
 ):
-    deleted = await pkgs.cleanup_package_versions(
-        owner=owner,
-        package=package,
-        tags_to_keep=["latest", r"\d+\.\d+\.\d+"],
-        max_age=max_age,
-        max_parallel=30,
+    """Copy the tags of a package which are missing on another owner."""
+    results = await pkgs.mirror_package(
+        from_owner,
+        package,
+        to_owner=to_owner,
+        registry_url=registry_url,
+        max_parallel=max_parallel,
+    )
+    return dict(
+        mirrored={result.tag: result.digest for result in results if result.ok},
+        blobs={
+            how: sum(getattr(result, how) for result in results)
+            for how in ("existing", "mounted", "copied")
+        },
+        errors={result.tag: result.error for result in results if not result.ok},
     )
-    return dict(deleted=deleted, errors={})
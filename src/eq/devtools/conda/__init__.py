@@ -1,3 +1,20 @@
 from ._build import build_package
-from ._publish_oci import publish_oci_artifact
-from ._render import render_recipe
+from ._matrix import (
+    build_matrix,
+    format_summary,
+    parse_matrix,
+    Variant,
+)
+from ._publish_oci import (
+    check_published,
+    find_packages,
+    format_publish_summary,
+    publish_oci_artifact,
+    publish_oci_artifacts,
+)
+from ._release import release
+from ._render import (
+    find_pyproject_files,
+    render_recipe,
+    render_recipes,
+)
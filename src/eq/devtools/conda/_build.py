@@ -1,30 +1,49 @@
+import abc
 import os
+from collections.abc import (
+    Mapping,
+    Sequence,
+)
 from pathlib import Path
 from subprocess import (
     CalledProcessError,
     check_output,
-    PIPE,
-    Popen,
     STDOUT,
 )
 
+from ._cache import (
+    build_key,
+    BuildCache,
+    default_cache_dir,
+    find_artifacts,
+)
+from ._logs import run_logged
 from ._render import render_recipe
 
 
 __all__ = (
+    "BACKENDS",
+    "Backend",
+    "Boa",
     "build_package",
     "get_version",
+    "RattlerBuild",
 )
 
 
-def get_version():
-    cmd = "git describe --long"
+def get_version(cwd: Path | str | None = None) -> str:
+    """Return the version of the project from `git describe`."""
     try:
-        output = check_output(cmd, stderr=STDOUT, encoding="utf-8", shell=True)
-    except Exception as exc:
+        output = check_output(
+            ["git", "describe", "--long"],
+            cwd=cwd,
+            stderr=STDOUT,
+            encoding="utf-8",
+        )
+    except CalledProcessError as exc:
         raise RuntimeError(exc.stdout) from exc
 
-    version, distance, sha = output.strip().split("-")
+    version, distance, sha = output.strip().rsplit("-", maxsplit=2)
     distance = int(distance)
     if distance == 0:
         return version
@@ -32,21 +51,200 @@ def get_version():
         return f"{version}.post{distance:03d}+{sha[1:]}"
 
 
+class Backend(abc.ABC):
+    """A tool which builds conda packages from a recipe."""
+
+    name: str
+    executable: str
+
+    @abc.abstractmethod
+    def command(
+        self,
+        recipe_file: Path,
+        output_path: Path,
+        *,
+        channels: Sequence[str] = (),
+        variant_config_file: Path | None = None,
+    ) -> list[str]:
+        """Return the command which builds `recipe_file` into `output_path`."""
+
+    def env(
+        self,
+        *,
+        work_path: Path | None = None,
+        channels: Sequence[str] = (),
+    ) -> dict[str, str]:
+        """Return the environment variables to set for the build."""
+        return {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class Boa(Backend):
+    """Build with `boa build`, using the solver and channels of conda."""
+
+    name = "boa"
+    executable = "boa"
+
+    def command(
+        self,
+        recipe_file: Path,
+        output_path: Path,
+        *,
+        channels: Sequence[str] = (),
+        variant_config_file: Path | None = None,
+    ) -> list[str]:
+        # boa finds the `conda_build_config.yaml` next to the recipe by itself
+        return [
+            self.executable,
+            "build",
+            "--pkg-format",
+            "2",
+            f"--output-folder={output_path.expanduser().resolve().as_posix()}",
+            recipe_file.parent.as_posix(),
+        ]
+
+    def env(
+        self,
+        *,
+        work_path: Path | None = None,
+        channels: Sequence[str] = (),
+    ) -> dict[str, str]:
+        env = {}
+        if work_path is not None:
+            env["CONDA_BLD_PATH"] = (work_path / "build").resolve().as_posix()
+        if channels:
+            env["CONDA_CHANNELS"] = ",".join(channels)
+        return env
+
+
+class RattlerBuild(Backend):
+    """Build with `rattler-build`, which solves and packages natively."""
+
+    name = "rattler-build"
+    executable = "rattler-build"
+
+    def command(
+        self,
+        recipe_file: Path,
+        output_path: Path,
+        *,
+        channels: Sequence[str] = (),
+        variant_config_file: Path | None = None,
+    ) -> list[str]:
+        cmd = [
+            self.executable,
+            "build",
+            "--recipe",
+            recipe_file.as_posix(),
+            "--output-dir",
+            output_path.expanduser().resolve().as_posix(),
+            "--package-format",
+            "conda",
+        ]
+        for channel in channels:
+            cmd += ["--channel", channel]
+        if variant_config_file is not None:
+            cmd += ["--variant-config", variant_config_file.as_posix()]
+        return cmd
+
+
+BACKENDS: dict[str, Backend] = {
+    backend.name: backend
+    for backend in (
+        Boa(),
+        RattlerBuild(),
+    )
+}
+
+
+def _write_variant_config(
+    recipe_path: Path,
+    variant_config: Mapping[str, Sequence[str]],
+) -> Path:
+    # pin the variant with a `conda_build_config.yaml` next to the recipe
+    config = "".join(
+        f"{key}:\n" + "".join(f'  - "{value}"\n' for value in values)
+        for key, values in variant_config.items()
+    )
+    config_file = recipe_path / "conda_build_config.yaml"
+    if not config_file.is_file() or config_file.read_text() != config:
+        config_file.write_text(config)
+    return config_file
+
+
 def build_package(
     *,
     build_number: int = 0,
     recipe_file: Path | str | None = None,
     output_path: Path | str = Path("./.build/conda/dist"),
-    debug: bool = True,
-) -> None:
-    """Build a conda package for the current project."""
-    version = get_version()
-    os.environ["SETUPTOOLS_SCM_PRETEND_VERSION"] = version
+    debug: bool = False,
+    pyproject_file: Path | str = Path("./pyproject.toml"),
+    use_cache: bool = True,
+    cache_dir: Path | str | None = None,
+    version: str | None = None,
+    work_path: Path | str | None = None,
+    variant_config: Mapping[str, Sequence[str]] | None = None,
+    log_prefix: str = "",
+    backend: str = "boa",
+    channels: Sequence[str] = (),
+    log_level: str = "progress",
+) -> list[Path]:
+    """Build a conda package for the current project.
+
+    The build is skipped if a package was already built from the same inputs
+    (see `build_key`), either into `output_path` or into the cache directory
+    (by default `default_cache_dir()`), unless `use_cache` is `False`.
+
+    Parameters
+    ----------
+    debug : bool
+        Whether to print the rendered recipe (with `bat`).
+    version : str, optional
+        The version of the package, by default `get_version()`.
+    work_path : Path or str, optional
+        A directory for the rendered recipe and the build itself, which
+        isolates the build from any other running at the same time.
+    variant_config : Mapping[str, Sequence[str]], optional
+        The variant to build, e.g. `{"python": ["3.11"]}`, which is written to
+        the `conda_build_config.yaml` next to the recipe.
+    log_prefix : str
+        A prefix for the lines of the build log.
+    backend : str
+        The name of the tool to build with, one of `BACKENDS`.
+    channels : Sequence[str]
+        The channels to fetch the dependencies from, by default those
+        configured for the backend.
+    log_level : str
+        How much of the build log to show, one of `LOG_LEVELS`. The whole log
+        is written to `logs/build.log.gz` under the `work_path`, or
+        `./.build/conda`.
+
+    Returns
+    -------
+    artifacts : list[Path]
+        The built packages.
+
+    """
+    if backend not in BACKENDS:
+        msg = f"Unknown backend {backend!r}, expected one of {list(BACKENDS)}."
+        raise ValueError(msg)
+    builder = BACKENDS[backend]
+    version = version or get_version()
+    work_path = None if work_path is None else Path(work_path)
     if recipe_file is None:
         recipe_file = render_recipe(
             version=version,
-            build_number=0,
-            debug=debug,
+            build_number=build_number,
+            pyproject_file=pyproject_file,
+            output_path=(
+                Path("./.build/conda/recipe/recipe.yaml")
+                if work_path is None
+                else work_path / "recipe" / "recipe.yaml"
+            ),
+            show=debug,
+            backend=backend,
         )
     else:
         recipe_file = Path(recipe_file)
@@ -59,27 +257,61 @@ def build_package(
         raise RuntimeError(msg)
 
     recipe_path = recipe_file.parent
+    recipe = recipe_file.read_text()
+    variant_config_file = None
+    if variant_config:
+        variant_config_file = _write_variant_config(recipe_path, variant_config)
+        recipe += variant_config_file.read_text()
+
     output_path = Path(output_path)
-    cmd = (
-        "boa build --pkg-format 2 "
-        f"--output-folder={output_path.expanduser().resolve().as_posix()!r} "
-        f"{recipe_path.as_posix()!r} "
-        #  "rattler-build build "
-        #  f"--output-dir={output_path.as_posix()!r} "
-        #  f"--recipe={recipe_path.as_posix()!r} "
-    ).strip()
-    print(cmd)
-    with Popen(
+    cache = None
+    if use_cache:
+        cache_dir = default_cache_dir() if cache_dir is None else Path(cache_dir)
+        cache = BuildCache(cache_dir)
+        key = build_key(
+            recipe=recipe,
+            version=version,
+            build_number=build_number,
+            backend=backend,
+            channels=channels,
+            source_path=Path(pyproject_file).parent,
+            exclude=[
+                path
+                for path in (output_path, recipe_path, cache_dir, work_path)
+                if path is not None
+            ],
+        )
+        if (artifacts := cache.lookup(key, output_path)) is not None:
+            print(f"{log_prefix}Skipping the build, it's up to date ({key[:12]}):")
+            for artifact in artifacts:
+                print(f"{log_prefix}  {artifact.as_posix()}")
+            return artifacts
+
+    env = {
+        **os.environ,
+        "SETUPTOOLS_SCM_PRETEND_VERSION": version,
+        **builder.env(work_path=work_path, channels=channels),
+    }
+    existing = find_artifacts(output_path)
+    cmd = builder.command(
+        recipe_file,
+        output_path,
+        channels=channels,
+        variant_config_file=variant_config_file,
+    )
+    run_logged(
         cmd,
-        stdout=PIPE,
-        stderr=STDOUT,
-        bufsize=1,
-        universal_newlines=True,
-        env=os.environ,
-        shell=True,
-    ) as process:
-        for line in process.stdout:
-            print(line, end="")
-
-    if process.returncode != 0:
-        raise CalledProcessError(process.returncode, process.args)
+        env=env,
+        log_file=(work_path or Path("./.build/conda")) / "logs" / "build.log.gz",
+        log_level=log_level,
+        prefix=log_prefix,
+    )
+
+    artifacts = [
+        path
+        for path, mtime in find_artifacts(output_path).items()
+        if existing.get(path) != mtime
+    ]
+    if cache is not None:
+        cache.store(key, output_path, artifacts)
+    return [output_path / path for path in artifacts]
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import (
+    Iterable,
+    Sequence,
+)
+from pathlib import Path
+from subprocess import (
+    CalledProcessError,
+    check_output,
+    DEVNULL,
+)
+
+
+__all__ = (
+    "build_key",
+    "BuildCache",
+    "default_cache_dir",
+    "find_artifacts",
+    "source_files",
+)
+
+
+ARTIFACT_PATTERNS = ("*/*.conda", "*/*.tar.bz2")
+
+_MANIFEST_DIR = ".build-cache"
+
+# the build outputs of this, and other, tools which are never sources
+BUILD_DIRS = (".build",)
+
+
+def default_cache_dir() -> Path:
+    """Return the directory of the local conda build cache.
+
+    Respects `$XDG_CACHE_HOME`, defaulting to `~/.cache/eq-devtools/conda`.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "eq-devtools" / "conda"
+
+
+def _is_relative_to(path: Path, others: Iterable[Path]) -> bool:
+    return any(path == other or other in path.parents for other in others)
+
+
+def source_files(
+    root: Path | str = Path("."),
+    *,
+    exclude: Iterable[Path | str] = (),
+) -> list[Path]:
+    """Return the files of the source tree under `root`, relative to it.
+
+    In a git repository these are the tracked and untracked files which aren't
+    ignored by `.gitignore`, otherwise all the files under `root`. The files
+    under any of the `exclude` paths, or the `BUILD_DIRS` of `root`, are left
+    out, as are deleted files.
+    """
+    root = Path(root).resolve()
+    excluded = [
+        *(root / path for path in BUILD_DIRS),
+        *(Path(path).resolve() for path in exclude),
+    ]
+    try:
+        output = check_output(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root,
+            stderr=DEVNULL,
+        )
+        paths = [Path(os.fsdecode(path)) for path in output.split(b"\0") if path]
+    except (CalledProcessError, FileNotFoundError):
+        paths = [
+            path.relative_to(root)
+            for path in root.rglob("*")
+            if ".git" not in path.relative_to(root).parts
+        ]
+    return sorted(
+        path
+        for path in set(paths)
+        if (root / path).is_file() and not _is_relative_to(root / path, excluded)
+    )
+
+
+def _digest(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def build_key(
+    *,
+    recipe: str,
+    version: str,
+    build_number: int,
+    backend: str = "boa",
+    channels: Sequence[str] = (),
+    source_path: Path | str = Path("."),
+    exclude: Iterable[Path | str] = (),
+) -> str:
+    """Return the key of a build, a hash of all of its inputs.
+
+    The key covers the rendered `recipe`, the `version`, `build_number`,
+    `backend` and (ordered) `channels` and the paths and contents of the files
+    of the source tree (see `source_files`), which include `requirements.d/*`.
+    """
+    source_path = Path(source_path)
+    hasher = hashlib.sha256()
+    hasher.update(f"{version}\0{build_number}\0{backend}\0".encode("utf-8"))
+    hasher.update(json.dumps(list(channels)).encode("utf-8"))
+    hasher.update(recipe.encode("utf-8"))
+    for path in source_files(source_path, exclude=exclude):
+        hasher.update(b"\0" + path.as_posix().encode("utf-8") + b"\0")
+        hasher.update(_digest(source_path / path).encode("ascii"))
+    return hasher.hexdigest()
+
+
+def find_artifacts(output_path: Path | str) -> dict[Path, float]:
+    """Return the packages in a conda output folder, with their mtimes."""
+    output_path = Path(output_path)
+    return {
+        path.relative_to(output_path): path.stat().st_mtime
+        for pattern in ARTIFACT_PATTERNS
+        for path in output_path.glob(pattern)
+    }
+
+
+class BuildCache:
+    """Find the artifacts of builds by their key (see `build_key`).
+
+    A manifest listing the artifacts of every build is written to the output
+    folder, and the artifacts are copied into the cache directory (if any),
+    from which they're restored into another output folder.
+
+    Parameters
+    ----------
+    cache_dir : Path or str, optional
+        The directory the artifacts are copied into. If `None`, only the
+        artifacts in the output folder are found.
+
+    """
+
+    def __init__(self, cache_dir: Path | str | None = None) -> None:
+        self.cache_dir = None if cache_dir is None else Path(cache_dir).expanduser()
+
+    @staticmethod
+    def _read_manifest(path: Path) -> list[Path] | None:
+        try:
+            return [Path(artifact) for artifact in json.loads(path.read_text())]
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(path: Path, artifacts: list[Path]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps([artifact.as_posix() for artifact in artifacts]))
+
+    def lookup(self, key: str, output_path: Path | str) -> list[Path] | None:
+        """Return the artifacts built for `key`, or `None` if there aren't any.
+
+        Artifacts found in the cache directory are copied into `output_path`.
+        """
+        output_path = Path(output_path)
+        manifest = output_path / _MANIFEST_DIR / f"{key}.json"
+        artifacts = self._read_manifest(manifest)
+        if artifacts and all((output_path / path).is_file() for path in artifacts):
+            return [output_path / path for path in artifacts]
+        if self.cache_dir is None:
+            return None
+
+        cached = self.cache_dir / key
+        artifacts = self._read_manifest(cached / "manifest.json")
+        if not artifacts or not all((cached / path).is_file() for path in artifacts):
+            return None
+        for path in artifacts:
+            (output_path / path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(cached / path, output_path / path)
+        self._write_manifest(manifest, artifacts)
+        return [output_path / path for path in artifacts]
+
+    def store(
+        self,
+        key: str,
+        output_path: Path | str,
+        artifacts: Iterable[Path],
+    ) -> None:
+        """Record the `artifacts` built for `key` into `output_path`."""
+        output_path = Path(output_path)
+        artifacts = [Path(path) for path in artifacts]
+        self._write_manifest(output_path / _MANIFEST_DIR / f"{key}.json", artifacts)
+        if self.cache_dir is None:
+            return
+
+        cached = self.cache_dir / key
+        tmp = self.cache_dir / f".{key}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        for path in artifacts:
+            (tmp / path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(output_path / path, tmp / path)
+        self._write_manifest(tmp / "manifest.json", artifacts)
+        shutil.rmtree(cached, ignore_errors=True)
+        tmp.rename(cached)
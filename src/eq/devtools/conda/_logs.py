@@ -0,0 +1,156 @@
+import gzip
+import shlex
+import sys
+import time
+from collections import deque
+from collections.abc import (
+    Mapping,
+    Sequence,
+)
+from pathlib import Path
+from subprocess import (
+    CalledProcessError,
+    PIPE,
+    Popen,
+    STDOUT,
+)
+from typing import BinaryIO
+
+
+__all__ = (
+    "LOG_LEVELS",
+    "run_logged",
+)
+
+
+# `quiet` only shows the tail of the log of a failed command, `progress` also
+# shows a progress line and `full` streams the whole log
+LOG_LEVELS = ("quiet", "progress", "full")
+
+_CHUNK_SIZE = 64 * 1024
+
+# how often the progress line is shown in place, or written out when it can't be
+_TTY_INTERVAL = 0.1
+_LOG_INTERVAL = 30.0
+
+
+class _Progress:
+    def __init__(self, prefix: str, stream: BinaryIO, *, inplace: bool) -> None:
+        self.prefix = prefix
+        self.stream = stream
+        self.inplace = inplace
+        self.interval = _TTY_INTERVAL if inplace else _LOG_INTERVAL
+        self.started_at = time.monotonic()
+        self.shown_at = self.started_at
+
+    def show(self, lines: int, last_line: bytes) -> None:
+        now = time.monotonic()
+        if now - self.shown_at < self.interval:
+            return
+        self.shown_at = now
+        status = f"{self.prefix}{lines} lines, {now - self.started_at:.0f}s"
+        if self.inplace:
+            text = last_line.decode("utf-8", "replace").strip()
+            line = f"\r\x1b[K{status}: {text}"[:200].encode("utf-8")
+        else:
+            line = f"{status}\n".encode("utf-8")
+        self.stream.write(line)
+        self.stream.flush()
+
+    def clear(self) -> None:
+        if self.inplace:
+            self.stream.write(b"\r\x1b[K")
+            self.stream.flush()
+
+
+def run_logged(
+    cmd: Sequence[str],
+    *,
+    env: Mapping[str, str] | None = None,
+    log_file: Path | str | None = None,
+    log_level: str = "progress",
+    tail: int = 50,
+    prefix: str = "",
+) -> None:
+    """Run a command, logging its output without decoding it line by line.
+
+    The raw output (stdout and stderr) is written to the gzipped `log_file`,
+    while the last `tail` lines are kept in memory and shown if the command
+    fails. With the `progress` log level a progress line is shown meanwhile,
+    in place on a terminal unless there's a `prefix`, which marks output that
+    may be interleaved with that of other commands.
+
+    Raises
+    ------
+    CalledProcessError
+        If the command fails, with the tail of its output.
+
+    """
+    if log_level not in LOG_LEVELS:
+        msg = f"Unknown log level {log_level!r}, expected one of {LOG_LEVELS}."
+        raise ValueError(msg)
+    # keep the order of any text written before
+    sys.stdout.flush()
+    stream = sys.stdout.buffer
+    bprefix = prefix.encode("utf-8")
+    lines: deque[bytes] = deque(maxlen=tail)
+    progress = None
+    if log_level == "progress":
+        progress = _Progress(prefix, stream, inplace=stream.isatty() and not prefix)
+    log = None
+    if log_file is not None:
+        log_file = Path(log_file)
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        log = gzip.open(log_file, "wb", compresslevel=1)
+
+    stream.write(f"{prefix}{shlex.join(cmd)}\n".encode("utf-8"))
+    stream.flush()
+    started_at = time.monotonic()
+    num_lines = 0
+    partial = b""
+    try:
+        with Popen(cmd, stdout=PIPE, stderr=STDOUT, env=env) as process:
+            while chunk := process.stdout.read1(_CHUNK_SIZE):
+                if log is not None:
+                    log.write(chunk)
+                num_lines += chunk.count(b"\n")
+                *complete, partial = (partial + chunk).split(b"\n")
+                if tail:
+                    lines.extend(complete[-tail:])
+                if log_level == "full":
+                    # the output is only split into lines to be prefixed
+                    if bprefix:
+                        stream.write(
+                            b"".join(bprefix + line + b"\n" for line in complete)
+                        )
+                    else:
+                        stream.write(chunk)
+                    stream.flush()
+                elif progress is not None and complete:
+                    progress.show(num_lines, complete[-1])
+    finally:
+        if log is not None:
+            log.close()
+    if partial:
+        lines.append(partial)
+        if log_level == "full":
+            stream.write(bprefix + partial + b"\n" if bprefix else b"\n")
+
+    if progress is not None:
+        progress.clear()
+    location = "" if log_file is None else f", logged to {log_file.as_posix()}"
+    if process.returncode != 0:
+        if log_level != "full":
+            stream.write(
+                f"{prefix}Failed with exit code {process.returncode}, the last "
+                f"{len(lines)} of {num_lines} lines{location}:\n".encode("utf-8")
+            )
+            stream.write(b"".join(bprefix + line + b"\n" for line in lines))
+        stream.flush()
+        raise CalledProcessError(process.returncode, cmd, output=b"\n".join(lines))
+    if progress is not None:
+        stream.write(
+            f"{prefix}Done in {time.monotonic() - started_at:.1f}s, {num_lines} "
+            f"lines{location}\n".encode("utf-8")
+        )
+    stream.flush()
@@ -0,0 +1,176 @@
+import itertools
+import os
+import time
+from collections.abc import (
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from concurrent.futures import (
+    as_completed,
+    Future,
+    ProcessPoolExecutor,
+)
+from dataclasses import (
+    dataclass,
+    field,
+)
+from pathlib import Path
+
+from ._build import (
+    build_package,
+    get_version,
+)
+
+
+__all__ = (
+    "build_matrix",
+    "format_summary",
+    "iter_matrix",
+    "parse_matrix",
+    "Variant",
+    "VariantResult",
+)
+
+
+@dataclass(frozen=True)
+class Variant:
+    """A configuration of the package to build."""
+
+    python: str | None = None
+    build_number: int = 0
+
+    @property
+    def name(self) -> str:
+        parts = [] if self.python is None else [f"py{self.python}"]
+        return "-".join([*parts, f"build{self.build_number}"])
+
+    @property
+    def config(self) -> dict[str, list[str]]:
+        return {} if self.python is None else {"python": [self.python]}
+
+
+_MATRIX_KEYS = {
+    "python": str,
+    "build_number": int,
+    "build-number": int,
+}
+
+
+def parse_matrix(specs: Iterable[str]) -> list[Variant]:
+    """Parse a matrix of variants, the product of the values of every key.
+
+    Examples
+    --------
+    >>> parse_matrix(["python=3.11,3.12", "build_number=0"])
+    [Variant(python='3.11', build_number=0), Variant(python='3.12', build_number=0)]
+
+    """
+    axes = {}
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        key = key.strip()
+        if not sep or key not in _MATRIX_KEYS:
+            msg = (
+                f"Invalid matrix {spec!r}, expected `KEY=VALUE[,VALUE...]` where "
+                "`KEY` is `python` or `build_number`."
+            )
+            raise ValueError(msg)
+        convert = _MATRIX_KEYS[key]
+        axes[key.replace("-", "_")] = [
+            convert(value.strip()) for value in values.split(",") if value.strip()
+        ]
+    return [
+        Variant(**dict(zip(axes, values)))
+        for values in itertools.product(*axes.values())
+    ]
+
+
+@dataclass
+class VariantResult:
+    variant: Variant
+    artifacts: list[Path] = field(default_factory=list)
+    seconds: float = 0.0
+    error: str | None = None
+
+
+def _build_variant(variant: Variant, kwargs: dict) -> VariantResult:
+    start = time.perf_counter()
+    try:
+        artifacts = build_package(
+            build_number=variant.build_number,
+            variant_config=variant.config,
+            log_prefix=f"[{variant.name}] ",
+            **kwargs,
+        )
+    except Exception as exc:
+        print(f"[{variant.name}] FAILED: {exc}")
+        return VariantResult(
+            variant,
+            seconds=time.perf_counter() - start,
+            error=str(exc) or type(exc).__name__,
+        )
+    return VariantResult(variant, artifacts, time.perf_counter() - start)
+
+
+def iter_matrix(
+    variants: Sequence[Variant],
+    *,
+    output_path: Path | str = Path("./.build/conda/dist"),
+    work_path: Path | str = Path("./.build/conda/matrix"),
+    max_workers: int | None = None,
+    version: str | None = None,
+    **kwargs,
+) -> Iterator[VariantResult]:
+    """Build the variants in a process pool, yielding them as they finish.
+
+    Every variant is rendered and built in its own directory under `work_path`
+    into its own directory under `output_path`. See `build_package` for the
+    other arguments.
+    """
+    version = version or get_version()
+    output_path = Path(output_path)
+    work_path = Path(work_path)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(variants) or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures: list[Future] = [
+            executor.submit(
+                _build_variant,
+                variant,
+                dict(
+                    output_path=output_path / variant.name,
+                    work_path=work_path / variant.name,
+                    version=version,
+                    **kwargs,
+                ),
+            )
+            for variant in variants
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def build_matrix(variants: Sequence[Variant], **kwargs) -> list[VariantResult]:
+    """Build the variants in a process pool, see `iter_matrix`.
+
+    Returns
+    -------
+    results : list[VariantResult]
+        The results of the variants, in their order.
+
+    """
+    results = {result.variant: result for result in iter_matrix(variants, **kwargs)}
+    return [results[variant] for variant in variants]
+
+
+def format_summary(results: Iterable[VariantResult]) -> str:
+    """Return a table of the status, duration and artifacts of the variants."""
+    lines = [f"{'variant':>24} {'status':>7} {'seconds':>8}  artifacts"]
+    for result in results:
+        status = "failed" if result.error else "ok"
+        artifacts = ", ".join(path.name for path in result.artifacts)
+        lines.append(
+            f"{result.variant.name:>24} {status:>7} {result.seconds:>8.1f}  "
+            f"{result.error or artifacts}"
+        )
+    return "\n".join(lines)
@@ -1,13 +1,227 @@
+import glob
 import os
+import time
+from collections.abc import (
+    AsyncGenerator,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from subprocess import (
-    CalledProcessError,
-    PIPE,
-    Popen,
-    STDOUT,
+
+import httpx
+import trio
+
+from eq.devtools.oci import (
+    CHUNK_SIZE,
+    file_digest,
+    Registry,
 )
 
 
+__all__ = (
+    "check_published",
+    "find_packages",
+    "format_publish_summary",
+    "publish_oci_artifact",
+    "publish_oci_artifacts",
+    "PublishResult",
+)
+
+
+PACKAGE_SUFFIXES = (".conda", ".tar.bz2")
+
+# the media types of the layers of the packages
+MEDIA_TYPES = {
+    ".conda": "application/vnd.conda.package.v2",
+    ".tar.bz2": "application/vnd.conda.package.v1",
+}
+
+REGISTRY_URL = "https://ghcr.io"
+
+
+def _get_token(token: str | None) -> str:
+    token = token or os.environ.get("GHA_PAT", default=os.environ.get("GITHUB_TOKEN"))
+    if token is None:
+        msg = "The `GITHUB_TOKEN` environment variable needs to be set!"
+        raise RuntimeError(msg)
+    return token
+
+
+def _artifact_reference(
+    filepath: Path,
+    *,
+    owner: str,
+    name: str | None = None,
+    version: str | None = None,
+    tag: str | None = None,
+) -> tuple[str, str, str]:
+    # the name, OCI repository and tag of a package
+    if name is None or version is None:
+        stem = filepath.name.removesuffix(".conda").removesuffix(".tar.bz2")
+        filename, file_version, _ = stem.rsplit("-", maxsplit=2)
+        name = name or filename
+        version = version or file_version
+    tag = tag or version.replace("+", "-")
+    return name, f"{owner}/conda/{name}".lower(), tag
+
+
+def _media_type(path: Path) -> str:
+    suffix = next(suffix for suffix in PACKAGE_SUFFIXES if path.name.endswith(suffix))
+    return MEDIA_TYPES[suffix]
+
+
+async def _check(
+    registry: Registry,
+    path: Path,
+    repository: str,
+    tag: str,
+    *,
+    force: bool = False,
+) -> tuple[str, bool]:
+    # hash the file in a thread while the manifest is fetched
+    layers: set[str] = set()
+    async with trio.open_nursery() as nursery:
+        if not force:
+
+            async def get_layers() -> None:
+                try:
+                    layers.update(await registry.layer_digests(repository, tag))
+                except httpx.HTTPError as exc:
+                    print(f"Failed to check {repository}:{tag}, uploading: {exc}")
+
+            nursery.start_soon(get_layers)
+        digest = await trio.to_thread.run_sync(file_digest, path)
+    return digest, digest in layers
+
+
+async def _check_published(
+    packages: Sequence[Path],
+    *,
+    owner: str,
+    token: str,
+    registry_url: str,
+    **kwargs,
+) -> list[tuple[str, bool]]:
+    results: list[tuple[str, bool]] = [("", False)] * len(packages)
+
+    async def check(idx: int, path: Path, registry: Registry) -> None:
+        _, repository, tag = _artifact_reference(path, owner=owner, **kwargs)
+        results[idx] = await _check(registry, path, repository, tag)
+
+    async with Registry(registry_url, username=owner, password=token) as registry:
+        async with trio.open_nursery() as nursery:
+            for idx, path in enumerate(packages):
+                nursery.start_soon(check, idx, path, registry)
+    return results
+
+
+def check_published(
+    packages: Sequence[Path | str],
+    *,
+    owner: str,
+    tag: str | None = None,
+    token: str | None = None,
+    registry_url: str = REGISTRY_URL,
+    name: str | None = None,
+    version: str | None = None,
+) -> list[tuple[str, bool]]:
+    """Return the digests of the packages and whether they're already published.
+
+    A package is published if the manifest of its tag has a layer with the same
+    sha256 digest as the file. The files are hashed in chunks, in threads, while
+    the manifests are fetched concurrently over a single connection pool.
+    """
+    return trio.run(
+        partial(
+            _check_published,
+            [Path(path) for path in packages],
+            owner=owner,
+            token=_get_token(token),
+            registry_url=registry_url,
+            name=name,
+            version=version,
+            tag=tag,
+        )
+    )
+
+
+def _log(log_level: str, message: str) -> None:
+    if log_level != "quiet":
+        print(message, flush=True)
+
+
+async def _push(
+    registry: Registry,
+    filepath: Path,
+    *,
+    owner: str,
+    tag: str | None = None,
+    name: str | None = None,
+    version: str | None = None,
+    verbose: bool = False,
+    log_level: str = "progress",
+    log_prefix: str = "",
+    force: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> tuple[str, bool]:
+    # push a package over an open registry, unless it's already published
+    name, repository, tag = _artifact_reference(
+        filepath,
+        owner=owner,
+        name=name,
+        version=version,
+        tag=tag,
+    )
+    digest, published = await _check(
+        registry,
+        filepath,
+        repository,
+        tag,
+        force=force,
+    )
+    if published:
+        _log(log_level, f"{log_prefix}Skipping {repository}:{tag}, it's up to date")
+        return digest, False
+
+    def on_progress(uploaded: int, size: int) -> None:
+        if verbose or log_level == "full":
+            print(f"{log_prefix}{uploaded / 2**20:.1f} of {size / 2**20:.1f} MiB")
+
+    _log(log_level, f"{log_prefix}Uploading {repository}:{tag}")
+    start = time.perf_counter()
+    await registry.push_artifact(
+        repository,
+        tag,
+        filepath,
+        media_type=_media_type(filepath),
+        digest=digest,
+        chunk_size=chunk_size,
+        on_progress=on_progress,
+    )
+    _log(
+        log_level,
+        f"{log_prefix}Uploaded {repository}:{tag} in "
+        f"{time.perf_counter() - start:.1f}s",
+    )
+    return digest, True
+
+
+def _open_registry(
+    *,
+    owner: str,
+    token: str | None,
+    registry_url: str,
+    debug: bool,
+) -> Registry:
+    if debug:
+        print(f"registry = {registry_url!r}, user = {owner!r}")
+    return Registry(registry_url, username=owner, password=_get_token(token))
+
+
 def publish_oci_artifact(
     filepath: str | Path,
     *,
@@ -16,46 +230,244 @@ def publish_oci_artifact(
     verbose: bool = False,
     token: str | None = None,
     debug: bool = False,
-) -> None:
+    name: str | None = None,
+    version: str | None = None,
+    log_level: str = "progress",
+    log_prefix: str = "",
+    force: bool = False,
+    registry_url: str = REGISTRY_URL,
+    chunk_size: int = CHUNK_SIZE,
+) -> bool:
     """Publish a conda package as an OCI artifact to `ghcr.io`.
 
+    The package is pushed with the OCI distribution API, in chunks streamed
+    from disk (see `eq.devtools.oci.Registry.upload_blob`).
+
     Parameters
     ----------
-    FIXME!
+    filepath : str or Path
+        The `.conda` package to publish.
+    owner : str
+        The GitHub user or organisation to publish the package to.
+    tag : str, optional
+        The tag of the artifact, by default the version of the package.
+    verbose : bool
+        Whether to print the progress of every chunk.
+    token : str, optional
+        The GitHub token, by default `$GHA_PAT` or `$GITHUB_TOKEN`.
+    debug : bool
+        Whether to print the registry and user which are used.
+    name, version : str, optional
+        The name and version of the package, if they're known. By default
+        they're parsed from the filename.
+    log_level : str
+        How much progress to show, one of `LOG_LEVELS`.
+    log_prefix : str
+        A prefix for the lines of the output.
+    force : bool
+        Whether to upload the package even if the tag already has the same
+        content (see `check_published`).
+    registry_url : str
+        The URL of the registry.
+    chunk_size : int
+        The size (in bytes) of the chunks to upload.
+
+    Returns
+    -------
+    uploaded : bool
+        Whether the package was uploaded, rather than skipped.
 
     """
-    token = token or os.environ.get("GHA_PAT", default=os.environ.get("GITHUB_TOKEN"))
-    if token is None:
-        msg = "The `GITHUB_TOKEN` environment variable needs to be set!"
-        raise RuntimeError(msg)
-    os.environ["GHA_PAT"] = token
-    os.environ["GHA_USER"] = owner
-    if debug:
-        print(f"GHA_USER = {os.environ['GHA_USER']!r}")
-        print(f"GHA_PAT = {os.environ['GHA_PAT']!r}")
-    filepath = Path(filepath)
-    filename, version, buildstr = filepath.stem.rsplit("-", maxsplit=2)
-    cmd = ["powerloader upload"]
-    if verbose:
-        cmd += ["-v"]
-    tag = tag or version.replace("+", "-")
-    cmd += [
-        f"{filepath}:conda/{filename}:{tag}",
-        "-m oci://ghcr.io",
-    ]
-    cmd = " ".join(cmd)
-    print(cmd)
-    with Popen(
-        cmd,
-        stdout=PIPE,
-        stderr=STDOUT,
-        bufsize=1,
-        universal_newlines=True,
-        env=os.environ,
-        shell=True,
-    ) as process:
-        for line in process.stdout:
-            print(line, end="")
-
-    if process.returncode != 0:
-        raise CalledProcessError(process.returncode, process.args)
+    registry = _open_registry(
+        owner=owner,
+        token=token,
+        registry_url=registry_url,
+        debug=debug,
+    )
+
+    async def run() -> bool:
+        async with registry:
+            _, uploaded = await _push(
+                registry,
+                Path(filepath),
+                owner=owner,
+                tag=tag,
+                name=name,
+                version=version,
+                verbose=verbose,
+                log_level=log_level,
+                log_prefix=log_prefix,
+                force=force,
+                chunk_size=chunk_size,
+            )
+        return uploaded
+
+    return trio.run(run)
+
+
+def _is_package(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(PACKAGE_SUFFIXES)
+
+
+def find_packages(*patterns: Path | str) -> list[Path]:
+    """Return the conda packages matching the files, directories or globs.
+
+    Directories are searched recursively, and globs may contain `**`.
+
+    Examples
+    --------
+    >>> find_packages(".build/conda/dist/**/*.conda")  # doctest: +SKIP
+
+    """
+
+    def iter_packages(pattern: Path | str) -> Iterator[Path]:
+        path = Path(pattern)
+        if path.is_dir():
+            yield from (p for p in sorted(path.rglob("*")) if _is_package(p))
+        elif glob.has_magic(str(pattern)):
+            for match in sorted(glob.glob(str(pattern), recursive=True)):
+                if _is_package(Path(match)):
+                    yield Path(match)
+        elif path.is_file():
+            yield path
+        else:
+            raise FileNotFoundError(f"No such package: {str(pattern)!r}")
+
+    return list(
+        dict.fromkeys(path for pattern in patterns for path in iter_packages(pattern))
+    )
+
+
+@dataclass
+class PublishResult:
+    path: Path
+    size: int
+    seconds: float
+    digest: str | None = None
+    skipped: bool = False
+    error: str | None = None
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.size / self.seconds if self.seconds else 0.0
+
+    @property
+    def status(self) -> str:
+        return self.error or ("skipped, up to date" if self.skipped else "ok")
+
+
+def publish_oci_artifacts(
+    filepaths: Iterable[Path | str],
+    *,
+    owner: str,
+    max_parallel: int = 4,
+    token: str | None = None,
+    debug: bool = False,
+    registry_url: str = REGISTRY_URL,
+    on_result: Callable[[PublishResult], None] | None = None,
+    **kwargs,
+) -> list[PublishResult]:
+    """Publish conda packages as OCI artifacts to `ghcr.io` concurrently.
+
+    Up to `max_parallel` packages are checked and uploaded at once, over a
+    single connection pool, with the output of each upload prefixed by the name
+    of its package. Unless `force` is set, the packages whose tag already has
+    the same content are skipped. Failed uploads are reported in the results
+    rather than raised. See `publish_oci_artifact` for the other arguments.
+
+    If `filepaths` is an iterator, e.g. a generator which builds the packages,
+    it's consumed in a worker thread and each package is uploaded as soon as
+    it's yielded. An error raised by the iterator is re-raised once the uploads
+    of the packages yielded before it are done. `on_result` is called with the
+    result of each package as it completes.
+
+    Returns
+    -------
+    results : list[PublishResult]
+        The size, digest, upload time and status of the packages, in their
+        order.
+
+    """
+    results: list[PublishResult | None] = []
+    registry = _open_registry(
+        owner=owner,
+        token=token,
+        registry_url=registry_url,
+        debug=debug,
+    )
+    limiter = trio.CapacityLimiter(max(1, max_parallel))
+    iterator_error: BaseException | None = None
+
+    async def publish(idx: int, path: Path) -> None:
+        async with limiter:
+            start = time.perf_counter()
+            digest = error = None
+            uploaded = False
+            try:
+                digest, uploaded = await _push(
+                    registry,
+                    path,
+                    owner=owner,
+                    log_prefix=f"[{path.name}] ",
+                    **kwargs,
+                )
+            except Exception as exc:
+                error = str(exc) or type(exc).__name__
+            elapsed = time.perf_counter() - start if uploaded or error else 0.0
+            results[idx] = PublishResult(
+                path,
+                path.stat().st_size,
+                elapsed,
+                digest,
+                skipped=not uploaded and error is None,
+                error=error,
+            )
+            if on_result is not None:
+                on_result(results[idx])
+
+    async def aiter_paths() -> AsyncGenerator[Path, None]:
+        nonlocal iterator_error
+        if not isinstance(filepaths, Iterator):
+            for path in filepaths:
+                yield Path(path)
+            return
+        # don't block the uploads while the next package is produced
+        while True:
+            try:
+                path = await trio.to_thread.run_sync(next, filepaths, None)
+            except Exception as exc:
+                iterator_error = exc
+                return
+            if path is None:
+                return
+            yield Path(path)
+
+    async def run() -> None:
+        async with registry, trio.open_nursery() as nursery:
+            async for path in aiter_paths():
+                results.append(None)
+                nursery.start_soon(publish, len(results) - 1, path)
+
+    trio.run(run)
+    if iterator_error is not None:
+        raise iterator_error
+    return results
+
+
+def format_publish_summary(results: Iterable[PublishResult]) -> str:
+    """Return a table of the size, speed and status of the published packages."""
+    results = list(results)
+    lines = [f"{'package':>48} {'MiB':>7} {'seconds':>8} {'MiB/s':>7}  status"]
+    for result in results:
+        lines.append(
+            f"{result.path.name:>48} {result.size / 2**20:>7.1f} "
+            f"{result.seconds:>8.1f} {result.bytes_per_second / 2**20:>7.2f}  "
+            f"{result.status}"
+        )
+    failed = sum(result.error is not None for result in results)
+    skipped = sum(result.skipped for result in results)
+    lines.append(
+        f"{len(results) - failed - skipped} uploaded, {skipped} skipped, "
+        f"{failed} failed"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,245 @@
+import threading
+import time
+from collections.abc import (
+    Iterator,
+    Sequence,
+)
+from contextlib import contextmanager
+from dataclasses import (
+    dataclass,
+    field,
+)
+from pathlib import Path
+
+from ._build import (
+    build_package,
+    get_version,
+)
+from ._matrix import (
+    iter_matrix,
+    Variant,
+    VariantResult,
+)
+from ._publish_oci import (
+    publish_oci_artifacts,
+    PublishResult,
+)
+from ._render import (
+    _parse_pyproject,
+    render_recipe,
+)
+
+
+__all__ = (
+    "release",
+    "ReleaseResult",
+    "StageTimings",
+)
+
+
+@dataclass
+class StageTiming:
+    count: int = 0
+    busy: float = 0.0
+    start: float = float("inf")
+    end: float = float("-inf")
+
+    @property
+    def wall(self) -> float:
+        return max(self.end - self.start, 0.0)
+
+
+class StageTimings:
+    """Record the time spent in the stages of a pipeline, from any thread.
+
+    The busy time of a stage is the sum of the durations of its runs, and its
+    wall time spans from the start of its first run to the end of its last, so
+    a stage which runs concurrently is busier than its wall time.
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, StageTiming] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """Record a run of a stage, with times from `time.perf_counter`."""
+        with self._lock:
+            timing = self.stages.setdefault(name, StageTiming())
+            timing.count += 1
+            timing.busy += end - start
+            timing.start = min(timing.start, start)
+            timing.end = max(timing.end, end)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def __str__(self) -> str:
+        elapsed = time.perf_counter() - self._started_at
+        lines = [f"{'stage':>10} {'runs':>5} {'busy':>9} {'wall':>9}"]
+        for name, timing in self.stages.items():
+            lines.append(
+                f"{name:>10} {timing.count:>5} {timing.busy:>8.2f}s "
+                f"{timing.wall:>8.2f}s"
+            )
+        lines.append(f"{'total':>10} {'':>5} {'':>9} {elapsed:>8.2f}s")
+        return "\n".join(lines)
+
+
+@dataclass
+class ReleaseResult:
+    version: str
+    artifacts: list[Path] = field(default_factory=list)
+    published: list[Path] = field(default_factory=list)
+    skipped: list[Path] = field(default_factory=list)
+    variants: list[VariantResult] = field(default_factory=list)
+    timings: StageTimings = field(default_factory=StageTimings)
+
+
+def release(
+    *,
+    owner: str,
+    build_number: int = 0,
+    pyproject_file: Path | str = Path("./pyproject.toml"),
+    output_path: Path | str = Path("./.build/conda/dist"),
+    tag: str | None = None,
+    token: str | None = None,
+    publish: bool = True,
+    max_parallel_uploads: int = 4,
+    use_cache: bool = True,
+    cache_dir: Path | str | None = None,
+    verbose: bool = False,
+    debug: bool = False,
+    variants: Sequence[Variant] | None = None,
+    max_parallel_builds: int | None = None,
+    backend: str = "boa",
+    channels: Sequence[str] = (),
+    log_level: str = "progress",
+    force: bool = False,
+) -> ReleaseResult:
+    """Render, build and publish the conda packages of the current project.
+
+    The version is resolved from git once and passed to every stage. Packages
+    are uploaded (up to `max_parallel_uploads` at once, over one connection
+    pool) as soon as they're built, overlapping with the builds which follow.
+    If `variants` are given, they're rendered and built in a process pool (see
+    `iter_matrix`) and the `build_number` is ignored. See `build_package` for
+    the `backend`, `channels` and `log_level`. Packages which are already
+    published are skipped, unless `force` is set.
+
+    Returns
+    -------
+    result : ReleaseResult
+        The version, the built and published packages and the time spent in
+        each stage.
+
+    """
+    timings = StageTimings()
+    with timings.stage("version"):
+        version = get_version()
+    result = ReleaseResult(version=version, timings=timings)
+    name = _parse_pyproject(Path(pyproject_file))["name"]
+
+    builds = _build(
+        result,
+        build_number=build_number,
+        pyproject_file=pyproject_file,
+        output_path=output_path,
+        use_cache=use_cache,
+        cache_dir=cache_dir,
+        debug=debug,
+        variants=variants,
+        max_parallel_builds=max_parallel_builds,
+        backend=backend,
+        channels=channels,
+        log_level=log_level,
+    )
+    if not publish:
+        for artifacts in builds:
+            result.artifacts.extend(artifacts)
+        return result
+
+    def iter_artifacts() -> Iterator[Path]:
+        for artifacts in builds:
+            result.artifacts.extend(artifacts)
+            yield from artifacts
+
+    def on_result(res: PublishResult) -> None:
+        end = time.perf_counter()
+        timings.record("publish", end - res.seconds, end)
+
+    # upload the packages over one connection pool as soon as they're built
+    results = publish_oci_artifacts(
+        iter_artifacts(),
+        owner=owner,
+        max_parallel=max_parallel_uploads,
+        token=token,
+        on_result=on_result,
+        tag=tag,
+        verbose=verbose,
+        name=name,
+        version=version,
+        log_level=log_level,
+        force=force,
+    )
+    if failed := [res for res in results if res.error is not None]:
+        msg = f"Failed to publish {failed[0].path.name}: {failed[0].error}"
+        raise RuntimeError(msg)
+    for res in results:
+        (result.skipped if res.skipped else result.published).append(res.path)
+    return result
+
+
+def _build(
+    result: ReleaseResult,
+    *,
+    build_number: int,
+    pyproject_file: Path | str,
+    output_path: Path | str,
+    variants: Sequence[Variant] | None,
+    max_parallel_builds: int | None,
+    **kwargs,
+) -> Iterator[list[Path]]:
+    # yield the artifacts of every build as soon as it's done
+    timings = result.timings
+    if variants is None:
+        with timings.stage("render"):
+            recipe_file = render_recipe(
+                version=result.version,
+                build_number=build_number,
+                pyproject_file=pyproject_file,
+                show=kwargs["debug"],
+                backend=kwargs["backend"],
+            )
+        with timings.stage("build"):
+            artifacts = build_package(
+                build_number=build_number,
+                recipe_file=recipe_file,
+                output_path=output_path,
+                pyproject_file=pyproject_file,
+                version=result.version,
+                **kwargs,
+            )
+        yield artifacts
+        return
+
+    for res in iter_matrix(
+        variants,
+        pyproject_file=pyproject_file,
+        output_path=output_path,
+        max_workers=max_parallel_builds,
+        version=result.version,
+        **kwargs,
+    ):
+        end = time.perf_counter()
+        timings.record("build", end - res.seconds, end)
+        result.variants.append(res)
+        if res.error is not None:
+            msg = f"Failed to build {res.variant.name}: {res.error}"
+            raise RuntimeError(msg)
+        yield res.artifacts
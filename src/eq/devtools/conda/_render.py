@@ -1,10 +1,24 @@
+import hashlib
 import io
-import os.path
+import json
+import os
+import re
+import shutil
+import subprocess
+import warnings
 from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import (
+    cache,
+    partial,
+)
 from pathlib import Path
 from textwrap import dedent
 
-import ruamel.yaml
+import click
+
+from ._cache import default_cache_dir
 
 
 try:
@@ -13,9 +27,25 @@ except ModuleNotFoundError:
     import tomli as toml
 
 
-__all__ = ("render_recipe",)
-from hatch_requirements_txt import load_requirements_files
-from ruamel.yaml.scalarstring import PreservedScalarString
+__all__ = (
+    "find_pyproject_files",
+    "render_recipe",
+    "render_recipes",
+)
+
+
+# the key of the project URL in the `about` section, which is the only part of
+# the recipe the build backends disagree on
+_URL_KEYS = {
+    "boa": "home",
+    "rattler-build": "homepage",
+}
+
+# bump to invalidate the parsed requirements cached on disk
+_REQUIREMENTS_CACHE_VERSION = 1
+
+# the parsed requirements files, by path, mtime and size
+_requirements_cache: dict[tuple[str, int, int], list[str]] = {}
 
 
 def render_recipe(
@@ -24,31 +54,44 @@ def render_recipe(
     build_number: int,
     pyproject_file: Path | str = Path("./pyproject.toml"),
     output_path: Path | str = Path("./.build/conda/recipe/recipe.yaml"),
-    debug: bool = True,
+    show: bool = False,
+    debug: bool | None = None,
+    backend: str = "boa",
+    cache_dir: Path | str | None = None,
 ) -> Path:
     """Render a conda recipe from a `pyproject.toml` file.
 
     Parameters
     ----------
-    name : str
-        The name of the package.
     version : str
         The version of the package.
     build_number : int
         The build number of the package.
-    url : str
-        The URL of the package.
-    license : str
-        The license of the package.
-    summary : str
-        The summary of the package.
+    pyproject_file : Path or str
+        The `pyproject.toml` file of the project. Its requirements are read
+        from the `requirements.d` directory next to it.
+    output_path : Path or str
+        The recipe file to write, which is only rewritten if it changed.
+    show : bool
+        Whether to print the recipe, highlighted by `bat` if it's installed.
+    debug : bool, optional
+        Deprecated alias of `show`.
+    backend : str
+        The build backend the recipe is for, `boa` or `rattler-build`.
+    cache_dir : Path or str, optional
+        The directory the parsed requirements files are cached in, by default
+        `default_cache_dir()`.
 
     Returns
     -------
-    recipe : str
+    recipe_file : Path
         The rendered conda recipe.
 
     """
+    if debug is not None:
+        msg = "The `debug` argument of `render_recipe` is deprecated, use `show`."
+        warnings.warn(msg, DeprecationWarning, stacklevel=2)
+        show = show or debug
     pyproject_file = Path(pyproject_file)
     output_path = Path(output_path)
     metadata = _parse_pyproject(pyproject_file)
@@ -58,16 +101,87 @@ def render_recipe(
         pyproject_file.parent,
         output_path.parent,
     )
+    metadata["url_key"] = _URL_KEYS[backend]
+    metadata["requirements"] = _parse_requirements(
+        pyproject_file.parent / "requirements.d",
+        cache_dir=default_cache_dir() if cache_dir is None else Path(cache_dir),
+    )
     recipe = _render_recipe(**metadata)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w") as f:
-        f.write(recipe)
-    if debug:
-        os.system(f"bat {output_path.as_posix()}")
+    # only rewrite an unchanged recipe so its mtime stays put
+    if not output_path.is_file() or output_path.read_text() != recipe:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open("w") as f:
+            f.write(recipe)
+    if show:
+        _show(output_path)
 
     return output_path
 
 
+def _show(recipe_file: Path) -> None:
+    # highlight the recipe with `bat` if it's installed
+    if shutil.which("bat") is None:
+        click.echo(f"# {recipe_file.as_posix()}\n{recipe_file.read_text()}")
+    else:
+        subprocess.run(["bat", recipe_file.as_posix()], check=False)
+
+
+def _has_project(pyproject_file: Path) -> bool:
+    with pyproject_file.open("rb") as fp:
+        return "project" in toml.load(fp)
+
+
+def find_pyproject_files(root: Path | str = Path(".")) -> list[Path]:
+    """Return the `pyproject.toml` files of the projects of a workspace.
+
+    The files under `root` (including its own) which have a `[project]` table
+    are returned, skipping hidden directories such as `.git` and `.build`.
+    """
+    root = Path(root)
+    return [
+        path
+        for path in sorted(root.rglob("pyproject.toml"))
+        if not any(part.startswith(".") for part in path.relative_to(root).parts)
+        and _has_project(path)
+    ]
+
+
+def render_recipes(
+    pyproject_files: Iterable[Path | str],
+    *,
+    output_path: Path | str = Path(".build/conda/recipe/recipe.yaml"),
+    max_workers: int | None = None,
+    **kwargs,
+) -> list[Path]:
+    """Render the conda recipes of several projects in parallel.
+
+    The recipe of every project is written to the (relative) `output_path`
+    under its directory. The projects are rendered in a thread pool, sharing
+    the cache of the parsed requirements files. See `render_recipe` for the
+    other arguments.
+
+    Returns
+    -------
+    recipe_files : list[Path]
+        The rendered conda recipes, in the order of the `pyproject_files`.
+
+    """
+    pyproject_files = [Path(path) for path in pyproject_files]
+    if Path(output_path).is_absolute() and len(pyproject_files) > 1:
+        msg = f"The output path of several recipes must be relative: {output_path}"
+        raise ValueError(msg)
+
+    def render(pyproject_file: Path) -> Path:
+        return render_recipe(
+            pyproject_file=pyproject_file,
+            output_path=pyproject_file.parent / output_path,
+            **kwargs,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(render, pyproject_files))
+
+
 def _parse_pyproject(
     pyproject_file: Path | str,
     /,
@@ -83,20 +197,63 @@ def _parse_pyproject(
     return metadata
 
 
-def _parse_requirements() -> dict[str, list[str]]:
-    # monkey-patch packaging to not normalize ruamel.yaml
+@cache
+def _patch_packaging() -> None:
+    # monkey-patch packaging (once) to not normalize ruamel.yaml
     # FIXME: implement a pypi mapping
-    import re
     from packaging import utils
 
     utils._canonicalize_regex = re.compile(r"[-_]+", re.UNICODE)
 
+
+def _load_requirements_file(filepath: Path) -> list[str]:
+    from hatch_requirements_txt import load_requirements_files
+
+    _patch_packaging()
+    deps, _ = load_requirements_files([filepath.as_posix()])
+    return [f"{dep.name} {dep.specifier}".strip() for dep in deps]
+
+
+def _parse_requirements_file(filepath: Path, *, cache_dir: Path) -> list[str]:
+    # parse a requirements file, unless it's cached in memory (by its mtime) or
+    # on disk (by its content)
+    stat = filepath.stat()
+    path = str(filepath.resolve())
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if (deps := _requirements_cache.get(key)) is not None:
+        return list(deps)
+
+    hasher = hashlib.sha256(f"{_REQUIREMENTS_CACHE_VERSION}\0{path}\0".encode())
+    hasher.update(filepath.read_bytes())
+    cache_file = cache_dir / "requirements" / f"{hasher.hexdigest()}.json"
+    try:
+        deps = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        deps = _load_requirements_file(filepath)
+        # write atomically, as other processes may render at the same time
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(json.dumps(deps))
+            tmp_file.replace(cache_file)
+        except OSError:
+            tmp_file.unlink(missing_ok=True)
+    _requirements_cache[key] = deps
+    return list(deps)
+
+
+def _parse_requirements(
+    requirements_path: Path | str = Path("requirements.d"),
+    *,
+    cache_dir: Path | None = None,
+) -> dict[str, list[str]]:
+    parse = partial(
+        _parse_requirements_file,
+        cache_dir=default_cache_dir() if cache_dir is None else cache_dir,
+    )
     requirements = defaultdict(list[str])
-    for filepath in Path("requirements.d/").glob("**/*.txt"):
-        deps, _ = load_requirements_files([filepath.as_posix()])
-        requirements[filepath.stem].extend(
-            [f"{dep.name} {dep.specifier}".strip() for dep in deps]
-        )
+    for filepath in sorted(Path(requirements_path).glob("**/*.txt")):
+        requirements[filepath.stem].extend(parse(filepath))
 
     return requirements
 
@@ -110,6 +267,8 @@ def _render_recipe(
     url: str,
     license: str,
     summary: str,
+    url_key: str = "home",
+    requirements: dict[str, list[str]] | None = None,
 ) -> str:
     """Render a conda recipe from the specified arguments.
 
@@ -129,6 +288,11 @@ def _render_recipe(
         The summary of the package.
     source_path : Path | str
         The path to the source code of the package.
+    url_key : str
+        The key of the URL in the `about` section.
+    requirements : dict[str, list[str]], optional
+        The requirements of the package by kind, e.g. `run`, by default those
+        in `./requirements.d`.
 
     Returns
     -------
@@ -136,11 +300,15 @@ def _render_recipe(
         The rendered conda recipe.
 
     """
+    # defer the slow imports until a recipe is rendered
+    import ruamel.yaml
+    from ruamel.yaml.scalarstring import PreservedScalarString
+
+    # the values are rendered in place, rather than with jinja expressions, as
+    # boa and rattler-build template recipes differently
     recipe = defaultdict(dict)
-    recipe["context"]["name"] = name
-    recipe["context"]["version"] = version
-    recipe["package"]["name"] = "{{ name }}"
-    recipe["package"]["version"] = "{{ version }}"
+    recipe["package"]["name"] = name
+    recipe["package"]["version"] = version
     recipe["source"]["path"] = Path(source_path).as_posix()
     recipe["build"]["noarch"] = "python"
     recipe["build"]["number"] = build_number
@@ -151,7 +319,8 @@ def _render_recipe(
     """
     ).lstrip()
     recipe["build"]["script"] = PreservedScalarString(script)
-    requirements = _parse_requirements()
+    if requirements is None:
+        requirements = _parse_requirements()
     recipe["requirements"] = {
         key: deps
         for key, deps in requirements.items()
@@ -160,7 +329,7 @@ def _render_recipe(
     # recipe['test']['files'] = ['./tests/']
     # recipe['test']['commands'] = ['tree ./']
     # recipe['test']['requires'] = requirements['test']
-    recipe["about"]["home"] = url
+    recipe["about"][url_key] = url
     recipe["about"]["license"] = license
     recipe["about"]["summary"] = summary
 
@@ -3,4 +3,7 @@ from ._api import (
     Repository,
     Package,
     PackageVersion,
+    PackageVersionSummary,
+    version_projection,
+    VERSION_FIELDS,
 )
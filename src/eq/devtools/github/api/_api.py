@@ -1,20 +1,27 @@
 from collections.abc import Generator
 from datetime import datetime as DateTime
+from datetime import tzinfo
+from functools import lru_cache
 from typing import (
     Any,
     cast,
     Protocol,
 )
 
-import tzlocal
 from msgspec import (
+    defstruct,
     field,
     Struct,
 )
 from rich.repr import Result as RichRepr
 
 
-TZ_LOCAL = tzlocal.get_localzone()
+@lru_cache(maxsize=1)
+def local_timezone() -> tzinfo:
+    # looking up the local timezone is slow, so only do it when it's needed
+    import tzlocal
+
+    return tzlocal.get_localzone()
 
 
 class HasRichRepr(Protocol):
@@ -112,6 +119,11 @@ class _PackageMetadata(APIObject, tag_field="package_type", tag=normalise_tag):
 class ContainerMetadata(_PackageMetadata):
     container: dict
 
+    @property
+    def tags(self) -> list[str]:
+        # avoid the slower `__getattr__` fallback for the most used attribute
+        return self.container.get("tags", [])
+
     def __getattr__(self, name) -> Any:
         try:
             return self.container[name]
@@ -143,10 +155,82 @@ class PackageVersion(APIObject):
     created_at: DateTime
     updated_at: DateTime
     metadata: PackageMetadata
+    html_url: str | None = None
     package: Package | None = None
 
     def __rich_repr__(self) -> RichRepr:  # type: ignore
         yield str(self.package)
         yield "id", self.id
-        yield "updated_at", self.updated_at.astimezone(TZ_LOCAL).isoformat()
+        yield "updated_at", self.updated_at.astimezone(local_timezone()).isoformat()
         yield "metadata", self.metadata
+
+    @property
+    def tags(self) -> list[str]:
+        return getattr(self.metadata, "tags", [])
+
+
+# Lean projections of package versions, which skip decoding the fields they don't
+# declare. They're immutable and untracked by the garbage collector, which makes
+# decoding large listings considerably cheaper.
+class ContainerTags(Struct, frozen=True, gc=False):
+    tags: list[str] = []
+
+
+class ContainerTagsMetadata(Struct, frozen=True, gc=False):
+    container: ContainerTags = ContainerTags()
+
+    @property
+    def tags(self) -> list[str]:
+        return self.container.tags
+
+
+class PackageVersionSummary(Struct, frozen=True, gc=False):
+    """The fields of a package version needed to clean it up."""
+
+    id: int
+    updated_at: DateTime
+    metadata: ContainerTagsMetadata = ContainerTagsMetadata()
+
+    @property
+    def tags(self) -> list[str]:
+        return self.metadata.tags
+
+
+VERSION_FIELDS = {
+    "id": (int, field()),
+    "digest": (str, field(name="name")),
+    "url": (str, field()),
+    "html_url": (str | None, field(default=None)),
+    "created_at": (DateTime, field()),
+    "updated_at": (DateTime, field()),
+    "tags": (
+        ContainerTagsMetadata,
+        field(name="metadata", default_factory=ContainerTagsMetadata),
+    ),
+}
+
+
+@lru_cache
+def version_projection(*fields: str) -> type[Struct]:
+    """Return a lean struct to decode only the given fields of package versions.
+
+    The fields are any of `VERSION_FIELDS` and are available as attributes of
+    the decoded structs.
+    """
+    spec = []
+    for name in fields:
+        try:
+            type_, default = VERSION_FIELDS[name]
+        except KeyError:
+            msg = f"Unknown package version field: {name!r}"
+            raise ValueError(msg) from None
+        # the tags are decoded from the metadata and exposed by a property
+        spec.append(("metadata" if name == "tags" else name, type_, default))
+    return defstruct(
+        "PackageVersionProjection",
+        spec,
+        namespace=dict(tags=PackageVersionSummary.tags) if "tags" in fields else {},
+        kw_only=True,
+        frozen=True,
+        gc=False,
+    )
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import msgspec
+
+
+__all__ = (
+    "default_cache_dir",
+    "ResponseCache",
+)
+
+
+def default_cache_dir() -> Path:
+    """Return the default directory of the GitHub response cache."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "eq-devtools" / "github"
+
+
+class CacheEntry(msgspec.Struct, array_like=True):
+    url: str
+    headers: dict[str, str]
+    content: bytes
+    stored_at: float
+
+    @property
+    def etag(self) -> str | None:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> str | None:
+        return self.headers.get("last-modified")
+
+
+# the response headers needed to revalidate and paginate a cached response
+CACHED_HEADERS = ("etag", "last-modified", "link")
+
+
+class ResponseCache:
+    """A persistent cache of GitHub GET responses.
+
+    Cached responses are revalidated with conditional requests (`If-None-Match`
+    / `If-Modified-Since`), which GitHub answers with `304 Not Modified` without
+    counting them against the rate limit. Entries are keyed by the URL and a
+    hash of the token, so responses are never shared between identities.
+
+    Parameters
+    ----------
+    path : Path | str
+        The directory to store the cached responses in.
+    max_size : int
+        The maximum total size (in bytes) of the cached responses. The least
+        recently used entries are evicted when it is exceeded.
+    ttl : float
+        The time (in seconds) after which an entry is evicted.
+
+    """
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        *,
+        max_size: int = 256 * 2**20,
+        ttl: float = 7 * 24 * 60 * 60,
+    ) -> None:
+        self.path = Path(path or default_cache_dir())
+        self.max_size = max_size
+        self.ttl = ttl
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder(CacheEntry)
+        self._size: int | None = None
+
+    def _filepath(self, url: str, *, token: str | None) -> Path:
+        identity = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{identity}\n{url}".encode("utf-8")).hexdigest()
+        return self.path / key[:2] / key
+
+    def get(self, url: str, *, token: str | None) -> CacheEntry | None:
+        """Return the cached response for `url`, if any."""
+        filepath = self._filepath(url, token=token)
+        try:
+            entry = self._decoder.decode(filepath.read_bytes())
+        except (FileNotFoundError, msgspec.DecodeError):
+            return None
+        if entry.url != url or time.time() - entry.stored_at > self.ttl:
+            self._remove(filepath)
+            return None
+        # the mtime records when the entry was last used
+        os.utime(filepath)
+        return entry
+
+    def put(
+        self,
+        url: str,
+        *,
+        token: str | None,
+        headers: Mapping[str, str],
+        content: bytes,
+    ) -> None:
+        """Store a response which can be revalidated."""
+        headers = {
+            key: headers[key] for key in CACHED_HEADERS if headers.get(key) is not None
+        }
+        if "etag" not in headers and "last-modified" not in headers:
+            return
+        entry = CacheEntry(url, headers, content, time.time())
+        filepath = self._filepath(url, token=token)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        data = self._encoder.encode(entry)
+        self._remove(filepath)
+        tmp_filepath = filepath.with_suffix(f".{os.getpid()}.tmp")
+        tmp_filepath.write_bytes(data)
+        os.replace(tmp_filepath, filepath)
+        self._size = self.size() + len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def _remove(self, filepath: Path) -> None:
+        try:
+            size = filepath.stat().st_size
+            filepath.unlink()
+        except FileNotFoundError:
+            return
+        if self._size is not None:
+            self._size -= size
+
+    def _entries(self) -> list[tuple[Path, os.stat_result]]:
+        return [
+            (filepath, filepath.stat())
+            for filepath in self.path.glob("??/*")
+            if not filepath.name.endswith(".tmp")
+        ]
+
+    def size(self) -> int:
+        """Return the total size (in bytes) of the cached responses."""
+        if self._size is None:
+            self._size = sum(stat.st_size for _, stat in self._entries())
+        return self._size
+
+    def evict(self) -> None:
+        """Evict the expired entries, then the least recently used ones."""
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        for filepath, stat in entries:
+            if size <= self.max_size and now - stat.st_mtime <= self.ttl:
+                continue
+            filepath.unlink(missing_ok=True)
+            size -= stat.st_size
+        self._size = size
+
+    def clear(self) -> None:
+        """Remove all of the cached responses."""
+        for filepath, _ in self._entries():
+            filepath.unlink(missing_ok=True)
+        self._size = 0
@@ -1,7 +1,30 @@
+import itertools
+import math
 import os
+import random
 import re
+import time
+from collections.abc import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Mapping,
+)
+from contextlib import asynccontextmanager
+from contextvars import (
+    ContextVar,
+    Token,
+)
+from functools import (
+    lru_cache,
+    partial,
+)
 from typing import (
+    Any,
+    cast,
     Literal,
+    Self,
     Type,
     TypeVar,
 )
@@ -10,36 +33,390 @@ import gidgethub as gh
 import gidgethub.httpx
 import httpx
 import msgspec
+import trio
 from gidgethub.abc import GitHubAPI
 from yarl import URL
 
+from .cache import ResponseCache
+from .tracing import current_tracer
+
 
 __all__ = (
+    "aiter_items",
+    "aiter_pages",
+    "current_session",
     "delete",
     "get",
+    "GitHubError",
+    "is_transient",
+    "open_session",
+    "retry",
+    "Scheduler",
+    "Session",
+)
+
+
+_current_session: ContextVar["Session | None"] = ContextVar(
+    "current_session",
+    default=None,
 )
 
 
+def current_session() -> "Session | None":
+    """Return the innermost open `Session`, if any."""
+    return _current_session.get()
+
+
+class GitHubError(httpx.HTTPError):
+    """An error response from the GitHub API."""
+
+    def __init__(self, message: str, *, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class SchedulerStats(msgspec.Struct, kw_only=True):
+    requests: int
+    throttled: int
+    elapsed: float
+    waited: float
+    concurrency: int
+    peak_concurrency: int
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests in {self.elapsed:.1f}s "
+            f"({self.requests_per_second:.1f} req/s), "
+            f"concurrency {self.concurrency} (peak {self.peak_concurrency}), "
+            f"{self.throttled} throttled, {self.waited:.1f}s waiting on rate limits"
+        )
+
+
+class Scheduler:
+    """Adapt the concurrency of requests to GitHub's rate limits.
+
+    Every request acquires a slot from the scheduler. The number of slots grows
+    by one per successful request until the first throttled response (slow
+    start) and by one per window of successful requests after that. It is
+    halved whenever a request is throttled by a secondary rate limit (AIMD).
+
+    When a response reports that the rate limit budget is used up, or asks the
+    client to back off with `Retry-After`, no new requests are started until the
+    given time.
+
+    Parameters
+    ----------
+    initial_concurrency : int
+        The initial number of concurrent requests.
+    min_concurrency : int
+        The minimum number of concurrent requests.
+    max_concurrency : int
+        The maximum number of concurrent requests.
+    retries : int
+        The number of times a throttled request is retried.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        retries: int = 5,
+    ) -> None:
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self._concurrency = float(initial_concurrency)
+        self._limiter = trio.CapacityLimiter(initial_concurrency)
+        self._slow_start = True
+        self._resume_at = -math.inf
+        self._started_at: float | None = None
+        self._requests = 0
+        self._throttled = 0
+        self._waited = 0.0
+        self._peak_concurrency = initial_concurrency
+
+    @property
+    def concurrency(self) -> int:
+        return self._limiter.total_tokens
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[None, None]:
+        """Wait for a free slot (and the end of any pause) to make a request."""
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        async with self._limiter:
+            while (delay := self._resume_at - time.monotonic()) > 0:
+                await trio.sleep(delay)
+            yield
+
+    def _set_concurrency(self, concurrency: float) -> None:
+        concurrency = min(max(concurrency, self.min_concurrency), self.max_concurrency)
+        self._concurrency = concurrency
+        self._limiter.total_tokens = int(concurrency)
+        self._peak_concurrency = max(self._peak_concurrency, int(concurrency))
+
+    def _pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        resume_at = now + seconds
+        if resume_at > self._resume_at:
+            self._waited += resume_at - max(self._resume_at, now)
+            self._resume_at = resume_at
+
+    def update(self, status: int, headers: Mapping[str, str], content: bytes) -> bool:
+        """Update the scheduler from a response.
+
+        Returns whether the request was throttled and should be retried.
+        """
+        self._requests += 1
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        retry_after = headers.get("retry-after")
+        exhausted = remaining is not None and int(remaining) == 0
+        if exhausted and reset is not None:
+            # the primary rate limit is used up until the reset time
+            self._pause(max(int(reset) - time.time(), 0) + 1)
+
+        throttled = status == httpx.codes.TOO_MANY_REQUESTS or (
+            status == httpx.codes.FORBIDDEN
+            and (
+                exhausted
+                or retry_after is not None
+                or b"secondary rate limit" in content.lower()
+            )
+        )
+        if throttled:
+            self._throttled += 1
+            self._slow_start = False
+            self._set_concurrency(self._concurrency / 2)
+            self._pause(float(retry_after) if retry_after is not None else 60)
+        elif self._slow_start:
+            self._set_concurrency(self._concurrency + 1)
+        else:
+            self._set_concurrency(self._concurrency + 1 / self._concurrency)
+
+        return throttled
+
+    def stats(self) -> SchedulerStats:
+        """Return the throughput reached so far."""
+        started_at = self._started_at
+        return SchedulerStats(
+            requests=self._requests,
+            throttled=self._throttled,
+            elapsed=0.0 if started_at is None else time.monotonic() - started_at,
+            waited=self._waited,
+            concurrency=self.concurrency,
+            peak_concurrency=self._peak_concurrency,
+        )
+
+
+class Session:
+    """A pooled HTTP session shared by all requests to the GitHub API.
+
+    The session owns a single keep-alive connection pool (using HTTP/2 where the
+    server supports it) so that many requests reuse a handful of connections
+    instead of each paying for its own TLS handshake. While the session is open
+    it is used by default by `get` and `delete`.
+
+    API objects which rarely change can be memoized for the lifetime of the
+    session in `memo`.
+
+    Parameters
+    ----------
+    github_user : str, optional
+        The user making the requests. Defaults to the `GITHUB_USER` env var.
+    github_token : str, optional
+        The token to authenticate with. Defaults to the `GITHUB_TOKEN` env var.
+    timeout : int
+        The timeout (in seconds) of each request.
+    max_connections : int
+        The maximum number of connections in the pool.
+    http2 : bool
+        Whether to negotiate HTTP/2 with the server.
+    base_url : str, optional
+        The base URL of the GitHub REST API. Defaults to the `GITHUB_API_URL` env
+        var (as set by GitHub Actions), else `https://api.github.com`.
+    cache : ResponseCache, optional
+        A persistent cache of GET responses, which are revalidated with
+        conditional requests.
+    scheduler : Scheduler, optional
+        The scheduler which adapts the concurrency of the requests to the rate
+        limits. By default every session has its own scheduler.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        github_user: str | None = None,
+        github_token: str | None = None,
+        timeout: int = 30,
+        max_connections: int = 100,
+        http2: bool = True,
+        base_url: str | None = None,
+        cache: ResponseCache | None = None,
+        scheduler: Scheduler | None = None,
+    ) -> None:
+        self.github_user = github_user
+        self.github_token = github_token
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.base_url = base_url or os.environ.get("GITHUB_API_URL", gh.sansio.DOMAIN)
+        self.cache = cache
+        self.scheduler = scheduler or Scheduler()
+        self.memo: dict[Hashable, Any] = {}
+        self._client: httpx.AsyncClient | None = None
+        self._api: GitHubAPI | None = None
+        self._token: Token | None = None
+
+    @property
+    def api(self) -> GitHubAPI:
+        if self._api is None:
+            msg = f"{self.__class__.__name__!r} is not open"
+            raise RuntimeError(msg)
+        return self._api
+
+    async def aopen(self) -> None:
+        """Open the connection pool without making this the current session."""
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            headers={"accept-encoding": "gzip, deflate"},
+        )
+        self._api = gh.httpx.GitHubAPI(
+            self._client,
+            self.github_user or os.environ["GITHUB_USER"],
+            oauth_token=self.github_token or os.environ["GITHUB_TOKEN"],
+            base_url=self.base_url,
+        )
+
+    async def aclose(self) -> None:
+        self._api = None
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def __aenter__(self) -> Self:
+        await self.aopen()
+        self._token = _current_session.set(self)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        _current_session.reset(self._token)
+        self._token = None
+        await self.aclose()
+
+
+@asynccontextmanager
+async def open_session(
+    session: Session | None = None,
+    *,
+    github_user: str | None = None,
+    github_token: str | None = None,
+    timeout: int = 30,
+) -> AsyncGenerator[Session, None]:
+    """Use the given session, else the current one, else a temporary one.
+
+    The current session is only reused if no explicit credentials are given. A
+    temporary session doesn't become the current one, so this is also safe to
+    use in async generators.
+    """
+    if session is None and github_user is None and github_token is None:
+        session = current_session()
+    if session is not None:
+        yield session
+        return
+
+    session = Session(
+        github_user=github_user,
+        github_token=github_token,
+        timeout=timeout,
+    )
+    await session.aopen()
+    try:
+        yield session
+    finally:
+        await session.aclose()
+
+
 async def _request(
     method: Literal["GET", "DELETE"],
     url: str,
     *,
-    api: GitHubAPI,
+    session: Session,
 ) -> tuple[int, httpx.Headers, bytes]:
-    # print(gh.sansio.format_url(url, {}))
-    status, headers, content = await api._request(
-        method,
-        gh.sansio.format_url(url, {}),
-        headers=gh.sansio.create_headers(
-            api.requester,
-            accept="application/vnd.github.v3+json",
-            oauth_token=api.oauth_token,
-        ),
+    api = session.api
+    url = gh.sansio.format_url(url, {}, base_url=api.base_url)
+    request_headers = gh.sansio.create_headers(
+        api.requester,
+        accept="application/vnd.github.v3+json",
+        oauth_token=api.oauth_token,
     )
+    entry = None
+    if method == "GET" and session.cache is not None:
+        # revalidate a cached response with a conditional request
+        entry = session.cache.get(url, token=api.oauth_token)
+        if entry is not None and entry.etag is not None:
+            request_headers["if-none-match"] = entry.etag
+        elif entry is not None and entry.last_modified is not None:
+            request_headers["if-modified-since"] = entry.last_modified
+
+    scheduler = session.scheduler
+    tracer = current_tracer()
+    for attempt in range(scheduler.retries + 1):
+        queued_at = time.perf_counter()
+        async with scheduler.slot():
+            started_at = time.perf_counter()
+            status, headers, content = await api._request(
+                method,
+                url,
+                headers=request_headers,
+            )
+            finished_at = time.perf_counter()
+        throttled = scheduler.update(status, headers, content)
+        if tracer is not None:
+            tracer.record_request(
+                method,
+                url,
+                status=status,
+                headers=headers,
+                size=len(content),
+                queued_at=queued_at,
+                started_at=started_at,
+                finished_at=finished_at,
+                attempt=attempt,
+                throttled=throttled,
+            )
+        if not throttled:
+            break
+    if status == httpx.codes.NOT_MODIFIED and entry is not None:
+        return httpx.codes.OK, httpx.Headers(entry.headers), entry.content
     if httpx.codes.is_error(status):
-        msg = msgspec.json.decode(content)["message"]
+        try:
+            msg = msgspec.json.decode(content)["message"]
+        except (msgspec.DecodeError, KeyError, TypeError):
+            # e.g. an HTML error page from a proxy
+            msg = content.decode("utf-8", errors="replace")[:200]
         msg = f"{status}: {msg}\nurl = {url!r}"
-        raise httpx.HTTPError(msg)
+        raise GitHubError(msg, status=status)
+    if method == "GET" and session.cache is not None:
+        session.cache.put(
+            url,
+            token=api.oauth_token,
+            headers=headers,
+            content=content,
+        )
 
     return status, headers, content
 
@@ -47,6 +424,38 @@ async def _request(
 T = TypeVar("T")
 
 
+def is_transient(exc: BaseException) -> bool:
+    """Return whether a failed request may succeed if it is retried."""
+    if isinstance(exc, GitHubError):
+        return exc.status >= 500 or exc.status == httpx.codes.TOO_MANY_REQUESTS
+    return isinstance(exc, httpx.TransportError)
+
+
+async def retry(
+    async_fn: Callable[[], Awaitable[T]],
+    *,
+    retries: int = 3,
+    backoff: float = 0.5,
+    max_backoff: float = 30.0,
+) -> T:
+    """Call `async_fn`, retrying transient failures with jittered backoff.
+
+    The delay before the n-th retry is drawn uniformly from
+    `[0, min(max_backoff, backoff * 2**(n - 1))]` ("full jitter"), so that many
+    failed requests don't all retry at the same time.
+    """
+    for attempt in itertools.count(1):
+        try:
+            return await async_fn()
+        except Exception as exc:
+            if attempt > retries or not is_transient(exc):
+                raise
+        if (tracer := current_tracer()) is not None:
+            tracer.record_retry()
+        delay = min(max_backoff, backoff * 2 ** (attempt - 1))
+        await trio.sleep(random.uniform(0, delay))
+
+
 def parse_links(headers: httpx.Headers) -> dict[str, str]:
     links = {}
     key_regex = re.compile(r'\s*rel="(.*?)"\s*')
@@ -59,7 +468,37 @@ def parse_links(headers: httpx.Headers) -> dict[str, str]:
     return links
 
 
-async def get(
+@lru_cache(maxsize=64)
+def _decoder(model: Type[T]) -> msgspec.json.Decoder:
+    # `msgspec.json.decode` converts the type on every call, so reuse decoders
+    return msgspec.json.Decoder(model)
+
+
+async def _get_pages(
+    last: URL,
+    pages: range,
+    *,
+    model: Type[T],
+    session: Session,
+) -> list[T]:
+    # fetch the given pages concurrently, returning them in the order of `pages`
+    results: list[T | None] = [None] * len(pages)
+
+    async def _get_page(idx: int, page: int) -> None:
+        url = str(last.update_query(page=page))
+        status, headers, content = await retry(
+            partial(_request, "GET", url, session=session)
+        )
+        results[idx] = _decoder(model).decode(content)
+
+    async with trio.open_nursery() as nursery:
+        for idx, page in enumerate(pages):
+            nursery.start_soon(_get_page, idx, page)
+
+    return cast(list[T], results)
+
+
+async def aiter_pages(
     url: str,
     *,
     model: Type[T],
@@ -67,24 +506,98 @@ async def get(
     github_token: str | None = None,
     timeout: int = 30,
     per_page: int = 100,
-) -> T | dict:
+    max_parallel_pages: int = 8,
+    reverse: bool = False,
+    session: Session | None = None,
+) -> AsyncGenerator[T, None]:
+    """Iterate over the pages of the resource at `url`, decoded as `model`.
+
+    If the first page links to the `last` page, the remaining pages are fetched
+    in concurrent batches of `max_parallel_pages`. Otherwise the `next` links are
+    followed one after the other. Pages are only fetched as they are consumed.
+
+    With `reverse=True` the pages are yielded last-to-first (the first page is
+    yielded last). Since pages are offset based, this lets the consumer delete
+    the items of a yielded page without shifting items into pages it has yet to
+    see. Without a `last` link, all of the pages are listed in order before the
+    first of them is yielded.
+    """
     url = URL(url)
     if "per_page" not in url.query:
         url = url.update_query(per_page=per_page)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        api = gh.httpx.GitHubAPI(
-            client,
-            github_user or os.environ["GITHUB_USER"],
-            oauth_token=github_token or os.environ["GITHUB_TOKEN"],
+    async with open_session(
+        session,
+        github_user=github_user,
+        github_token=github_token,
+        timeout=timeout,
+    ) as session:
+        status, headers, content = await retry(
+            partial(_request, "GET", str(url), session=session)
         )
-        status, headers, content = await _request("GET", str(url), api=api)
-        res = msgspec.json.decode(content, type=model)
+        first_page = _decoder(model).decode(content)
         links = parse_links(headers)
-        while "next" in links:
-            status, headers, content = await _request("GET", links["next"], api=api)
-            res += msgspec.json.decode(content, type=model)
+        if "last" in links and "next" in links and (max_parallel_pages > 1 or reverse):
+            last = URL(links["last"])
+            num_pages = int(last.query["page"])
+            if reverse:
+                pages = range(num_pages, 1, -1)
+            else:
+                yield first_page
+                pages = range(2, num_pages + 1)
+            batch_size = max(max_parallel_pages, 1)
+            for start in range(0, len(pages), batch_size):
+                batch = pages[start : start + batch_size]
+                for page in await _get_pages(last, batch, model=model, session=session):
+                    yield page
+            if reverse:
+                yield first_page
+            return
+
+        listed = []
+        page = first_page
+        while True:
+            if reverse:
+                listed.append(page)
+            else:
+                yield page
+            if "next" not in links:
+                break
+            status, headers, content = await retry(
+                partial(_request, "GET", links["next"], session=session)
+            )
+            page = _decoder(model).decode(content)
             links = parse_links(headers)
+        for page in reversed(listed):
+            yield page
 
+
+async def aiter_items(url: str, **kwargs) -> AsyncGenerator[T, None]:
+    """Iterate over the items of the paginated list resource at `url`.
+
+    The keyword arguments are passed on to `aiter_pages`, where `model` is the
+    type of a page, e.g. `list[Package]`.
+    """
+    async for page in aiter_pages(url, **kwargs):
+        for item in page:
+            yield item
+
+
+async def get(
+    url: str,
+    *,
+    model: Type[T],
+    **kwargs,
+) -> T | dict:
+    """Get the (paginated) resource at `url` and decode it as `model`.
+
+    The keyword arguments are passed on to `aiter_pages`.
+    """
+    res = None
+    async for page in aiter_pages(url, model=model, **kwargs):
+        if res is None:
+            res = page
+        else:
+            res.extend(page)
     return res
 
 
@@ -94,12 +607,13 @@ async def delete(
     github_user: str | None = None,
     github_token: str | None = None,
     timeout: int = 30,
+    session: Session | None = None,
 ) -> T | dict:
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        api = gh.httpx.GitHubAPI(
-            client,
-            github_user or os.environ["GITHUB_USER"],
-            oauth_token=github_token or os.environ["GITHUB_TOKEN"],
-        )
-        status, headers, content = await _request("DELETE", url, api=api)
+    async with open_session(
+        session,
+        github_user=github_user,
+        github_token=github_token,
+        timeout=timeout,
+    ) as session:
+        status, headers, content = await _request("DELETE", url, session=session)
     assert not content
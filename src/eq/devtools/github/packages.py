@@ -1,29 +1,78 @@
 import re
+from collections import defaultdict
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Callable,
+    Iterable,
+)
 from datetime import date as Date
+from datetime import datetime as DateTime
+from datetime import time as Time
+from datetime import timedelta as TimeDelta
+from datetime import timezone as TimeZone
 from functools import partial
-from typing import cast
+from typing import (
+    cast,
+    TYPE_CHECKING,
+)
 from urllib.parse import quote_plus
 
+import msgspec
 import trio
 
+from eq.devtools.oci import (
+    copy_artifact,
+    Registry,
+)
+
 from .api import (
     Package,
     PackageVersion,
+    PackageVersionSummary,
 )
 from .client import (
+    aiter_pages,
+    current_session,
     delete,
     get,
+    GitHubError,
+    open_session,
+    retry,
+    Session,
 )
 
 
+if TYPE_CHECKING:
+    from .snapshot import Snapshot
+
+
 __all__ = (
+    "aiter_packages",
+    "aiter_package_versions",
+    "cleanup_package_versions",
+    "cleanup_packages",
+    "DeleteResult",
     "get_package",
+    "invalidate_package",
     "list_packages",
+    "list_package_tags",
     "list_package_versions",
+    "get_package_version",
     "delete_package_version",
+    "delete_package_version_ids",
+    "delete_package_versions",
+    "mirror_package",
+    "MirrorResult",
 )
 
 
+def _session_kwargs(kwargs: dict) -> dict:
+    # pop the arguments used to open a session from `kwargs`
+    keys = ("session", "github_user", "github_token", "timeout")
+    return {key: kwargs.pop(key) for key in keys if key in kwargs}
+
+
 async def list_packages(owner: str, **kwargs) -> list[Package]:
     # https://docs.github.com/en/rest/packages/packages#list-packages-for-an-organization
     kwargs.setdefault("model", list[Package])
@@ -31,16 +80,70 @@ async def list_packages(owner: str, **kwargs) -> list[Package]:
     return cast(list[Package], res)
 
 
+async def aiter_packages(
+    owner: str,
+    **kwargs,
+) -> AsyncGenerator[list[Package], None]:
+    """Iterate over the pages of the packages of an owner as they arrive.
+
+    The keyword arguments are passed on to `aiter_pages`.
+    """
+    kwargs.setdefault("model", list[Package])
+    async for page in aiter_pages(
+        f"orgs/{owner}/packages?package_type=container",
+        **kwargs,
+    ):
+        yield page
+
+
 async def get_package(owner: str, package: str, **kwargs) -> Package:
     # https://docs.github.com/en/rest/packages/packages#get-a-package-for-an-organization
-    kwargs.setdefault("model", Package)
-    res = await get(
-        f"orgs/{owner}/packages/container/{quote_plus(package)}",
-        **kwargs,
-    )
+    model = kwargs.pop("model", None)
+    async with open_session(**_session_kwargs(kwargs)) as session:
+        key = (Package, owner, package)
+        if model is None and key in session.memo:
+            return session.memo[key]
+        res = await get(
+            f"orgs/{owner}/packages/container/{quote_plus(package)}",
+            model=model or Package,
+            session=session,
+            **kwargs,
+        )
+        if model is None:
+            session.memo[key] = res
     return cast(Package, res)
 
 
+def invalidate_package(
+    owner: str,
+    package: str,
+    *,
+    session: Session | None = None,
+) -> None:
+    """Forget the package memoized by `get_package` in the (current) session."""
+    session = session or current_session()
+    if session is not None:
+        session.memo.pop((Package, owner, package), None)
+
+
+async def aiter_package_versions(
+    owner: str,
+    package: str,
+    **kwargs,
+) -> AsyncGenerator[list[PackageVersion], None]:
+    """Iterate over the pages of the versions of a package as they arrive.
+
+    The keyword arguments are passed on to `aiter_pages`. Unlike
+    `list_package_versions`, the `package` attribute of the versions isn't set.
+    """
+    kwargs.setdefault("model", list[PackageVersion])
+    async for page in aiter_pages(
+        f"/orgs/{owner}/packages/container/{quote_plus(package)}/versions",
+        **kwargs,
+    ):
+        yield page
+
+
 async def list_package_versions(
     owner: str,
     package: str,
@@ -50,34 +153,65 @@ async def list_package_versions(
     model = kwargs.pop("model", None)
     has_model = model is not None
     model = model or list[PackageVersion]
-    res = await get(
-        f"/orgs/{owner}/packages/container/{quote_plus(package)}/versions",
-        model=model,
-        **kwargs,
-    )
-    if has_model:
-        # if a custom model is specified, don't set the package attribute
-        return res
+    async with open_session(**_session_kwargs(kwargs)) as session:
+        url = f"/orgs/{owner}/packages/container/{quote_plus(package)}/versions"
+        if has_model:
+            # if a custom model is specified, don't set the package attribute
+            return await get(url, model=model, session=session, **kwargs)
+
+        package_obj: Package | None = None
+
+        async def _get_package() -> None:
+            nonlocal package_obj
+            package_obj = await get_package(owner, package, session=session)
+
+        # fetch the package while the versions are being listed
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(_get_package)
+            res = await get(url, model=model, session=session, **kwargs)
 
-    package_obj = await get_package(owner, package, **kwargs)
     for package_version in res:
         package_version.package = package_obj
 
     return cast(list[PackageVersion], res)
 
 
-async def delete_package_version(
+async def get_package_version(
     owner: str, package: str, *, version_id: int, **kwargs
-) -> None:
-    # https://docs.github.com/en/rest/packages/packages#delete-package-version-for-an-organization
-    await delete(
+) -> PackageVersion:
+    # https://docs.github.com/en/rest/packages/packages#get-a-package-version-for-an-organization
+    kwargs.setdefault("model", PackageVersion)
+    res = await get(
         f"/orgs/{owner}/packages/container/{quote_plus(package)}/versions/{version_id:d}",
         **kwargs,
     )
+    return cast(PackageVersion, res)
+
+
+async def delete_package_version(
+    owner: str, package: str, *, version_id: int, **kwargs
+) -> None:
+    # https://docs.github.com/en/rest/packages/packages#delete-package-version-for-an-organization
+    async with open_session(**_session_kwargs(kwargs)) as session:
+        await delete(
+            f"/orgs/{owner}/packages/container/{quote_plus(package)}/versions/{version_id:d}",
+            session=session,
+            **kwargs,
+        )
+    # the package is updated when one of its versions is deleted
+    invalidate_package(owner, package, session=session)
 
 
 async def _get_versions(self) -> list[PackageVersion]:
-    return await list_package_versions(self.owner.login, self.name)
+    res = await list_package_versions(
+        self.owner.login,
+        self.name,
+        model=list[PackageVersion],
+    )
+    # the versions belong to this package, so there's no need to fetch it again
+    for package_version in res:
+        package_version.package = self
+    return res
 
 
 # Monkey-patch Package to add versions property
@@ -87,7 +221,7 @@ setattr(Package, "versions", property(_get_versions))
 # Monkey-patch PackageVersion to add delete method
 async def _delete(self) -> None:
     await delete_package_version(
-        self.package.owner,
+        self.package.owner.login,
         self.package.name,
         version_id=self.id,
     )
@@ -96,26 +230,186 @@ async def _delete(self) -> None:
 PackageVersion.delete = _delete
 
 
+class DeleteResult(msgspec.Struct, kw_only=True):
+    """The outcome of deleting a package version."""
+
+    id: int
+    attempts: int
+    error: str | None = None
+    version: PackageVersion | PackageVersionSummary | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _delete_with_retries(
+    owner: str,
+    package: str,
+    package_version: PackageVersion | PackageVersionSummary | int,
+    *,
+    retries: int,
+    session: Session,
+) -> DeleteResult:
+    if isinstance(package_version, int):
+        version, version_id = None, package_version
+    else:
+        version, version_id = package_version, package_version.id
+    attempts = 0
+
+    async def _delete() -> None:
+        nonlocal attempts
+        attempts += 1
+        await delete_package_version(
+            owner,
+            package,
+            version_id=version_id,
+            session=session,
+        )
+
+    # only capture `Exception`s so that cancellation still propagates
+    try:
+        await retry(_delete, retries=retries)
+    except GitHubError as exc:
+        # a failed attempt may still have deleted the version before the retry
+        error = None if exc.status == 404 and attempts > 1 else str(exc)
+    except Exception as exc:
+        error = str(exc) or repr(exc)
+    else:
+        error = None
+    return DeleteResult(id=version_id, attempts=attempts, error=error, version=version)
+
+
+async def _delete_versions(
+    owner: str,
+    package: str,
+    receive_channel: trio.MemoryReceiveChannel[PackageVersion | int],
+    *,
+    max_parallel: int,
+    retries: int,
+    on_result: Callable[[DeleteResult], None] | None = None,
+    session: Session,
+) -> list[DeleteResult]:
+    # delete the versions received from the channel with `max_parallel` workers
+    results: list[DeleteResult] = []
+
+    async def _worker(
+        receive_channel: trio.MemoryReceiveChannel[PackageVersion | int],
+    ) -> None:
+        async with receive_channel:
+            async for package_version in receive_channel:
+                result = await _delete_with_retries(
+                    owner,
+                    package,
+                    package_version,
+                    retries=retries,
+                    session=session,
+                )
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+
+    async with trio.open_nursery() as nursery, receive_channel:
+        for _ in range(max_parallel):
+            nursery.start_soon(_worker, receive_channel.clone())
+
+    return results
+
+
+async def delete_package_version_ids(
+    owner: str,
+    package: str,
+    version_ids: Iterable[int] | AsyncIterable[int],
+    *,
+    max_parallel: int = 30,
+    retries: int = 3,
+    on_result: Callable[[DeleteResult], None] | None = None,
+    session: Session | None = None,
+) -> list[DeleteResult]:
+    """Delete the versions of a package with the given ids concurrently.
+
+    The ids are consumed lazily by `max_parallel` workers, so `version_ids` may
+    be a (async) stream of any length. `on_result` is called with the result of
+    each delete as it completes. Failures are handled as in
+    `delete_package_versions`.
+    """
+
+    async def _send(send_channel: trio.MemorySendChannel[int]) -> None:
+        async with send_channel:
+            if isinstance(version_ids, AsyncIterable):
+                async for version_id in version_ids:
+                    await send_channel.send(version_id)
+            else:
+                for version_id in version_ids:
+                    await send_channel.send(version_id)
+
+    send_channel, receive_channel = trio.open_memory_channel(max_parallel)
+    async with open_session(session) as session, trio.open_nursery() as nursery:
+        nursery.start_soon(_send, send_channel)
+        return await _delete_versions(
+            owner,
+            package,
+            receive_channel,
+            max_parallel=max_parallel,
+            retries=retries,
+            on_result=on_result,
+            session=session,
+        )
+
+
 async def delete_package_versions(
     *package_versions: PackageVersion,
     max_parallel: int = 30,
-) -> list[PackageVersion]:
-    # FIXME: handle errors with outcome
-    limiter = trio.CapacityLimiter(max_parallel)
+    retries: int = 3,
+    session: Session | None = None,
+) -> list[DeleteResult]:
+    """Delete the given package versions concurrently.
 
-    async def _delete(
-        package_version: PackageVersion,
+    Transient failures are retried with jittered backoff and any other failure
+    is recorded in the result of the version, without affecting the others.
+    """
+    by_package: dict[tuple[str, str], list[PackageVersion]] = defaultdict(list)
+    for package_version in package_versions:
+        package = package_version.package
+        by_package[package.owner.login, package.name].append(package_version)
+
+    async def _delete_package_versions(
+        owner: str,
+        package: str,
+        package_versions: list[PackageVersion],
         *,
-        limiter: trio.CapacityLimiter,
+        results: list[DeleteResult],
+        session: Session,
     ) -> None:
-        async with limiter:
-            await package_version.delete()
+        send_channel, receive_channel = trio.open_memory_channel(len(package_versions))
+        async with send_channel:
+            for package_version in package_versions:
+                send_channel.send_nowait(package_version)
+        results += await _delete_versions(
+            owner,
+            package,
+            receive_channel,
+            max_parallel=max_parallel,
+            retries=retries,
+            session=session,
+        )
 
-    async with trio.open_nursery() as nursery:
-        for package_version in package_versions:
-            nursery.start_soon(partial(_delete, limiter=limiter), package_version)
+    results: list[DeleteResult] = []
+    # share one connection pool between all of the deletes
+    async with open_session(session) as session, trio.open_nursery() as nursery:
+        for (owner, package), versions in by_package.items():
+            nursery.start_soon(
+                partial(
+                    _delete_package_versions,
+                    results=results,
+                    session=session,
+                ),
+                owner,
+                package,
+                versions,
+            )
 
-    return list(package_versions)
+    return results
 
 
 async def cleanup_package_versions(
@@ -125,23 +419,324 @@ async def cleanup_package_versions(
     tags_to_keep: list[str] = ["latest", r"\d+\.\d+\.\d+"],
     max_age: int = 7,
     max_parallel: int = 30,
+    retries: int = 3,
+    on_result: Callable[[DeleteResult], None] | None = None,
+    snapshot: "Snapshot | None" = None,
     **kwargs,
-) -> list[PackageVersion]:
+) -> list[DeleteResult]:
+    """Delete the expired, untagged versions of a package.
+
+    The versions are streamed page by page to `max_parallel` delete workers, so
+    deleting starts as soon as the first page has been listed. Failed deletes
+    are retried or recorded as in `delete_package_versions` and `on_result` is
+    called with the result of each delete as it completes.
+
+    If a `snapshot` is given, it's synced and the expired versions are read from
+    it instead of listing all of the versions. Since an incremental sync misses
+    older versions which were tagged since, each of them is fetched again and
+    only deleted if it should still be, or recorded as a failed delete if it can't
+    be fetched. The deleted versions are removed from the snapshot.
+    """
     tags_to_keep = re.compile(f"^({'|'.join(tags_to_keep)})$")
     today = Date.today()
 
-    def has_expired(pv: PackageVersion) -> bool:
+    def should_delete(pv: PackageVersion | PackageVersionSummary) -> bool:
         age: int = (today - pv.updated_at.date()).days
-        return age > max_age
-
-    versions_to_delete = [
-        package_version
-        for package_version in await list_package_versions(owner, package, **kwargs)
-        if has_expired(package_version)
-        and not any(map(tags_to_keep.match, package_version.metadata.tags))
-    ]
-    deleted = await delete_package_versions(
-        *versions_to_delete,
-        max_parallel=max_parallel,
-    )
-    return deleted
+        return age > max_age and not any(map(tags_to_keep.match, pv.metadata.tags))
+
+    # the candidates of a snapshot which couldn't be fetched again
+    recheck_results: list[DeleteResult] = []
+
+    async def _recheck(
+        receive_channel: trio.MemoryReceiveChannel[PackageVersion],
+        send_channel: trio.MemorySendChannel[PackageVersionSummary],
+        *,
+        session: Session,
+    ) -> None:
+        async with receive_channel, send_channel:
+            async for candidate in receive_channel:
+                attempts = 0
+
+                async def _get() -> PackageVersionSummary:
+                    nonlocal attempts
+                    attempts += 1
+                    return await get_package_version(
+                        owner,
+                        package,
+                        version_id=candidate.id,
+                        model=PackageVersionSummary,
+                        session=session,
+                    )
+
+                # only capture `Exception`s so that cancellation still propagates
+                try:
+                    package_version = await retry(_get, retries=retries)
+                except GitHubError as exc:
+                    # the version was already deleted
+                    if exc.status == 404:
+                        continue
+                    error = str(exc)
+                except Exception as exc:
+                    error = str(exc) or repr(exc)
+                else:
+                    if should_delete(package_version):
+                        await send_channel.send(package_version)
+                    continue
+                result = DeleteResult(
+                    id=candidate.id,
+                    attempts=attempts,
+                    error=error,
+                    version=candidate,
+                )
+                recheck_results.append(result)
+                if on_result is not None:
+                    on_result(result)
+
+    async def _list(
+        send_channel: trio.MemorySendChannel[PackageVersion | PackageVersionSummary],
+        *,
+        session: Session,
+    ) -> None:
+        async with send_channel:
+            if snapshot is not None:
+                # only the versions updated before this (UTC) day can be expired
+                expires_on = today - TimeDelta(days=max_age)
+                candidates = snapshot.iter_versions(
+                    owner,
+                    package,
+                    updated_before=DateTime.combine(
+                        expires_on, Time(), tzinfo=TimeZone.utc
+                    ),
+                )
+                # fetch the candidates again with `max_parallel` workers
+                candidate_send, candidate_receive = trio.open_memory_channel(0)
+                async with trio.open_nursery() as nursery, candidate_receive:
+                    for _ in range(max_parallel):
+                        nursery.start_soon(
+                            partial(_recheck, session=session),
+                            candidate_receive.clone(),
+                            send_channel.clone(),
+                        )
+                    async with candidate_send:
+                        for package_version in candidates:
+                            if should_delete(package_version):
+                                await candidate_send.send(package_version)
+                return
+
+            # list last-to-first so that deletes don't shift unseen versions, and
+            # only decode the fields needed to select them
+            async for page in aiter_package_versions(
+                owner,
+                package,
+                reverse=True,
+                session=session,
+                model=list[PackageVersionSummary],
+                **kwargs,
+            ):
+                for package_version in page:
+                    if should_delete(package_version):
+                        await send_channel.send(package_version)
+
+    async with open_session(**_session_kwargs(kwargs)) as session:
+        if snapshot is not None:
+            await snapshot.sync(owner, package, session=session, **kwargs)
+        send_channel, receive_channel = trio.open_memory_channel(max_parallel)
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(partial(_list, session=session), send_channel)
+            results = await _delete_versions(
+                owner,
+                package,
+                receive_channel,
+                max_parallel=max_parallel,
+                retries=retries,
+                on_result=on_result,
+                session=session,
+            )
+    results += recheck_results
+
+    if snapshot is not None:
+        snapshot.remove_versions(
+            owner,
+            package,
+            (result.id for result in results if result.ok),
+        )
+    return results
+
+
+async def cleanup_packages(
+    owner: str,
+    *,
+    repository: str | None = None,
+    name_regex: str | None = None,
+    max_parallel_packages: int = 8,
+    **kwargs,
+) -> dict[str, list[DeleteResult]]:
+    """Delete the expired, untagged versions of all packages of an owner.
+
+    The packages can be filtered by the full name of their `repository` and by
+    a `name_regex` matching their name. Up to `max_parallel_packages` packages
+    are cleaned up concurrently, sharing one session (and so one connection
+    pool and rate limit budget). The remaining keyword arguments are passed on
+    to `cleanup_package_versions`.
+    """
+    pattern = re.compile(name_regex) if name_regex is not None else None
+
+    def is_selected(package: Package) -> bool:
+        if repository is not None and package.repository.full_name != repository:
+            return False
+        return pattern is None or pattern.search(package.name) is not None
+
+    results: dict[str, list[DeleteResult]] = {}
+    limiter = trio.CapacityLimiter(max_parallel_packages)
+
+    async def _cleanup(package: str, *, session: Session) -> None:
+        async with limiter:
+            results[package] = await cleanup_package_versions(
+                owner,
+                package,
+                session=session,
+                **kwargs,
+            )
+
+    async with open_session(**_session_kwargs(kwargs)) as session:
+        packages = await list_packages(owner, session=session)
+        async with trio.open_nursery() as nursery:
+            for package in packages:
+                if is_selected(package):
+                    nursery.start_soon(partial(_cleanup, session=session), package.name)
+
+    return {package: results[package] for package in sorted(results)}
+
+
+async def list_package_tags(
+    owner: str,
+    package: str,
+    *,
+    missing_ok: bool = False,
+    **kwargs,
+) -> list[str]:
+    """Return the tags of the versions of a package.
+
+    Only the tags of the versions are decoded. If `missing_ok` is set, a package
+    which doesn't exist has no tags, rather than raising a `GitHubError`. The
+    keyword arguments are passed on to `aiter_package_versions`.
+    """
+    tags: list[str] = []
+    try:
+        async for page in aiter_package_versions(
+            owner,
+            package,
+            model=list[PackageVersionSummary],
+            **kwargs,
+        ):
+            for package_version in page:
+                tags.extend(package_version.tags)
+    except GitHubError as exc:
+        if not (missing_ok and exc.status == 404):
+            raise
+    return tags
+
+
+class MirrorResult(msgspec.Struct, kw_only=True):
+    """The outcome of mirroring a tag of a package."""
+
+    tag: str
+    digest: str | None = None
+    # the number of blobs which were already there, mounted or copied
+    existing: int = 0
+    mounted: int = 0
+    copied: int = 0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def mirror_package(
+    from_owner: str,
+    package: str,
+    *,
+    to_owner: str,
+    registry_url: str = "https://ghcr.io",
+    max_parallel: int = 8,
+    on_result: Callable[[MirrorResult], None] | None = None,
+    **kwargs,
+) -> list[MirrorResult]:
+    """Copy the tags of a container package to another owner, e.g. staging to prod.
+
+    The tags of both packages are listed with the packages API, and only the
+    tags missing on the destination (which may not have the package yet) are
+    copied, up to `max_parallel` at once over one connection pool to the
+    registry. A source package which doesn't exist raises a `GitHubError`. The
+    layers are mounted from the source repository where the registry allows it,
+    so they're never transferred (see `eq.devtools.oci.copy_artifact`).
+    Failures are recorded in the results and `on_result` is called with the
+    result of each tag as it completes.
+    """
+    source = f"{from_owner}/{package}".lower()
+    destination = f"{to_owner}/{package}".lower()
+    results: list[MirrorResult] = []
+    limiter = trio.CapacityLimiter(max_parallel)
+
+    async def _mirror(tag: str, *, registry: Registry) -> None:
+        async with limiter:
+            # only capture `Exception`s so that cancellation still propagates
+            try:
+                copied = await copy_artifact(
+                    registry,
+                    source,
+                    tag,
+                    destination_repository=destination,
+                )
+            except Exception as exc:
+                result = MirrorResult(tag=tag, error=str(exc) or repr(exc))
+            else:
+                result = MirrorResult(
+                    tag=tag,
+                    digest=copied.digest,
+                    existing=copied.count("existing"),
+                    mounted=copied.count("mounted"),
+                    copied=copied.count("copied"),
+                )
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    async with open_session(**_session_kwargs(kwargs)) as session:
+        tags: dict[str, list[str]] = {}
+        errors: list[Exception] = []
+
+        async def _list_tags(owner: str) -> None:
+            # raise errors outside of the nursery, so that they aren't wrapped
+            # in an exception group
+            try:
+                tags[owner] = await list_package_tags(
+                    owner,
+                    package,
+                    # the package is created on the destination by the first push
+                    missing_ok=owner == to_owner,
+                    session=session,
+                    **kwargs,
+                )
+            except Exception as exc:
+                errors.append(exc)
+
+        async with trio.open_nursery() as nursery:
+            for owner in (from_owner, to_owner):
+                nursery.start_soon(_list_tags, owner)
+        if errors:
+            raise errors[0]
+        missing = [tag for tag in tags[from_owner] if tag not in tags[to_owner]]
+
+        registry = Registry(
+            registry_url,
+            username=session.api.requester,
+            password=session.api.oauth_token,
+        )
+        async with registry, trio.open_nursery() as nursery:
+            for tag in missing:
+                nursery.start_soon(partial(_mirror, registry=registry), tag)
+
+    order = {tag: idx for idx, tag in enumerate(missing)}
+    return sorted(results, key=lambda result: order[result.tag])
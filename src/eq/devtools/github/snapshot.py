@@ -0,0 +1,312 @@
+import sqlite3
+from collections.abc import (
+    Iterable,
+    Iterator,
+)
+from contextlib import aclosing
+from datetime import datetime as DateTime
+from pathlib import Path
+from typing import Self
+
+import msgspec
+import trio
+
+from .api import (
+    Package,
+    PackageVersion,
+)
+from .cache import default_cache_dir
+from .client import (
+    open_session,
+    Session,
+)
+from .packages import (
+    _session_kwargs,
+    aiter_package_versions,
+    get_package,
+)
+
+
+__all__ = (
+    "default_snapshot_path",
+    "Snapshot",
+    "SyncStats",
+)
+
+
+def default_snapshot_path() -> Path:
+    """Return the default path of the package version snapshot."""
+    return default_cache_dir().parent / "snapshot.sqlite"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (owner, name)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    owner TEXT NOT NULL,
+    package TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (owner, package, id)
+);
+CREATE INDEX IF NOT EXISTS versions_updated_at
+    ON versions (owner, package, updated_at);
+CREATE TABLE IF NOT EXISTS version_tags (
+    owner TEXT NOT NULL,
+    package TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (owner, package, id, tag)
+);
+CREATE INDEX IF NOT EXISTS version_tags_tag
+    ON version_tags (owner, package, tag);
+"""
+
+
+class SyncStats(msgspec.Struct, kw_only=True):
+    """The changes applied to a snapshot by `Snapshot.sync`."""
+
+    pages: int = 0
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.pages} pages, {self.added} added, {self.updated} updated, "
+            f"{self.deleted} deleted"
+        )
+
+
+class Snapshot:
+    """A local SQLite snapshot of the versions of packages.
+
+    The snapshot is kept up to date incrementally with `sync`, after which the
+    versions can be queried by tag and age without listing them again.
+
+    Parameters
+    ----------
+    path : Path | str, optional
+        The path of the SQLite database. Defaults to `default_snapshot_path()`.
+
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path or default_snapshot_path())
+        self._db: sqlite3.Connection | None = None
+        self._encoder = msgspec.json.Encoder()
+        self._package_decoder = msgspec.json.Decoder(Package)
+        self._version_decoder = msgspec.json.Decoder(PackageVersion)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_package(self, owner: str, package: str) -> Package | None:
+        """Return the snapshot of a package, if any."""
+        row = self.db.execute(
+            "SELECT data FROM packages WHERE owner = ? AND name = ?",
+            (owner, package),
+        ).fetchone()
+        return None if row is None else self._package_decoder.decode(row[0])
+
+    def put_package(self, package: Package) -> None:
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO packages VALUES (?, ?, ?)",
+                (package.owner.login, package.name, self._encoder.encode(package)),
+            )
+
+    def _version_state(self, owner: str, package: str) -> dict[int, float]:
+        rows = self.db.execute(
+            "SELECT id, updated_at FROM versions WHERE owner = ? AND package = ?",
+            (owner, package),
+        )
+        return dict(rows)
+
+    def put_versions(
+        self,
+        owner: str,
+        package: str,
+        package_versions: Iterable[PackageVersion],
+    ) -> None:
+        """Insert or update the given versions of a package."""
+        rows, tag_rows = [], []
+        for package_version in package_versions:
+            rows.append((
+                owner,
+                package,
+                package_version.id,
+                package_version.updated_at.timestamp(),
+                self._encoder.encode(package_version),
+            ))
+            tags = getattr(package_version.metadata, "tags", [])
+            tag_rows += [(owner, package, package_version.id, tag) for tag in tags]
+        with self.db:
+            self.db.executemany(
+                "DELETE FROM version_tags WHERE owner = ? AND package = ? AND id = ?",
+                [row[:3] for row in rows],
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.db.executemany(
+                "INSERT INTO version_tags VALUES (?, ?, ?, ?)",
+                tag_rows,
+            )
+
+    def remove_versions(
+        self,
+        owner: str,
+        package: str,
+        version_ids: Iterable[int],
+    ) -> None:
+        """Remove the versions with the given ids from the snapshot."""
+        rows = [(owner, package, version_id) for version_id in version_ids]
+        with self.db:
+            for table in ("versions", "version_tags"):
+                self.db.executemany(
+                    f"DELETE FROM {table} WHERE owner = ? AND package = ? AND id = ?",
+                    rows,
+                )
+
+    def iter_versions(
+        self,
+        owner: str,
+        package: str,
+        *,
+        tag: str | None = None,
+        updated_before: DateTime | None = None,
+        model: type | None = None,
+    ) -> Iterator[PackageVersion]:
+        """Iterate over the versions of a package in the snapshot, newest first.
+
+        The versions can be filtered by `tag` and by whether they were last
+        updated before `updated_before`, both of which are indexed. If a `model`
+        is given, e.g. a `version_projection`, the versions are decoded as it
+        and their `package` attribute isn't set.
+        """
+        query = "SELECT v.data FROM versions v"
+        params: list = []
+        if tag is not None:
+            query += " JOIN version_tags t USING (owner, package, id) WHERE t.tag = ?"
+            params.append(tag)
+        else:
+            query += " WHERE 1"
+        query += " AND v.owner = ? AND v.package = ?"
+        params += [owner, package]
+        if updated_before is not None:
+            query += " AND v.updated_at < ?"
+            params.append(updated_before.timestamp())
+        query += " ORDER BY v.id DESC"
+
+        if model is not None:
+            decoder = msgspec.json.Decoder(model)
+            for (data,) in self.db.execute(query, params):
+                yield decoder.decode(data)
+            return
+
+        package_obj = self.get_package(owner, package)
+        for (data,) in self.db.execute(query, params):
+            package_version = self._version_decoder.decode(data)
+            package_version.package = package_obj
+            yield package_version
+
+    def list_versions(self, owner: str, package: str, **kwargs) -> list[PackageVersion]:
+        """Return the versions of a package in the snapshot, newest first.
+
+        The keyword arguments are passed on to `iter_versions`.
+        """
+        return list(self.iter_versions(owner, package, **kwargs))
+
+    async def sync(
+        self,
+        owner: str,
+        package: str,
+        *,
+        full: bool = False,
+        **kwargs,
+    ) -> SyncStats:
+        """Bring the snapshot of a package up to date with GitHub.
+
+        The versions are listed newest first and the listing stops at the first
+        page whose versions are all already known and unchanged. Versions which
+        are missing from the listed pages are deleted from the snapshot.
+
+        Since the listing is ordered by creation, an older version whose tags
+        changed since the last sync is only updated by a `full` sync, which
+        lists all of the versions (and so detects all of the deletions). The
+        remaining keyword arguments are passed on to `aiter_pages`.
+        """
+        known = self._version_state(owner, package)
+        stats = SyncStats()
+        seen: set[int] = set()
+        is_complete = True
+
+        async def _get_package(session: Session) -> None:
+            self.put_package(await get_package(owner, package, session=session))
+
+        async with (
+            open_session(**_session_kwargs(kwargs)) as session,
+            trio.open_nursery() as nursery,
+        ):
+            nursery.start_soon(_get_package, session)
+            pages = aiter_package_versions(
+                owner,
+                package,
+                session=session,
+                # fetch one page at a time so that the listing can stop early
+                max_parallel_pages=1,
+                **kwargs,
+            )
+            async with aclosing(pages):
+                async for page in pages:
+                    stats.pages += 1
+                    changed = [
+                        package_version
+                        for package_version in page
+                        if known.get(package_version.id)
+                        != package_version.updated_at.timestamp()
+                    ]
+                    for package_version in changed:
+                        if package_version.id in known:
+                            stats.updated += 1
+                        else:
+                            stats.added += 1
+                    self.put_versions(owner, package, changed)
+                    seen.update(package_version.id for package_version in page)
+                    if page and not changed and not full:
+                        is_complete = False
+                        break
+
+        # the versions which are missing from the listed window were deleted
+        oldest_id = min(seen, default=0) if not is_complete else 0
+        deleted = [
+            version_id
+            for version_id in known
+            if version_id not in seen and version_id >= oldest_id
+        ]
+        self.remove_versions(owner, package, deleted)
+        stats.deleted = len(deleted)
+        return stats
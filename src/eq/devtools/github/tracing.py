@@ -0,0 +1,266 @@
+import json
+import re
+import statistics
+import time
+from collections import Counter
+from collections.abc import Mapping
+from contextvars import ContextVar
+from pathlib import Path
+
+import msgspec
+import trio
+
+
+__all__ = (
+    "current_tracer",
+    "RequestRecord",
+    "set_tracer",
+    "TraceSummary",
+    "Tracer",
+    "url_template",
+)
+
+
+_current_tracer: ContextVar["Tracer | None"] = ContextVar(
+    "current_tracer",
+    default=None,
+)
+
+
+def current_tracer() -> "Tracer | None":
+    """Return the tracer which records the requests, if any."""
+    return _current_tracer.get()
+
+
+def set_tracer(tracer: "Tracer | None") -> None:
+    """Set the tracer which records the requests made in the current context."""
+    _current_tracer.set(tracer)
+
+
+_TEMPLATE_PATTERNS = (
+    (re.compile(r"^/(orgs|users)/[^/]+"), r"/\1/{owner}"),
+    (re.compile(r"/packages/(\w+)/[^/]+"), r"/packages/\1/{package}"),
+    (re.compile(r"/versions/\d+"), "/versions/{version_id}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{id}"),
+)
+
+
+def url_template(url: str) -> str:
+    """Return the path of `url` with its identifiers replaced by placeholders."""
+    path = re.sub(r"^\w+://[^/]+", "", url).split("?")[0]
+    for pattern, repl in _TEMPLATE_PATTERNS:
+        path = pattern.sub(repl, path)
+    return path
+
+
+class RequestRecord(msgspec.Struct, kw_only=True, gc=False):
+    """A request made to the GitHub API, with times relative to the trace."""
+
+    method: str
+    url: str
+    status: int
+    queued: float
+    start: float
+    duration: float
+    size: int
+    attempt: int
+    throttled: bool
+    rate_limit_remaining: int | None
+    task: int
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+class TraceSummary(msgspec.Struct, kw_only=True):
+    requests: int
+    by_status: dict[int, int]
+    by_url: dict[str, int]
+    elapsed: float
+    p50: float
+    p95: float
+    p99: float
+    queued: float
+    throttled: int
+    retries: int
+    received: int
+    rate_limit_remaining: int | None
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        statuses = sorted(self.by_status.items())
+        lines = [
+            f"{self.requests} requests in {self.elapsed:.2f}s "
+            f"({self.requests_per_second:.1f} req/s), "
+            f"{self.received / 2**20:.1f} MiB received",
+            f"latency p50 {self.p50 * 1000:.0f}ms, p95 {self.p95 * 1000:.0f}ms, "
+            f"p99 {self.p99 * 1000:.0f}ms",
+            f"{self.queued:.2f}s waiting on concurrency and rate limits, "
+            f"{self.throttled} throttled, {self.retries} retried",
+            "status " + ", ".join(f"{status} x{n}" for status, n in statuses),
+        ]
+        if self.rate_limit_remaining is not None:
+            lines.append(f"rate limit remaining: {self.rate_limit_remaining}")
+        lines += [f"  {n:>6} {url}" for url, n in self.by_url.items()]
+        return "\n".join(lines)
+
+
+class Tracer(trio.abc.Instrument):
+    """Record the requests to the GitHub API and the timeline of trio tasks.
+
+    The tracer records the requests made while it's the current tracer (see
+    `set_tracer`). Pass it as an instrument to `trio.run` to also record when
+    tasks are spawned and exit, which `chrome_trace` turns into a timeline that
+    can be loaded in `chrome://tracing` or https://ui.perfetto.dev.
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[RequestRecord] = []
+        self.retries = 0
+        self._started_at = time.perf_counter()
+        # the name, start and end of the tasks, indexed by their thread id - 1
+        self._tasks: list[list] = []
+        self._task_ids: dict[trio.lowlevel.Task, int] = {}
+
+    def now(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def _task_id(self, task: trio.lowlevel.Task) -> int:
+        if task not in self._task_ids:
+            self._tasks.append([task.name, self.now(), None])
+            self._task_ids[task] = len(self._tasks)
+        return self._task_ids[task]
+
+    def _current_task_id(self) -> int:
+        try:
+            return self._task_id(trio.lowlevel.current_task())
+        except RuntimeError:
+            return 0
+
+    def record_request(
+        self,
+        method: str,
+        url: str,
+        *,
+        status: int,
+        headers: Mapping[str, str],
+        size: int,
+        queued_at: float,
+        started_at: float,
+        finished_at: float,
+        attempt: int = 0,
+        throttled: bool = False,
+    ) -> None:
+        """Record a request, where the times are from `time.perf_counter`."""
+        remaining = headers.get("x-ratelimit-remaining")
+        self.requests.append(
+            RequestRecord(
+                method=method,
+                url=url_template(url),
+                status=status,
+                queued=started_at - queued_at,
+                start=started_at - self._started_at,
+                duration=finished_at - started_at,
+                size=size,
+                attempt=attempt,
+                throttled=throttled,
+                rate_limit_remaining=None if remaining is None else int(remaining),
+                task=self._current_task_id(),
+            )
+        )
+
+    def record_retry(self) -> None:
+        self.retries += 1
+
+    def task_spawned(self, task: trio.lowlevel.Task) -> None:
+        self._task_id(task)
+
+    def task_exited(self, task: trio.lowlevel.Task) -> None:
+        self._tasks[self._task_id(task) - 1][2] = self.now()
+
+    def summary(self) -> TraceSummary:
+        durations = [request.duration for request in self.requests]
+        if self.requests:
+            first = min(request.start - request.queued for request in self.requests)
+            last = max(request.start + request.duration for request in self.requests)
+        else:
+            first = last = 0.0
+        remaining = [
+            request.rate_limit_remaining
+            for request in self.requests
+            if request.rate_limit_remaining is not None
+        ]
+        return TraceSummary(
+            requests=len(self.requests),
+            by_status=dict(Counter(request.status for request in self.requests)),
+            by_url=dict(
+                Counter(
+                    f"{request.method} {request.url}" for request in self.requests
+                ).most_common()
+            ),
+            elapsed=last - first,
+            p50=_percentile(durations, 50),
+            p95=_percentile(durations, 95),
+            p99=_percentile(durations, 99),
+            queued=sum(request.queued for request in self.requests),
+            throttled=sum(request.throttled for request in self.requests),
+            retries=self.retries,
+            received=sum(request.size for request in self.requests),
+            rate_limit_remaining=min(remaining, default=None),
+        )
+
+    def chrome_trace(self) -> dict:
+        """Return the trace in the Chrome trace event format."""
+        end = self.now()
+        events = []
+        for tid, (name, start, stop) in enumerate(self._tasks, start=1):
+            events.append(
+                dict(ph="M", name="thread_name", pid=1, tid=tid, args=dict(name=name))
+            )
+            events.append(
+                dict(
+                    ph="X",
+                    cat="task",
+                    name=name,
+                    pid=1,
+                    tid=tid,
+                    ts=start * 1e6,
+                    dur=((stop if stop is not None else end) - start) * 1e6,
+                )
+            )
+        for request in self.requests:
+            tid = request.task
+            if request.queued > 0:
+                events.append(
+                    dict(
+                        ph="X",
+                        cat="queued",
+                        name="queued",
+                        pid=1,
+                        tid=tid,
+                        ts=(request.start - request.queued) * 1e6,
+                        dur=request.queued * 1e6,
+                    )
+                )
+            events.append(
+                dict(
+                    ph="X",
+                    cat="request",
+                    name=f"{request.method} {request.url}",
+                    pid=1,
+                    tid=tid,
+                    ts=request.start * 1e6,
+                    dur=request.duration * 1e6,
+                    args=msgspec.structs.asdict(request),
+                )
+            )
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def write_chrome_trace(self, path: Path | str) -> None:
+        Path(path).write_text(json.dumps(self.chrome_trace()))
@@ -0,0 +1,15 @@
+from ._client import (
+    CHUNK_SIZE,
+    MANIFEST_MEDIA_TYPES,
+    OCI_MANIFEST,
+    Registry,
+    RegistryError,
+)
+from ._copy import (
+    copy_artifact,
+    CopyResult,
+)
+from ._digest import (
+    bytes_digest,
+    file_digest,
+)
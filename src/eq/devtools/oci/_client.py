@@ -0,0 +1,477 @@
+import hashlib
+import mmap
+import random
+import re
+from collections.abc import (
+    Callable,
+    Iterator,
+)
+from contextlib import (
+    contextmanager,
+    suppress,
+)
+from pathlib import Path
+from typing import Self
+
+import httpx
+import msgspec
+import trio
+
+from ._digest import (
+    bytes_digest,
+    file_digest,
+)
+
+
+__all__ = (
+    "CHUNK_SIZE",
+    "MANIFEST_MEDIA_TYPES",
+    "OCI_MANIFEST",
+    "Registry",
+    "RegistryError",
+)
+
+
+OCI_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+
+
+MANIFEST_MEDIA_TYPES = (
+    OCI_MANIFEST,
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+)
+
+
+class RegistryError(httpx.HTTPError):
+    """An error response from an OCI registry."""
+
+    def __init__(self, message: str, *, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+CHUNK_SIZE = 8 * 2**20
+
+EMPTY_CONFIG = b"{}"
+EMPTY_CONFIG_MEDIA_TYPE = "application/vnd.oci.empty.v1+json"
+
+_CHALLENGE_REGEX = re.compile(r'(\w+)="([^"]*)"')
+
+
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, RegistryError):
+        return exc.status >= 500 or exc.status == httpx.codes.TOO_MANY_REQUESTS
+    return isinstance(exc, httpx.TransportError)
+
+
+def _range_end(response: httpx.Response) -> int | None:
+    # the last byte received by the registry, `-1` if none
+    if (value := response.headers.get("range")) is None:
+        return None
+    return int(value.partition("-")[2])
+
+
+@contextmanager
+def _open_blob(source: Path | bytes) -> Iterator[bytes | mmap.mmap]:
+    # memory-map files, so chunks are read from the page cache as they're sent
+    if isinstance(source, bytes):
+        yield source
+        return
+    with Path(source).open("rb") as f:
+        if Path(source).stat().st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+class Registry:
+    """A client of the OCI distribution API of a registry, e.g. `ghcr.io`.
+
+    The client owns a single keep-alive connection pool, shared by all of the
+    requests made while it's open. Bearer tokens are requested when the
+    registry challenges a request, and reused for the same repository.
+
+    Parameters
+    ----------
+    url : str
+        The base URL of the registry.
+    username : str, optional
+        The user to request tokens as.
+    password : str, optional
+        The password, or access token, to request tokens with.
+    timeout : int
+        The timeout (in seconds) of each request.
+    max_connections : int
+        The maximum number of connections in the pool.
+    http2 : bool
+        Whether to negotiate HTTP/2 with the registry.
+
+    """
+
+    def __init__(
+        self,
+        url: str = "https://ghcr.io",
+        *,
+        username: str | None = None,
+        password: str | None = None,
+        timeout: int = 60,
+        max_connections: int = 16,
+        http2: bool = True,
+    ) -> None:
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http2 = http2
+        self._tokens: dict[str, str] = {}
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            msg = f"{self.__class__.__name__!r} is not open"
+            raise RuntimeError(msg)
+        return self._client
+
+    async def aopen(self) -> None:
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def __aenter__(self) -> Self:
+        await self.aopen()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _authenticate(self, challenge: str, repository: str) -> None:
+        # https://distribution.github.io/distribution/spec/auth/token/
+        params = dict(_CHALLENGE_REGEX.findall(challenge))
+        realm = params.pop("realm")
+        params.setdefault("scope", f"repository:{repository}:pull")
+        auth = None
+        if self.username is not None or self.password is not None:
+            auth = (self.username or "", self.password or "")
+        response = await self.client.get(realm, params=params, auth=auth)
+        if response.is_error:
+            msg = f"{response.status_code}: failed to authenticate for {repository!r}"
+            raise RegistryError(msg, status=response.status_code)
+        content = msgspec.json.decode(response.content)
+        self._tokens[repository] = content.get("token") or content["access_token"]
+
+    def _url(self, repository: str, path: str) -> str:
+        if "://" in path:
+            return path
+        if path.startswith("/"):
+            # e.g. the `Location` of an upload
+            return f"{self.url}{path}"
+        return f"{self.url}/v2/{repository}/{path}"
+
+    async def request(
+        self,
+        method: str,
+        repository: str,
+        path: str,
+        **kwargs,
+    ) -> httpx.Response:
+        """Make a request to `/v2/<repository>/<path>`, authenticating as needed.
+
+        Error responses (other than `404 Not Found`) raise a `RegistryError`.
+        """
+        url = self._url(repository, path)
+        headers = dict(kwargs.pop("headers", None) or {})
+        for attempt in range(2):
+            if (token := self._tokens.get(repository)) is not None:
+                headers["authorization"] = f"Bearer {token}"
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            challenge = response.headers.get("www-authenticate", "")
+            if (
+                response.status_code != httpx.codes.UNAUTHORIZED
+                or not challenge.lower().startswith("bearer")
+                or attempt
+            ):
+                break
+            await self._authenticate(challenge, repository)
+        if response.is_error and response.status_code != httpx.codes.NOT_FOUND:
+            msg = (
+                f"{response.status_code}: {response.text[:200]}\n"
+                f"url = {str(response.url)!r}"
+            )
+            raise RegistryError(msg, status=response.status_code)
+        return response
+
+    async def head_manifest(self, repository: str, reference: str) -> str | None:
+        """Return the digest of a manifest, or `None` if it doesn't exist."""
+        response = await self.request(
+            "HEAD",
+            repository,
+            f"manifests/{reference}",
+            headers={"accept": ", ".join(MANIFEST_MEDIA_TYPES)},
+        )
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return None
+        return response.headers.get("docker-content-digest")
+
+    async def fetch_manifest(
+        self,
+        repository: str,
+        reference: str,
+    ) -> tuple[bytes, str] | None:
+        """Return the content and media type of a manifest, by tag or digest.
+
+        The content is returned as is, so that it can be pushed again under the
+        same digest. Returns `None` if the manifest doesn't exist.
+        """
+        response = await self.request(
+            "GET",
+            repository,
+            f"manifests/{reference}",
+            headers={"accept": ", ".join(MANIFEST_MEDIA_TYPES)},
+        )
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return None
+        media_type = response.headers.get("content-type", OCI_MANIFEST)
+        return response.content, media_type.partition(";")[0]
+
+    async def get_manifest(self, repository: str, reference: str) -> dict | None:
+        """Return a manifest, by tag or digest, or `None` if it doesn't exist."""
+        fetched = await self.fetch_manifest(repository, reference)
+        if fetched is None:
+            return None
+        return msgspec.json.decode(fetched[0])
+
+    async def layer_digests(self, repository: str, reference: str) -> set[str]:
+        """Return the digests of the layers of a manifest, if it exists."""
+        manifest = await self.get_manifest(repository, reference)
+        if manifest is None:
+            return set()
+        return {layer["digest"] for layer in manifest.get("layers", [])}
+
+    async def blob_exists(self, repository: str, digest: str) -> bool:
+        response = await self.request("HEAD", repository, f"blobs/{digest}")
+        return response.status_code != httpx.codes.NOT_FOUND
+
+    async def mount_blob(
+        self,
+        repository: str,
+        digest: str,
+        *,
+        from_repository: str,
+    ) -> bool:
+        """Mount a blob from another repository of the registry, without copying it.
+
+        Returns `False` if the registry doesn't allow the mount, e.g. because
+        the blob isn't readable, in which case the blob has to be uploaded.
+        """
+        response = await self.request(
+            "POST",
+            repository,
+            "blobs/uploads/",
+            params={"mount": digest, "from": from_repository},
+        )
+        if response.status_code == httpx.codes.CREATED:
+            return True
+        # the registry opened an upload session instead, which isn't needed
+        if response.status_code == httpx.codes.ACCEPTED:
+            with suppress(httpx.HTTPError):
+                await self.request("DELETE", repository, self._location(response))
+        return False
+
+    async def download_blob(
+        self,
+        repository: str,
+        digest: str,
+        path: Path | str,
+    ) -> None:
+        """Download a blob to a file, in chunks, verifying its digest."""
+        # authenticate (and check that the blob exists) before streaming it
+        if not await self.blob_exists(repository, digest):
+            url = self._url(repository, f"blobs/{digest}")
+            msg = f"404: blob unknown\nurl = {url!r}"
+            raise RegistryError(msg, status=httpx.codes.NOT_FOUND)
+        headers = {}
+        if (token := self._tokens.get(repository)) is not None:
+            headers["authorization"] = f"Bearer {token}"
+        hasher = hashlib.sha256()
+        async with self.client.stream(
+            "GET",
+            self._url(repository, f"blobs/{digest}"),
+            headers=headers,
+            follow_redirects=True,
+        ) as response:
+            if response.is_error:
+                await response.aread()
+                msg = f"{response.status_code}: {response.text[:200]}"
+                raise RegistryError(msg, status=response.status_code)
+            with Path(path).open("wb") as f:
+                async for chunk in response.aiter_bytes():
+                    hasher.update(chunk)
+                    f.write(chunk)
+        if f"sha256:{hasher.hexdigest()}" != digest:
+            msg = f"The content of {repository}@{digest} doesn't match its digest"
+            raise RegistryError(msg, status=httpx.codes.BAD_REQUEST)
+
+    def _location(self, response: httpx.Response) -> str:
+        return str(response.url.join(response.headers["location"]))
+
+    async def upload_blob(
+        self,
+        repository: str,
+        source: Path | str | bytes,
+        *,
+        digest: str | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        retries: int = 5,
+        backoff: float = 0.5,
+        on_progress: Callable[[int, int], None] | None = None,
+    ) -> str:
+        """Upload a blob, from a file or bytes, unless the registry has it.
+
+        The blob is uploaded in chunks of `chunk_size` bytes over one upload
+        session. Files are memory-mapped, so they're never read into memory as
+        a whole. If a chunk fails, the upload resumes from the last byte the
+        registry received, retrying up to `retries` times in a row with
+        jittered backoff (see `eq.devtools.github.client.retry`).
+        `on_progress` is called with the number of bytes uploaded and the size
+        of the blob after every chunk.
+
+        Returns
+        -------
+        digest : str
+            The digest of the blob.
+
+        """
+        if not isinstance(source, bytes):
+            source = Path(source)
+        if digest is None:
+            if isinstance(source, bytes):
+                digest = bytes_digest(source)
+            else:
+                digest = await trio.to_thread.run_sync(file_digest, source)
+        if await self.blob_exists(repository, digest):
+            return digest
+
+        response = await self.request("POST", repository, "blobs/uploads/")
+        location = self._location(response)
+        with _open_blob(source) as data:
+            size = len(data)
+            offset = 0
+            failures = 0
+            while offset < size:
+                chunk = data[offset : offset + chunk_size]
+                try:
+                    response = await self.request(
+                        "PATCH",
+                        repository,
+                        location,
+                        content=chunk,
+                        headers={
+                            "content-type": "application/octet-stream",
+                            "content-range": f"{offset}-{offset + len(chunk) - 1}",
+                        },
+                    )
+                except Exception as exc:
+                    failures += 1
+                    if failures > retries or not _is_transient(exc):
+                        raise
+                    delay = min(30.0, backoff * 2 ** (failures - 1))
+                    await trio.sleep(random.uniform(0, delay))
+                    # resume from what the registry received of the chunk
+                    response = await self.request("GET", repository, location)
+                    location = self._location(response)
+                    end = _range_end(response)
+                    offset = 0 if end is None else end + 1
+                    continue
+                failures = 0
+                location = self._location(response)
+                end = _range_end(response)
+                offset = offset + len(chunk) if end is None else end + 1
+                if on_progress is not None:
+                    on_progress(offset, size)
+
+        url = httpx.URL(location).copy_merge_params({"digest": digest})
+        await self.request("PUT", repository, str(url))
+        return digest
+
+    async def put_manifest(
+        self,
+        repository: str,
+        reference: str,
+        manifest: bytes,
+        *,
+        media_type: str = OCI_MANIFEST,
+    ) -> str:
+        """Upload a manifest under a tag (or its digest), returning its digest."""
+        response = await self.request(
+            "PUT",
+            repository,
+            f"manifests/{reference}",
+            content=manifest,
+            headers={"content-type": media_type},
+        )
+        return response.headers.get("docker-content-digest") or bytes_digest(manifest)
+
+    async def push_artifact(
+        self,
+        repository: str,
+        tag: str,
+        path: Path | str,
+        *,
+        media_type: str,
+        digest: str | None = None,
+        annotations: dict[str, str] | None = None,
+        **kwargs,
+    ) -> str:
+        """Push a file as an artifact with a single layer, tagged `tag`.
+
+        The blobs the registry already has aren't uploaded again. See
+        `upload_blob` for the other arguments.
+
+        Returns
+        -------
+        digest : str
+            The digest of the manifest.
+
+        """
+        path = Path(path)
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(self.upload_blob, repository, EMPTY_CONFIG)
+            digest = await self.upload_blob(repository, path, digest=digest, **kwargs)
+        manifest = dict(
+            schemaVersion=2,
+            mediaType=OCI_MANIFEST,
+            config=dict(
+                mediaType=EMPTY_CONFIG_MEDIA_TYPE,
+                digest=bytes_digest(EMPTY_CONFIG),
+                size=len(EMPTY_CONFIG),
+            ),
+            layers=[
+                dict(
+                    mediaType=media_type,
+                    digest=digest,
+                    size=path.stat().st_size,
+                    annotations={
+                        "org.opencontainers.image.title": path.name,
+                        **(annotations or {}),
+                    },
+                )
+            ],
+        )
+        return await self.put_manifest(
+            repository,
+            tag,
+            msgspec.json.encode(manifest),
+        )
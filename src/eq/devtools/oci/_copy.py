@@ -0,0 +1,134 @@
+import tempfile
+from dataclasses import (
+    dataclass,
+    field,
+)
+from pathlib import Path
+
+import httpx
+import msgspec
+import trio
+
+from ._client import (
+    Registry,
+    RegistryError,
+)
+from ._digest import bytes_digest
+
+
+__all__ = (
+    "copy_artifact",
+    "CopyResult",
+)
+
+
+@dataclass
+class CopyResult:
+    # the digest of the manifest
+    digest: str
+    # how every blob got to the destination, by digest: `"existing"`,
+    # `"mounted"` or `"copied"`
+    blobs: dict[str, str] = field(default_factory=dict)
+
+    def count(self, how: str) -> int:
+        return sum(value == how for value in self.blobs.values())
+
+
+async def _copy_blob(
+    source: Registry,
+    source_repository: str,
+    destination: Registry,
+    destination_repository: str,
+    digest: str,
+) -> str:
+    if await destination.blob_exists(destination_repository, digest):
+        return "existing"
+    if source.url == destination.url and await destination.mount_blob(
+        destination_repository,
+        digest,
+        from_repository=source_repository,
+    ):
+        return "mounted"
+    with tempfile.TemporaryDirectory(prefix="eq-devtools-") as tmp:
+        path = Path(tmp) / "blob"
+        await source.download_blob(source_repository, digest, path)
+        await destination.upload_blob(destination_repository, path, digest=digest)
+    return "copied"
+
+
+async def copy_artifact(
+    source: Registry,
+    source_repository: str,
+    reference: str,
+    *,
+    destination: Registry | None = None,
+    destination_repository: str,
+    tag: str | None = None,
+) -> CopyResult:
+    """Copy an artifact (or image) to another repository, by tag or digest.
+
+    The blobs the destination already has are skipped. Within a registry, the
+    other blobs are mounted from the source repository where the registry
+    allows it, so they're never transferred. Otherwise they're downloaded to a
+    temporary file and uploaded in chunks. The blobs (and the manifests of an
+    index) are copied concurrently, then the manifest is pushed unchanged, so
+    it keeps its digest.
+
+    Parameters
+    ----------
+    source : Registry
+        The registry to copy from.
+    source_repository : str
+        The repository to copy from, e.g. `energy-quants/conda/eq-devtools`.
+    reference : str
+        The tag or digest of the artifact.
+    destination : Registry, optional
+        The registry to copy to, by default the `source`.
+    destination_repository : str
+        The repository to copy to.
+    tag : str, optional
+        The tag to push the manifest under, by default the `reference`.
+
+    """
+    destination = destination or source
+    fetched = await source.fetch_manifest(source_repository, reference)
+    if fetched is None:
+        msg = f"404: manifest unknown\nreference = {source_repository}:{reference}"
+        raise RegistryError(msg, status=httpx.codes.NOT_FOUND)
+    content, media_type = fetched
+    manifest = msgspec.json.decode(content)
+    result = CopyResult(bytes_digest(content))
+
+    async def copy_blob(digest: str) -> None:
+        result.blobs[digest] = await _copy_blob(
+            source,
+            source_repository,
+            destination,
+            destination_repository,
+            digest,
+        )
+
+    async def copy_manifest(digest: str) -> None:
+        child = await copy_artifact(
+            source,
+            source_repository,
+            digest,
+            destination=destination,
+            destination_repository=destination_repository,
+        )
+        result.blobs.update(child.blobs)
+
+    blobs = [manifest["config"]] if "config" in manifest else []
+    blobs += manifest.get("layers", [])
+    async with trio.open_nursery() as nursery:
+        for blob in dict.fromkeys(blob["digest"] for blob in blobs):
+            nursery.start_soon(copy_blob, blob)
+        for child in manifest.get("manifests", []):
+            nursery.start_soon(copy_manifest, child["digest"])
+    await destination.put_manifest(
+        destination_repository,
+        tag or reference,
+        content,
+        media_type=media_type,
+    )
+    return result
@@ -0,0 +1,22 @@
+import hashlib
+from pathlib import Path
+
+
+__all__ = (
+    "bytes_digest",
+    "file_digest",
+)
+
+
+def file_digest(path: Path | str) -> str:
+    """Return the OCI digest (`sha256:<hex>`) of a file.
+
+    The file is hashed in chunks, so it's never read into memory as a whole.
+    """
+    with Path(path).open("rb") as f:
+        return f"sha256:{hashlib.file_digest(f, 'sha256').hexdigest()}"
+
+
+def bytes_digest(content: bytes) -> str:
+    """Return the OCI digest (`sha256:<hex>`) of some content."""
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
@@ -0,0 +1,2 @@
+from ._github import FakeGitHub
+from ._registry import FakeRegistry
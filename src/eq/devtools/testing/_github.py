@@ -0,0 +1,402 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime as DateTime
+from datetime import timedelta as TimeDelta
+from datetime import timezone as TimeZone
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import Self
+from urllib.parse import (
+    parse_qs,
+    quote,
+    unquote,
+    urlencode,
+    urlsplit,
+)
+
+
+__all__ = ("FakeGitHub",)
+
+
+API_URL = "https://api.github.com"
+
+
+def _timestamp(dt: DateTime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.server.fake._handle(self, "GET")
+
+    def do_DELETE(self) -> None:
+        self.server.fake._handle(self, "DELETE")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeGitHub"
+
+
+class FakeGitHub:
+    """A local stand-in for the GitHub Packages REST API.
+
+    The server runs in a background thread and serves the endpoints used by
+    `eq.devtools.github.packages`, including `Link` header pagination and
+    `ETag` revalidation. The method, path and status of every request are
+    recorded in `requests`.
+
+    Parameters
+    ----------
+    latency : float
+        The time (in seconds) to wait before answering each request.
+    link_last : bool
+        Whether paginated responses include a `rel="last"` link.
+    rate_limit : int
+        The number of requests allowed per `rate_limit_window` (primary rate
+        limit). Responses include the `X-RateLimit-*` headers.
+    rate_limit_window : int
+        The time (in seconds) after which the rate limit is reset.
+    max_concurrent : int, optional
+        The number of concurrent requests above which requests are rejected by
+        a secondary rate limit.
+    retry_after : int
+        The value of the `Retry-After` header of secondary rate limit responses.
+    failure_rate : float
+        The fraction of requests which fail with `failure_status`.
+    failure_status : int
+        The status of the injected failures.
+    lost_response_rate : float
+        The fraction of requests which are handled, but whose response is
+        replaced by a failure with `failure_status`, as if it was lost.
+    seed : int, optional
+        The seed of the random number generator used to inject failures.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        link_last: bool = True,
+        rate_limit: int = 5000,
+        rate_limit_window: int = 3600,
+        max_concurrent: int | None = None,
+        retry_after: int = 1,
+        failure_rate: float = 0.0,
+        failure_status: int = 502,
+        lost_response_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.link_last = link_last
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.lost_response_rate = lost_response_rate
+        self._random = random.Random(seed)
+        self._rate_limit_used = 0
+        self._rate_limit_reset = 0
+        self._in_flight = 0
+        self.packages: dict[tuple[str, str], dict] = {}
+        self.versions: dict[tuple[str, str], list[dict]] = {}
+        self.requests: list[tuple[str, str, int]] = []
+        self._lock = threading.Lock()
+        self._server: _Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_package(
+        self,
+        owner: str,
+        name: str,
+        *,
+        repository: str | None = None,
+        num_versions: int = 0,
+        tags: dict[int, list[str]] | None = None,
+        age: TimeDelta = TimeDelta(days=30),
+    ) -> dict:
+        """Add a container package with `num_versions` synthetic versions.
+
+        Versions are listed newest first. The oldest version was updated `age`
+        ago and `tags` maps the index of a version to its tags.
+        """
+        tags = tags or {}
+        now = DateTime.now(TimeZone.utc).replace(microsecond=0)
+        repository = repository or f"{owner}/{name.rsplit('/')[-1]}"
+        package_id = len(self.packages) + 1
+        package = dict(
+            id=package_id,
+            name=name,
+            package_type="container",
+            owner=dict(
+                login=owner,
+                id=1,
+                node_id="O_1",
+                type="Organization",
+            ),
+            url=f"{API_URL}/orgs/{owner}/packages/container/{quote(name, safe='')}",
+            html_url=f"https://github.com/orgs/{owner}/packages/container/{name}",
+            created_at=_timestamp(now - age),
+            updated_at=_timestamp(now),
+            repository=dict(
+                id=package_id,
+                node_id=f"R_{package_id}",
+                name=repository.split("/")[-1],
+                full_name=repository,
+                url=f"{API_URL}/repos/{repository}",
+                html_url=f"https://github.com/{repository}",
+                description="",
+            ),
+        )
+        versions = []
+        for idx in range(num_versions):
+            version_id = package_id * 10_000_000 + num_versions - idx
+            updated_at = now - age * (idx / max(num_versions - 1, 1))
+            versions.append(
+                dict(
+                    id=version_id,
+                    name=f"sha256:{version_id:064x}",
+                    url=f"{package['url']}/versions/{version_id}",
+                    package_html_url=package["html_url"],
+                    created_at=_timestamp(updated_at),
+                    updated_at=_timestamp(updated_at),
+                    html_url=f"{package['html_url']}/{version_id}",
+                    metadata=dict(
+                        package_type="container",
+                        container=dict(tags=tags.get(idx, [])),
+                    ),
+                )
+            )
+        with self._lock:
+            self.packages[owner, name] = package
+            self.versions[owner, name] = versions
+        return package
+
+    def start(self) -> Self:
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="FakeGitHub",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    _routes = (
+        ("GET", re.compile(r"/orgs/(?P<owner>[^/]+)/packages"), "_list_packages"),
+        (
+            "GET",
+            re.compile(r"/orgs/(?P<owner>[^/]+)/packages/container/(?P<name>[^/]+)"),
+            "_get_package",
+        ),
+        (
+            "GET",
+            re.compile(
+                r"/orgs/(?P<owner>[^/]+)/packages/container/(?P<name>[^/]+)/versions"
+            ),
+            "_list_versions",
+        ),
+        (
+            "GET",
+            re.compile(
+                r"/orgs/(?P<owner>[^/]+)/packages/container/(?P<name>[^/]+)"
+                r"/versions/(?P<version_id>\d+)"
+            ),
+            "_get_version",
+        ),
+        (
+            "DELETE",
+            re.compile(
+                r"/orgs/(?P<owner>[^/]+)/packages/container/(?P<name>[^/]+)"
+                r"/versions/(?P<version_id>\d+)"
+            ),
+            "_delete_version",
+        ),
+    )
+
+    def _handle(self, handler: _Handler, method: str) -> None:
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            status, headers, content = self._dispatch(handler, method, in_flight)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        self._respond(handler, status, headers, content)
+
+    def _dispatch(
+        self,
+        handler: _Handler,
+        method: str,
+        in_flight: int,
+    ) -> tuple[int, dict[str, str], bytes]:
+        parts = urlsplit(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        with self._lock:
+            now = int(time.time())
+            if now >= self._rate_limit_reset:
+                self._rate_limit_used = 0
+                self._rate_limit_reset = now + self.rate_limit_window
+            remaining = self.rate_limit - self._rate_limit_used
+
+        if self.max_concurrent is not None and in_flight > self.max_concurrent:
+            msg = "You have exceeded a secondary rate limit. Please wait."
+            headers = {"Retry-After": str(self.retry_after)}
+            status, body = 403, dict(message=msg)
+        elif remaining <= 0:
+            msg = "API rate limit exceeded."
+            status, headers, body = 403, {}, dict(message=msg)
+        elif self.failure_rate and self._random.random() < self.failure_rate:
+            status, headers, body = self.failure_status, {}, dict(message="Failure")
+        else:
+            for route_method, regex, name in self._routes:
+                match = regex.fullmatch(parts.path)
+                if route_method == method and match:
+                    kwargs = {
+                        key: unquote(value) for key, value in match.groupdict().items()
+                    }
+                    status, headers, body = getattr(self, name)(query, **kwargs)
+                    break
+            else:
+                status, headers, body = 404, {}, dict(message="Not Found")
+            if self.lost_response_rate and (
+                self._random.random() < self.lost_response_rate
+            ):
+                status, headers, body = self.failure_status, {}, dict(message="Lost")
+
+        content = b"" if body is None else json.dumps(body).encode("utf-8")
+        if method == "GET" and status == 200:
+            etag = f'"{hashlib.sha256(content).hexdigest()}"'
+            headers = {**headers, "ETag": etag}
+            if handler.headers.get("If-None-Match") == etag:
+                status, content = 304, b""
+
+        with self._lock:
+            # conditional requests which aren't modified are free
+            if status != 304 and remaining > 0:
+                self._rate_limit_used += 1
+            headers = {
+                **headers,
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(self.rate_limit - self._rate_limit_used),
+                "X-RateLimit-Used": str(self._rate_limit_used),
+                "X-RateLimit-Reset": str(self._rate_limit_reset),
+                "X-RateLimit-Resource": "core",
+            }
+            self.requests.append((method, parts.path, status))
+        return status, headers, content
+
+    def _respond(
+        self,
+        handler: _Handler,
+        status: int,
+        headers: dict[str, str],
+        content: bytes,
+    ) -> None:
+        handler.send_response(status)
+        if content:
+            handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(content)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def _paginate(
+        self,
+        path: str,
+        query: dict[str, str],
+        items: list,
+    ) -> tuple[int, dict[str, str], list]:
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        num_pages = max(-(-len(items) // per_page), 1)
+
+        def link(page: int, rel: str) -> str:
+            params = urlencode({**query, "page": page})
+            return f'<{self.url}{path}?{params}>; rel="{rel}"'
+
+        links = []
+        if page < num_pages:
+            links.append(link(page + 1, "next"))
+            if self.link_last:
+                links.append(link(num_pages, "last"))
+        if page > 1:
+            links.append(link(1, "first"))
+            links.append(link(page - 1, "prev"))
+        headers = {"Link": ", ".join(links)} if links else {}
+        return 200, headers, items[(page - 1) * per_page : page * per_page]
+
+    def _list_packages(self, query, *, owner):
+        packages = [
+            package
+            for (package_owner, _), package in self.packages.items()
+            if package_owner == owner
+        ]
+        return self._paginate(f"/orgs/{owner}/packages", query, packages)
+
+    def _get_package(self, query, *, owner, name):
+        try:
+            return 200, {}, self.packages[owner, name]
+        except KeyError:
+            return 404, {}, dict(message="Package not found.")
+
+    def _list_versions(self, query, *, owner, name):
+        try:
+            versions = self.versions[owner, name]
+        except KeyError:
+            return 404, {}, dict(message="Package not found.")
+        path = f"/orgs/{owner}/packages/container/{quote(name, safe='')}/versions"
+        return self._paginate(path, query, versions)
+
+    def _get_version(self, query, *, owner, name, version_id):
+        version_id = int(version_id)
+        for version in self.versions.get((owner, name), []):
+            if version["id"] == version_id:
+                return 200, {}, version
+        return 404, {}, dict(message="Package version not found.")
+
+    def _delete_version(self, query, *, owner, name, version_id):
+        version_id = int(version_id)
+        with self._lock:
+            versions = self.versions.get((owner, name), [])
+            for idx, version in enumerate(versions):
+                if version["id"] == version_id:
+                    del versions[idx]
+                    return 204, {}, None
+        return 404, {}, dict(message="Package version not found.")
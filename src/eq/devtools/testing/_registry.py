@@ -0,0 +1,381 @@
+import base64
+import hashlib
+import json
+import re
+import threading
+import uuid
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import Self
+from urllib.parse import (
+    parse_qs,
+    urlsplit,
+)
+
+
+__all__ = ("FakeRegistry",)
+
+
+MANIFEST_MEDIA_TYPE = "application/vnd.oci.image.manifest.v1+json"
+
+_MANIFEST_PATH = re.compile(r"/v2/(?P<repository>.+)/manifests/(?P<reference>[^/]+)")
+_BLOB_PATH = re.compile(r"/v2/(?P<repository>.+)/blobs/(?P<digest>sha256:\w+)")
+_UPLOAD_PATH = re.compile(r"/v2/(?P<repository>.+)/blobs/uploads/(?P<id>[^/]*)")
+
+
+def _digest(content: bytes) -> str:
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+def _error(status: int, code: str) -> tuple[int, dict[str, str], bytes]:
+    content = json.dumps(dict(errors=[dict(code=code)]))
+    return status, {}, content.encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.server.fake._handle(self, "GET")
+
+    def do_HEAD(self) -> None:
+        self.server.fake._handle(self, "HEAD")
+
+    def do_POST(self) -> None:
+        self.server.fake._handle(self, "POST")
+
+    def do_PATCH(self) -> None:
+        self.server.fake._handle(self, "PATCH")
+
+    def do_PUT(self) -> None:
+        self.server.fake._handle(self, "PUT")
+
+    def do_DELETE(self) -> None:
+        self.server.fake._handle(self, "DELETE")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeRegistry"
+
+
+class FakeRegistry:
+    """A local stand-in for an OCI registry, such as `ghcr.io`.
+
+    The server runs in a background thread and implements the parts of the OCI
+    distribution API used by `eq.devtools.oci`, including the bearer token
+    challenge (with tokens scoped to repositories), chunked blob uploads and
+    cross-repository blob mounts. The method, path and status of every request
+    are recorded in `requests`.
+
+    Parameters
+    ----------
+    token : str, optional
+        The password to request tokens with. If `None`, any credentials are
+        accepted.
+    interrupt : int
+        The number of chunks to interrupt: the registry keeps the first half of
+        each of them, then responds `500 Internal Server Error`.
+    mount : bool
+        Whether to allow blobs to be mounted from other repositories. If not,
+        an upload session is opened instead, as the OCI spec allows.
+
+    Attributes
+    ----------
+    denied : set[str]
+        The repositories to deny pushes to, with `403 Forbidden`.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        token: str | None = None,
+        interrupt: int = 0,
+        mount: bool = True,
+    ) -> None:
+        self.token = token
+        self.interrupt = interrupt
+        self.mount = mount
+        self.blobs: dict[str, bytes] = {}
+        # the blobs of every repository, by digest
+        self.links: set[tuple[str, str]] = set()
+        # the manifests of every repository, by tag and by digest
+        self.manifests: dict[tuple[str, str], bytes] = {}
+        self.requests: list[tuple[str, str, int]] = []
+        self.denied: set[str] = set()
+        # the repository and content received of every upload, by id
+        self._uploads: dict[str, tuple[str, bytearray]] = {}
+        # the repositories and actions every token grants
+        self._issued: dict[str, set[tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self._server: _Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_artifact(
+        self,
+        repository: str,
+        tag: str,
+        content: bytes,
+        *,
+        media_type: str = "application/octet-stream",
+    ) -> str:
+        """Add an artifact with a single layer, returning its manifest digest."""
+        config = b"{}"
+        manifest = json.dumps(
+            dict(
+                schemaVersion=2,
+                mediaType=MANIFEST_MEDIA_TYPE,
+                config=dict(
+                    mediaType="application/vnd.oci.image.config.v1+json",
+                    digest=_digest(config),
+                    size=len(config),
+                ),
+                layers=[
+                    dict(
+                        mediaType=media_type,
+                        digest=_digest(content),
+                        size=len(content),
+                    )
+                ],
+            )
+        ).encode("utf-8")
+        digest = _digest(manifest)
+        with self._lock:
+            for blob in (config, content):
+                self.blobs[_digest(blob)] = blob
+                self.links.add((repository, _digest(blob)))
+            self.manifests[repository, tag] = manifest
+            self.manifests[repository, digest] = manifest
+        return digest
+
+    def start(self) -> Self:
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="FakeRegistry",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    _routes = (
+        ("GET", re.compile(r"/token"), "_token"),
+        ("GET", _MANIFEST_PATH, "_get_manifest"),
+        ("HEAD", _MANIFEST_PATH, "_get_manifest"),
+        ("PUT", _MANIFEST_PATH, "_put_manifest"),
+        ("GET", _BLOB_PATH, "_get_blob"),
+        ("HEAD", _BLOB_PATH, "_get_blob"),
+        ("POST", _UPLOAD_PATH, "_start_upload"),
+        ("GET", _UPLOAD_PATH, "_get_upload"),
+        ("PATCH", _UPLOAD_PATH, "_patch_upload"),
+        ("PUT", _UPLOAD_PATH, "_finish_upload"),
+        ("DELETE", _UPLOAD_PATH, "_cancel_upload"),
+    )
+
+    def _handle(self, handler: _Handler, method: str) -> None:
+        parts = urlsplit(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        # read the body first, so that the connection can be reused
+        body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        for route_method, regex, name in self._routes:
+            match = regex.fullmatch(parts.path)
+            if route_method == method and match:
+                if name == "_token":
+                    status, headers, content = self._token(handler, parts.query)
+                    break
+                repository = match.group("repository")
+                push = method not in ("GET", "HEAD") or name == "_get_upload"
+                scopes = {repository: "pull,push" if push else "pull"}
+                if "mount" in query:
+                    scopes.setdefault(query.get("from", ""), "pull")
+                if not self._authorized(handler, scopes):
+                    status, headers, content = self._challenge(scopes)
+                elif push and repository in self.denied:
+                    status, headers, content = _error(403, "DENIED")
+                else:
+                    status, headers, content = getattr(self, name)(
+                        handler, query, body, **match.groupdict()
+                    )
+                break
+        else:
+            status, headers, content = 404, {}, b""
+
+        with self._lock:
+            self.requests.append((method, parts.path, status))
+        handler.send_response(status)
+        headers.setdefault("Content-Length", str(len(content)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        if method != "HEAD":
+            handler.wfile.write(content)
+
+    def _authorized(self, handler: _Handler, scopes: dict[str, str]) -> bool:
+        auth = handler.headers.get("Authorization", "")
+        granted = self._issued.get(auth.removeprefix("Bearer "))
+        if not auth.startswith("Bearer ") or granted is None:
+            return False
+        return all(
+            (repository, action) in granted
+            for repository, actions in scopes.items()
+            for action in actions.split(",")
+        )
+
+    def _challenge(self, scopes: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        scope = " ".join(
+            f"repository:{repository}:{actions}"
+            for repository, actions in scopes.items()
+        )
+        challenge = (
+            f'Bearer realm="{self.url}/token",service="fake-registry",scope="{scope}"'
+        )
+        content = json.dumps(dict(errors=[dict(code="UNAUTHORIZED")]))
+        return 401, {"WWW-Authenticate": challenge}, content.encode("utf-8")
+
+    def _token(self, handler, query_string):
+        if self.token is not None:
+            auth = handler.headers.get("Authorization", "")
+            credentials = base64.b64decode(auth.removeprefix("Basic ")).decode()
+            password = credentials.partition(":")[2]
+            if not auth.startswith("Basic ") or password != self.token:
+                return _error(401, "DENIED")
+        # e.g. `repository:owner/name:pull,push`, which may be space separated
+        scope = " ".join(parse_qs(query_string).get("scope", []))
+        granted = set()
+        for resource in scope.split():
+            _, repository, actions = resource.split(":")
+            granted.update((repository, action) for action in actions.split(","))
+        token = hashlib.sha256(scope.encode()).hexdigest()
+        with self._lock:
+            self._issued[token] = granted
+        return 200, {}, json.dumps(dict(token=token)).encode("utf-8")
+
+    def _get_manifest(self, handler, query, body, *, repository, reference):
+        manifest = self.manifests.get((repository, reference))
+        if manifest is None:
+            return _error(404, "MANIFEST_UNKNOWN")
+        headers = {
+            "Content-Type": json.loads(manifest).get("mediaType", MANIFEST_MEDIA_TYPE),
+            "Docker-Content-Digest": _digest(manifest),
+        }
+        return 200, headers, manifest
+
+    def _put_manifest(self, handler, query, body, *, repository, reference):
+        manifest = json.loads(body)
+        blobs = [manifest["config"]] if "config" in manifest else []
+        blobs += manifest.get("layers", [])
+        if any((repository, blob["digest"]) not in self.links for blob in blobs):
+            return _error(400, "MANIFEST_BLOB_UNKNOWN")
+        children = [child["digest"] for child in manifest.get("manifests", [])]
+        if any((repository, child) not in self.manifests for child in children):
+            return _error(400, "MANIFEST_UNKNOWN")
+        digest = _digest(body)
+        with self._lock:
+            self.manifests[repository, reference] = body
+            self.manifests[repository, digest] = body
+        headers = {
+            "Location": f"/v2/{repository}/manifests/{digest}",
+            "Docker-Content-Digest": digest,
+        }
+        return 201, headers, b""
+
+    def _get_blob(self, handler, query, body, *, repository, digest):
+        if (repository, digest) not in self.links:
+            return _error(404, "BLOB_UNKNOWN")
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Docker-Content-Digest": digest,
+        }
+        return 200, headers, self.blobs[digest]
+
+    def _upload_headers(self, repository: str, id: str) -> dict[str, str]:
+        # `Range` is inclusive, e.g. `0--1` if nothing was received yet
+        received = len(self._uploads[id][1])
+        return {
+            "Location": f"/v2/{repository}/blobs/uploads/{id}",
+            "Range": f"0-{received - 1}",
+            "Docker-Upload-UUID": id,
+        }
+
+    def _start_upload(self, handler, query, body, *, repository, id):
+        digest = query.get("mount")
+        if self.mount and (query.get("from"), digest) in self.links:
+            with self._lock:
+                self.links.add((repository, digest))
+            headers = {
+                "Location": f"/v2/{repository}/blobs/{digest}",
+                "Docker-Content-Digest": digest,
+            }
+            return 201, headers, b""
+        id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[id] = (repository, bytearray())
+        return 202, self._upload_headers(repository, id), b""
+
+    def _get_upload(self, handler, query, body, *, repository, id):
+        if self._uploads.get(id, ("",))[0] != repository:
+            return _error(404, "BLOB_UPLOAD_UNKNOWN")
+        return 204, self._upload_headers(repository, id), b""
+
+    def _patch_upload(self, handler, query, body, *, repository, id):
+        if self._uploads.get(id, ("",))[0] != repository:
+            return _error(404, "BLOB_UPLOAD_UNKNOWN")
+        received = self._uploads[id][1]
+        start = int(handler.headers.get("Content-Range", "0-").partition("-")[0])
+        if start != len(received):
+            return 416, self._upload_headers(repository, id), b""
+        with self._lock:
+            if self.interrupt > 0:
+                self.interrupt -= 1
+                received += body[: len(body) // 2]
+                return _error(500, "UNKNOWN")
+            received += body
+        return 202, self._upload_headers(repository, id), b""
+
+    def _finish_upload(self, handler, query, body, *, repository, id):
+        if self._uploads.get(id, ("",))[0] != repository:
+            return _error(404, "BLOB_UPLOAD_UNKNOWN")
+        with self._lock:
+            content = bytes(self._uploads.pop(id)[1] + body)
+        digest = query.get("digest")
+        if digest != _digest(content):
+            return _error(400, "DIGEST_INVALID")
+        with self._lock:
+            self.blobs[digest] = content
+            self.links.add((repository, digest))
+        headers = {
+            "Location": f"/v2/{repository}/blobs/{digest}",
+            "Docker-Content-Digest": digest,
+        }
+        return 201, headers, b""
+
+    def _cancel_upload(self, handler, query, body, *, repository, id):
+        if self._uploads.get(id, ("",))[0] != repository:
+            return _error(404, "BLOB_UPLOAD_UNKNOWN")
+        with self._lock:
+            del self._uploads[id]
+        return 204, {}, b""
@@ -1,4 +1,51 @@
+import logging
+
+import pytest
+import trio
+
+from eq.devtools.github.client import Session
+from eq.devtools.testing import FakeGitHub
+
 
 def pytest_html_report_title(report):
     from eq.devtools import __version__ as version
-    report.title = f"Test Report for Version {version}"
\ No newline at end of file
+
+    report.title = f"Test Report for Version {version}"
+
+
+@pytest.fixture
+def github():
+    """A fake GitHub API without any packages.
+
+    Test modules add their packages by overriding this fixture.
+    """
+    with FakeGitHub() as github:
+        yield github
+
+
+@pytest.fixture
+def run(github):
+    """Return a function to run an async function in a session with `github`."""
+
+    def run(async_fn, *args, **kwargs):
+        async def main():
+            async with Session(
+                github_user="user",
+                github_token="token",
+                base_url=github.url,
+            ):
+                return await async_fn(*args, **kwargs)
+
+        return trio.run(main)
+
+    return run
+
+
+@pytest.fixture
+def github_env(github, caplog, monkeypatch):
+    """Point the CLI at `github`."""
+    # live logging of the requests would swap out the `CliRunner` streams
+    caplog.set_level(logging.WARNING, logger="httpx")
+    monkeypatch.setenv("GITHUB_API_URL", github.url)
+    monkeypatch.setenv("GITHUB_USER", "user")
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
@@ -1,6 +1,12 @@
+import json
+from functools import partial
+
+import pytest
+import trio
 from click.testing import CliRunner
 
 from eq.devtools.cli import cli
+from eq.devtools.testing import FakeRegistry
 
 
 def test_greet():
@@ -8,3 +14,131 @@ def test_greet():
   res = runner.invoke(cli, ['test', 'greet', '--name',  "Dave"])
   assert res.exit_code == 0, res.stdout
   assert res.output == "Hello Dave!\n"
+
+
+@pytest.mark.usefixtures("github_env")
+def test_packages_delete_from_stdin(github):
+    github.add_package("energy-quants", "eq-devtools", num_versions=250)
+    versions = github.versions["energy-quants", "eq-devtools"]
+    ids = [version["id"] for version in versions]
+    runner = CliRunner()
+    res = runner.invoke(
+        cli,
+        [
+            "github",
+            "packages",
+            "delete",
+            "--owner=energy-quants",
+            "--package=eq-devtools",
+            "--max-parallel=8",
+            "--json",
+        ],
+        input="\n".join(map(str, [*ids[:200], 1])),
+    )
+    assert res.exit_code == 0, res.output
+    assert len(versions) == 50
+    assert "200 deleted, 1 failed" in res.output
+
+
+@pytest.mark.usefixtures("github_env")
+@pytest.mark.parametrize("strict", [False, True])
+def test_packages_delete_invalid_id(github, monkeypatch, strict):
+    # trio>=0.25 always wraps the errors of nurseries in exception groups
+    monkeypatch.setattr(trio, "run", partial(trio.run, strict_exception_groups=strict))
+    github.add_package("energy-quants", "eq-devtools", num_versions=10)
+    ids = [version["id"] for version in github.versions["energy-quants", "eq-devtools"]]
+    runner = CliRunner()
+    res = runner.invoke(
+        cli,
+        [
+            "github",
+            "packages",
+            "delete",
+            "--owner=energy-quants",
+            "--package=eq-devtools",
+        ],
+        input=f"{ids[0]}\nabc\n",
+    )
+    assert res.exit_code == 2, res.output
+    assert "Invalid version id: 'abc'" in res.output
+
+
+@pytest.mark.usefixtures("github_env")
+def test_packages_list_versions_ndjson(github):
+    github.add_package("energy-quants", "eq-devtools", num_versions=250)
+    versions = github.versions["energy-quants", "eq-devtools"]
+    args = [
+        "github",
+        "packages",
+        "list-versions",
+        "--owner=energy-quants",
+        "--package=eq-devtools",
+        "--fields=id,tags",
+        "--format=ndjson",
+    ]
+    runner = CliRunner()
+    res = runner.invoke(cli, args)
+    assert res.exit_code == 0, res.output
+    lines = [json.loads(line) for line in res.stdout.splitlines()]
+    assert lines == [dict(id=version["id"], tags=[]) for version in versions]
+    # the scheduler stats are only printed with `--profile`
+    assert "rate limits" not in res.stderr
+
+    res = runner.invoke(cli, ["--profile", *args])
+    assert res.exit_code == 0, res.output
+    assert "rate limits" in res.stderr
+
+
+@pytest.mark.usefixtures("github_env")
+def test_packages_list_versions_snapshot(github, tmp_path):
+    github.add_package("energy-quants", "eq-devtools", num_versions=3)
+    versions = github.versions["energy-quants", "eq-devtools"]
+    args = [
+        "github",
+        "packages",
+        f"--snapshot-path={tmp_path / 'snapshot.sqlite'}",
+        "list-versions",
+        "--owner=energy-quants",
+        "--package=eq-devtools",
+    ]
+    runner = CliRunner()
+    res = runner.invoke(cli, [*args, "--fields=id,html_url", "--json"])
+    assert res.exit_code == 0, res.output
+    expected = [
+        dict(id=version["id"], html_url=version["html_url"]) for version in versions
+    ]
+    assert json.loads(res.stdout) == expected
+
+    res = runner.invoke(cli, [*args, "--fields=id,size"])
+    assert res.exit_code == 2
+    assert "Unknown fields: size" in res.output
+
+
+@pytest.mark.usefixtures("github_env")
+def test_packages_mirror(github):
+    with FakeRegistry(token="token") as registry:
+        tags = {0: ["1.1"], 1: ["1.0"]}
+        github.add_package("staging", "conda/eq-devtools", num_versions=2, tags=tags)
+        for tag in ("1.0", "1.1"):
+            registry.add_artifact("staging/conda/eq-devtools", tag, tag.encode())
+        runner = CliRunner()
+        res = runner.invoke(
+            cli,
+            [
+                "github",
+                "packages",
+                "mirror",
+                "--from-owner=staging",
+                "--to-owner=energy-quants",
+                "--package=conda/eq-devtools",
+                f"--registry-url={registry.url}",
+                "--json",
+            ],
+        )
+        assert res.exit_code == 0, res.output
+        output = json.loads(res.stdout.splitlines()[0])
+        assert sorted(output["mirrored"]) == ["1.0", "1.1"]
+        # the tags are mirrored concurrently, so they may both mount the config
+        blobs = output["blobs"]
+        assert blobs["existing"] + blobs["mounted"] == 4 and blobs["copied"] == 0
+        assert ("energy-quants/conda/eq-devtools", "1.1") in registry.manifests
@@ -0,0 +1,116 @@
+import subprocess
+
+from eq.devtools.conda import _build
+from eq.devtools.conda._cache import (
+    build_key,
+    BuildCache,
+    source_files,
+)
+
+
+def make_project(path):
+    (path / "requirements.d").mkdir()
+    (path / "requirements.d" / "run.txt").write_text("click\n")
+    (path / "main.py").write_text("print('hello')\n")
+    (path / ".gitignore").write_text("*.log\n")
+    (path / "debug.log").write_text("noise\n")
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+
+
+def test_build_key(tmp_path):
+    make_project(tmp_path)
+    (tmp_path / "dist").mkdir()
+    kwargs = dict(recipe="recipe", version="1.0", build_number=0)
+    key = build_key(source_path=tmp_path, exclude=[tmp_path / "dist"], **kwargs)
+
+    assert source_files(tmp_path) == [
+        path.relative_to(tmp_path)
+        for path in [
+            tmp_path / ".gitignore",
+            tmp_path / "main.py",
+            tmp_path / "requirements.d" / "run.txt",
+        ]
+    ]
+    # ignored and excluded files don't change the key
+    (tmp_path / "debug.log").write_text("more noise\n")
+    (tmp_path / "dist" / "package.conda").write_text("")
+    assert build_key(source_path=tmp_path, exclude=[tmp_path / "dist"], **kwargs) == key
+
+    assert build_key(source_path=tmp_path, **{**kwargs, "build_number": 1}) != key
+    channels = ["conda-forge", "energy-quants"]
+    key_with_channels = build_key(
+        source_path=tmp_path, exclude=[tmp_path / "dist"], channels=channels, **kwargs
+    )
+    assert key_with_channels != key
+    # the channels are searched in order
+    assert (
+        build_key(
+            source_path=tmp_path,
+            exclude=[tmp_path / "dist"],
+            channels=channels[::-1],
+            **kwargs,
+        )
+        != key_with_channels
+    )
+    (tmp_path / "requirements.d" / "run.txt").write_text("click>=8\n")
+    assert build_key(source_path=tmp_path, exclude=[tmp_path / "dist"], **kwargs) != key
+
+
+def test_build_cache(tmp_path):
+    output_path = tmp_path / "dist"
+    artifact = output_path / "noarch" / "package-1.0-0.conda"
+    artifact.parent.mkdir(parents=True)
+    artifact.write_bytes(b"package")
+    cache = BuildCache(tmp_path / "cache")
+
+    assert cache.lookup("key", output_path) is None
+    cache.store("key", output_path, [artifact.relative_to(output_path)])
+    assert cache.lookup("key", output_path) == [artifact]
+
+    # restored from the cache directory into another output folder
+    other = tmp_path / "other"
+    (restored,) = cache.lookup("key", other)
+    assert restored == other / "noarch" / "package-1.0-0.conda"
+    assert restored.read_bytes() == b"package"
+
+    artifact.unlink()
+    assert BuildCache().lookup("key", output_path) is None
+
+
+def test_build_package_source_path(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    make_project(project)
+    recipe_file = tmp_path / "recipe" / "recipe.yaml"
+    recipe_file.parent.mkdir()
+    recipe_file.write_text("package: {name: example}\n")
+    builds = []
+
+    def run_logged(cmd, **kwargs):
+        builds.append(cmd)
+        artifact = tmp_path / "dist" / "noarch" / f"example-{len(builds)}.conda"
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        artifact.write_bytes(b"package")
+
+    monkeypatch.setattr(_build, "run_logged", run_logged)
+    # build from outside of the project
+    monkeypatch.chdir(tmp_path)
+    kwargs = dict(
+        recipe_file=recipe_file,
+        output_path=tmp_path / "dist",
+        pyproject_file=project / "pyproject.toml",
+        cache_dir=tmp_path / "cache",
+        version="1.0",
+        work_path=tmp_path / "work",
+    )
+    _build.build_package(**kwargs)
+    _build.build_package(**kwargs)
+    assert len(builds) == 1
+
+    # the key covers the sources of the project, not of the working directory
+    (tmp_path / "other.txt").write_text("unrelated\n")
+    _build.build_package(**kwargs)
+    assert len(builds) == 1
+    (project / "main.py").write_text("print('changed')\n")
+    _build.build_package(**kwargs)
+    assert len(builds) == 2
@@ -0,0 +1,53 @@
+import gzip
+import sys
+from subprocess import CalledProcessError
+
+import pytest
+
+from eq.devtools.conda._logs import run_logged
+
+
+SCRIPT = """
+import sys
+for idx in range(10_000):
+    print(f"line {idx}")
+sys.exit(int(sys.argv[1]))
+"""
+
+
+def test_run_logged(tmp_path, capsys):
+    log_file = tmp_path / "logs" / "build.log.gz"
+
+    run_logged([sys.executable, "-c", SCRIPT, "0"], log_file=log_file, tail=5)
+
+    out = capsys.readouterr().out
+    assert "line 9999" not in out
+    assert "10000 lines" in out
+    with gzip.open(log_file, "rt") as f:
+        assert f.read() == "".join(f"line {idx}\n" for idx in range(10_000))
+
+
+def test_run_logged_failure(tmp_path, capsys):
+    with pytest.raises(CalledProcessError) as exc_info:
+        run_logged(
+            [sys.executable, "-c", SCRIPT, "3"],
+            log_file=tmp_path / "build.log.gz",
+            log_level="quiet",
+            tail=5,
+            prefix="[py3.11] ",
+        )
+
+    assert exc_info.value.returncode == 3
+    assert exc_info.value.output.splitlines()[0] == b"line 9995"
+    out = capsys.readouterr().out
+    assert "the last 5 of 10000 lines" in out
+    assert out.splitlines()[-5:] == [
+        f"[py3.11] line {idx}" for idx in range(9995, 10_000)
+    ]
+
+
+def test_run_logged_full(capsys):
+    run_logged([sys.executable, "-c", SCRIPT, "0"], log_level="full", prefix="> ")
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[-10_000:] == [f"> line {idx}" for idx in range(10_000)]
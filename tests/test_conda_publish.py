@@ -0,0 +1,135 @@
+import hashlib
+import json
+
+import pytest
+
+from eq.devtools.conda import (
+    check_published,
+    find_packages,
+    format_publish_summary,
+    publish_oci_artifacts,
+)
+from eq.devtools.testing import FakeRegistry
+
+
+@pytest.fixture
+def dist(tmp_path, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    monkeypatch.chdir(tmp_path)
+
+    dist = tmp_path / "dist"
+    for variant in ("py3.11-build0", "py3.12-build0"):
+        (dist / variant / "noarch").mkdir(parents=True)
+        (dist / variant / "noarch" / "example-1.0-py_0.conda").write_bytes(b"0" * 1024)
+    (dist / "py3.12-build0" / "noarch" / "broken-1.0-py_0.conda").write_bytes(b"")
+    (dist / "py3.12-build0" / "noarch" / "repodata.json").write_text("{}")
+    return dist
+
+
+def test_find_packages(dist):
+    packages = [
+        dist / "py3.11-build0" / "noarch" / "example-1.0-py_0.conda",
+        dist / "py3.12-build0" / "noarch" / "broken-1.0-py_0.conda",
+        dist / "py3.12-build0" / "noarch" / "example-1.0-py_0.conda",
+    ]
+    assert find_packages(dist) == packages
+    assert find_packages("dist/**/*.conda") == [
+        path.relative_to(dist.parent) for path in packages
+    ]
+    assert find_packages(packages[0], dist / "py3.11-build0") == packages[:1]
+    with pytest.raises(FileNotFoundError):
+        find_packages(dist / "missing.conda")
+
+
+@pytest.fixture
+def registry():
+    with FakeRegistry(token="token") as registry:
+        yield registry
+
+
+def test_publish_oci_artifacts(dist, registry, capsys):
+    packages = find_packages(dist)
+    registry.denied.add("energy-quants/conda/broken")
+
+    results = publish_oci_artifacts(
+        packages,
+        owner="energy-quants",
+        max_parallel=3,
+        registry_url=registry.url,
+        chunk_size=256,
+    )
+
+    assert [result.path for result in results] == packages
+    assert [result.error is None for result in results] == [True, False, True]
+    assert "403" in results[1].error
+    assert results[0].size == 1024
+    out = capsys.readouterr().out
+    assert "[example-1.0-py_0.conda] Uploading energy-quants/conda/example:1.0" in out
+    assert "broken-1.0-py_0.conda" in format_publish_summary(results)
+
+    manifest = json.loads(registry.manifests["energy-quants/conda/example", "1.0"])
+    (layer,) = manifest["layers"]
+    assert layer["mediaType"] == "application/vnd.conda.package.v2"
+    assert layer["annotations"] == {
+        "org.opencontainers.image.title": "example-1.0-py_0.conda"
+    }
+    assert registry.blobs[layer["digest"]] == packages[0].read_bytes()
+
+
+def test_skip_published(dist, registry):
+    packages = find_packages(dist / "py3.11-build0")
+    content = packages[0].read_bytes()
+    registry.add_artifact("energy-quants/conda/example", "1.0", content)
+
+    assert check_published(
+        packages,
+        owner="energy-quants",
+        registry_url=registry.url,
+    ) == [(f"sha256:{hashlib.sha256(content).hexdigest()}", True)]
+    # the same tag with other content isn't published
+    registry.add_artifact("energy-quants/conda/broken", "1.0", b"other")
+    assert check_published(
+        find_packages(dist / "py3.12-build0"),
+        owner="energy-quants",
+        registry_url=registry.url,
+    ) == [
+        (f"sha256:{hashlib.sha256(b'').hexdigest()}", False),
+        (f"sha256:{hashlib.sha256(content).hexdigest()}", True),
+    ]
+
+    (result,) = publish_oci_artifacts(
+        packages,
+        owner="energy-quants",
+        registry_url=registry.url,
+    )
+    assert result.skipped
+    assert "0 uploaded, 1 skipped, 0 failed" in format_publish_summary([result])
+
+    (result,) = publish_oci_artifacts(
+        packages,
+        owner="energy-quants",
+        registry_url=registry.url,
+        force=True,
+    )
+    assert not result.skipped
+    assert result.error is None
+
+
+def test_publish_from_iterator(dist, registry):
+    packages = find_packages(dist / "py3.11-build0")
+
+    def build():
+        yield from packages
+        raise RuntimeError("Failed to build")
+
+    results = []
+    with pytest.raises(RuntimeError, match="Failed to build"):
+        publish_oci_artifacts(
+            build(),
+            owner="energy-quants",
+            registry_url=registry.url,
+            on_result=results.append,
+        )
+    # the packages yielded before the error are still uploaded
+    assert [result.path for result in results] == packages
+    assert ("energy-quants/conda/example", "1.0") in registry.manifests
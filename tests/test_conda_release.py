@@ -0,0 +1,155 @@
+from functools import partial
+
+import pytest
+
+from eq.devtools.conda import (
+    _release,
+    build_matrix,
+    parse_matrix,
+    render_recipe,
+    Variant,
+)
+from eq.devtools.conda._build import (
+    Backend,
+    BACKENDS,
+)
+from eq.devtools.testing import FakeRegistry
+
+
+PYPROJECT = """
+[project]
+name = "example"
+description = "An example."
+license = {file = "LICENSE"}
+urls = {repository = "https://github.com/energy-quants/example"}
+"""
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+    (tmp_path / "requirements.d").mkdir()
+    (tmp_path / "requirements.d" / "run.txt").write_text("click\n")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_release(project, monkeypatch):
+    calls = []
+
+    def get_version():
+        calls.append("version")
+        return "1.2.3.post001+abc"
+
+    def build_package(*, recipe_file, output_path, pyproject_file, version, **kwargs):
+        calls.append("build")
+        assert "version: 1.2.3.post001+abc" in recipe_file.read_text()
+        # the sources of the build are next to the project file
+        assert pyproject_file == project / "pyproject.toml"
+        artifact = output_path / "noarch" / f"example-{version}-py_0.conda"
+        artifact.parent.mkdir(parents=True)
+        artifact.write_bytes(b"package")
+        return [artifact]
+
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    monkeypatch.setattr(_release, "get_version", get_version)
+    monkeypatch.setattr(_release, "build_package", build_package)
+    with FakeRegistry(token="token") as registry:
+        monkeypatch.setattr(
+            _release,
+            "publish_oci_artifacts",
+            partial(_release.publish_oci_artifacts, registry_url=registry.url),
+        )
+        result = _release.release(
+            owner="energy-quants",
+            pyproject_file=project / "pyproject.toml",
+            output_path=project / "dist",
+        )
+
+    assert calls == ["version", "build"]
+    assert result.published == result.artifacts
+    manifest = registry.manifests["energy-quants/conda/example", "1.2.3.post001-abc"]
+    assert "example-1.2.3.post001+abc-py_0.conda" in manifest.decode()
+    assert list(result.timings.stages) == ["version", "render", "build", "publish"]
+    assert result.timings.stages["publish"].count == 1
+    assert "publish" in str(result.timings)
+
+
+def test_parse_matrix():
+    assert parse_matrix(["python=3.11,3.12", "build_number=0,1"]) == [
+        Variant(python="3.11", build_number=0),
+        Variant(python="3.11", build_number=1),
+        Variant(python="3.12", build_number=0),
+        Variant(python="3.12", build_number=1),
+    ]
+    assert parse_matrix([]) == [Variant()]
+    with pytest.raises(ValueError, match="Invalid matrix"):
+        parse_matrix(["numpy=2"])
+
+
+def test_build_matrix(project, monkeypatch):
+    # without `boa` on the path every build fails, after rendering its recipe
+    monkeypatch.setenv("PATH", str(project / "bin"))
+    variants = parse_matrix(["python=3.11,3.12"])
+
+    results = build_matrix(
+        variants,
+        output_path=project / "dist",
+        work_path=project / "matrix",
+        max_workers=2,
+        version="1.0",
+        use_cache=False,
+        debug=False,
+    )
+
+    assert [result.variant for result in results] == variants
+    for result in results:
+        assert result.error is not None
+        recipe_path = project / "matrix" / result.variant.name / "recipe"
+        assert "version: '1.0'" in (recipe_path / "recipe.yaml").read_text()
+        assert (recipe_path / "conda_build_config.yaml").read_text() == (
+            f'python:\n  - "{result.variant.python}"\n'
+        )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends(project, backend):
+    recipe_file = render_recipe(
+        version="1.0",
+        build_number=2,
+        backend=backend,
+    )
+    recipe = recipe_file.read_text()
+    assert "{{" not in recipe
+    assert "name: example" in recipe
+    assert "number: 2" in recipe
+    url_key = "home" if backend == "boa" else "homepage"
+    assert f"{url_key}: https://github.com/energy-quants/example" in recipe
+
+    config_file = recipe_file.parent / "conda_build_config.yaml"
+    cmd = BACKENDS[backend].command(
+        recipe_file,
+        project / "dist",
+        channels=["conda-forge"],
+        variant_config_file=config_file,
+    )
+    assert cmd[:2] == [backend, "build"]
+    if backend == "rattler-build":
+        assert cmd[-4:] == [
+            "--channel",
+            "conda-forge",
+            "--variant-config",
+            config_file.as_posix(),
+        ]
+    else:
+        env = BACKENDS[backend].env(channels=["conda-forge"])
+        assert env == {"CONDA_CHANNELS": "conda-forge"}
+
+
+def test_backend_without_command():
+    class Incomplete(Backend):
+        name = executable = "incomplete"
+
+    with pytest.raises(TypeError, match="command"):
+        Incomplete()
@@ -0,0 +1,128 @@
+import hatch_requirements_txt
+import pytest
+
+from eq.devtools.conda import (
+    _render,
+    find_pyproject_files,
+    render_recipe,
+    render_recipes,
+)
+
+
+PYPROJECT = """
+[project]
+name = "{name}"
+description = "An example."
+license = {{file = "LICENSE"}}
+urls = {{repository = "https://github.com/energy-quants/{name}"}}
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # a workspace, whose own `pyproject.toml` only configures tools
+    (tmp_path / "pyproject.toml").write_text("[tool.black]\n")
+    for name in ("alpha", "beta", "gamma"):
+        project = tmp_path / "packages" / name
+        (project / "requirements.d").mkdir(parents=True)
+        (project / "pyproject.toml").write_text(PYPROJECT.format(name=name))
+        (project / "requirements.d" / "run.txt").write_text(f"click\n{name}-core\n")
+    (tmp_path / ".build" / "copy").mkdir(parents=True)
+    (tmp_path / ".build" / "copy" / "pyproject.toml").write_text(PYPROJECT)
+
+    loaded = []
+
+    def load_requirements_files(files):
+        loaded.extend(files)
+        return load(files)
+
+    load = hatch_requirements_txt.load_requirements_files
+    monkeypatch.setattr(
+        hatch_requirements_txt,
+        "load_requirements_files",
+        load_requirements_files,
+    )
+    monkeypatch.setattr(_render, "_requirements_cache", {})
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path, loaded
+
+
+def test_render_recipes(workspace):
+    root, loaded = workspace
+    pyproject_files = find_pyproject_files(root)
+    assert pyproject_files == [
+        root / "packages" / name / "pyproject.toml"
+        for name in ("alpha", "beta", "gamma")
+    ]
+
+    recipe_files = render_recipes(pyproject_files, version="1.0", build_number=0)
+
+    assert recipe_files == [
+        path.parent / ".build" / "conda" / "recipe" / "recipe.yaml"
+        for path in pyproject_files
+    ]
+    assert "- beta-core" in recipe_files[1].read_text()
+    assert "- alpha-core" not in recipe_files[1].read_text()
+    assert len(loaded) == 3
+
+    # unchanged recipes aren't rewritten, nor the requirements parsed again
+    mtimes = [path.stat().st_mtime_ns for path in recipe_files]
+    render_recipes(pyproject_files, version="1.0", build_number=0)
+    assert [path.stat().st_mtime_ns for path in recipe_files] == mtimes
+    assert len(loaded) == 3
+
+    with pytest.raises(ValueError):
+        render_recipes(
+            pyproject_files,
+            version="1.0",
+            build_number=0,
+            output_path=root / "recipe.yaml",
+        )
+
+
+def test_requirements_cache(workspace):
+    root, loaded = workspace
+    project = root / "packages" / "alpha"
+    output_path = root / "recipe.yaml"
+    kwargs = dict(pyproject_file=project / "pyproject.toml", output_path=output_path)
+
+    render_recipe(version="1.0", build_number=0, **kwargs)
+    assert loaded == [(project / "requirements.d" / "run.txt").as_posix()]
+
+    # a new process reads the parsed requirements from the disk cache
+    _render._requirements_cache.clear()
+    render_recipe(version="1.0", build_number=0, **kwargs)
+    assert len(loaded) == 1
+
+    # which is keyed by the content of the file
+    (project / "requirements.d" / "run.txt").write_text("click >=8\n")
+    render_recipe(version="1.0", build_number=0, **kwargs)
+    assert len(loaded) == 2
+    assert "- click >=8" in output_path.read_text()
+
+
+def test_show_without_bat(workspace, monkeypatch, capsys):
+    root, _ = workspace
+    monkeypatch.setenv("PATH", str(root / "bin"))
+    files = find_pyproject_files(root)
+    recipe_files = render_recipes(files, version="1.0", build_number=0, show=True)
+    out = capsys.readouterr().out
+    for recipe_file in recipe_files:
+        assert f"# {recipe_file.as_posix()}\n" in out
+    assert out.count("name: ") == len(files)
+
+
+def test_show_with_debug(workspace, monkeypatch, capsys):
+    root, _ = workspace
+    monkeypatch.setenv("PATH", str(root / "bin"))
+    pyproject_file, *_ = find_pyproject_files(root)
+    # `debug` is a deprecated alias of `show`
+    with pytest.deprecated_call():
+        recipe_file = render_recipe(
+            version="1.0",
+            build_number=0,
+            pyproject_file=pyproject_file,
+            output_path=root / "recipe.yaml",
+            debug=True,
+        )
+    assert f"# {recipe_file.as_posix()}\n" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import os
+import time
+
+import pytest
+import trio
+
+from eq.devtools.github import packages as pkgs
+from eq.devtools.github.cache import ResponseCache
+from eq.devtools.github.client import Session
+from eq.devtools.github.tracing import (
+    set_tracer,
+    Tracer,
+)
+from eq.devtools.testing import FakeGitHub
+
+
+OWNER = "energy-quants"
+PACKAGE = "conda/eq-devtools"
+
+
+@pytest.fixture
+def github(github):
+    github.add_package(OWNER, PACKAGE, num_versions=1050)
+    return github
+
+
+def list_version_ids(
+    github: FakeGitHub,
+    cache: ResponseCache | None = None,
+    **kwargs,
+) -> list[int]:
+    async def main():
+        async with Session(
+            github_user="user",
+            github_token="token",
+            base_url=github.url,
+            cache=cache,
+        ) as session:
+            return await pkgs.list_package_versions(
+                OWNER,
+                PACKAGE,
+                session=session,
+                **kwargs,
+            )
+
+    return [version.id for version in trio.run(main)]
+
+
+@pytest.mark.parametrize("max_parallel_pages", [1, 4])
+@pytest.mark.parametrize("link_last", [True, False])
+def test_pagination(github, max_parallel_pages, link_last):
+    github.link_last = link_last
+    expected = [version["id"] for version in github.versions[OWNER, PACKAGE]]
+    ids = list_version_ids(github, max_parallel_pages=max_parallel_pages)
+    assert ids == expected
+
+
+def test_response_cache(github, tmp_path):
+    cache = ResponseCache(tmp_path)
+    expected = list_version_ids(github, cache=cache)
+    assert all(status == 200 for *_, status in github.requests)
+
+    github.requests.clear()
+    assert list_version_ids(github, cache=cache) == expected
+    assert github.requests
+    assert all(status == 304 for *_, status in github.requests)
+
+
+def test_response_cache_eviction(tmp_path):
+    cache = ResponseCache(tmp_path, max_size=3500)
+    headers = {"etag": '"etag"'}
+    for idx in range(3):
+        cache.put(f"/{idx}", token="token", headers=headers, content=b"x" * 1000)
+    # make `/0` the most recently used entry
+    for idx, filepath in enumerate(["/1", "/2", "/0"]):
+        filepath = cache._filepath(filepath, token="token")
+        os.utime(filepath, (idx, time.time() - 100 + idx))
+
+    cache.put("/3", token="token", headers=headers, content=b"x" * 1000)
+    assert cache.size() <= 3500
+    assert cache.get("/1", token="token") is None
+    assert cache.get("/0", token="token") is not None
+    assert cache.get("/3", token="token") is not None
+    assert cache.get("/3", token="other") is None
+
+
+def test_tracer(github, tmp_path):
+    async def main():
+        async with Session(
+            github_user="user",
+            github_token="token",
+            base_url=github.url,
+        ):
+            await pkgs.list_package_versions(OWNER, PACKAGE)
+
+    tracer = Tracer()
+    set_tracer(tracer)
+    try:
+        trio.run(main, instruments=[tracer])
+    finally:
+        set_tracer(None)
+
+    summary = tracer.summary()
+    assert summary.requests == len(github.requests) == 12
+    assert summary.by_url == {
+        "GET /orgs/{owner}/packages/container/{package}/versions": 11,
+        "GET /orgs/{owner}/packages/container/{package}": 1,
+    }
+    assert 0 < summary.p50 <= summary.p95 <= summary.p99
+    trace = tracer.chrome_trace()
+    events = trace["traceEvents"]
+    assert sum(event.get("cat") == "request" for event in events) == 12
@@ -0,0 +1,240 @@
+from datetime import date as Date
+from datetime import datetime as DateTime
+from datetime import timedelta as TimeDelta
+from functools import partial
+
+import pytest
+import trio
+
+from eq.devtools.github import packages as pkgs
+from eq.devtools.github.api import version_projection
+from eq.devtools.github.client import (
+    GitHubError,
+    Scheduler,
+    Session,
+)
+from eq.devtools.testing import FakeRegistry
+
+
+OWNER = "energy-quants"
+PACKAGE = "conda/eq-devtools"
+
+
+@pytest.fixture
+def github(github):
+    github.add_package(
+        OWNER,
+        PACKAGE,
+        num_versions=1050,
+        tags={0: ["latest"], 500: ["0.6.0"], 1000: ["0.1.0"], 1001: ["dev"]},
+        age=TimeDelta(days=20),
+    )
+    return github
+
+
+def age(version: dict) -> int:
+    return (Date.today() - DateTime.fromisoformat(version["updated_at"]).date()).days
+
+
+def test_cleanup_package_versions(github, run):
+    versions = list(github.versions[OWNER, PACKAGE])
+    results = run(
+        pkgs.cleanup_package_versions,
+        OWNER,
+        PACKAGE,
+        max_age=10,
+        max_parallel=8,
+    )
+    expected = {
+        version["id"]
+        for idx, version in enumerate(versions)
+        if idx not in (500, 1000) and age(version) > 10
+    }
+    assert 0 < len(expected) < len(versions)
+    assert all(result.ok for result in results)
+    assert {result.id for result in results} == expected
+    remaining = {version["id"] for version in github.versions[OWNER, PACKAGE]}
+    assert remaining == {version["id"] for version in versions} - expected
+
+
+def test_cleanup_package_versions_without_last_link(github, run):
+    # the versions can only be listed in order, which deletes mustn't shift
+    github.link_last = False
+    github.add_package(OWNER, "expired", num_versions=1000)
+    results = run(pkgs.cleanup_package_versions, OWNER, "expired", max_age=-1)
+    assert len(results) == 1000
+    assert all(result.ok for result in results)
+    assert not github.versions[OWNER, "expired"]
+
+
+def test_cleanup_package_versions_throttled(github):
+    github.add_package(OWNER, "throttled", num_versions=100)
+    github.latency = 0.05
+    github.max_concurrent = 4
+    github.retry_after = 0
+    scheduler = Scheduler(initial_concurrency=16)
+
+    async def main():
+        async with Session(
+            github_user="user",
+            github_token="token",
+            base_url=github.url,
+            scheduler=scheduler,
+        ):
+            return await pkgs.cleanup_package_versions(OWNER, "throttled", max_age=-1)
+
+    results = trio.run(main)
+    assert len(results) == 100
+    assert all(result.ok for result in results)
+    assert not github.versions[OWNER, "throttled"]
+    stats = scheduler.stats()
+    assert stats.throttled > 0
+    assert stats.requests == len(github.requests)
+
+
+def test_delete_package_versions_with_failures(github, run):
+    versions = run(pkgs.list_package_versions, OWNER, PACKAGE)
+    # a version which doesn't exist fails permanently
+    (result,) = run(pkgs.delete_package_version_ids, OWNER, PACKAGE, [1])
+    assert result.error.startswith("404")
+    assert result.attempts == 1
+
+    github.failure_rate = 0.2
+    ids = [version["id"] for version in github.versions[OWNER, PACKAGE]][:100]
+    results = run(
+        pkgs.delete_package_version_ids,
+        OWNER,
+        PACKAGE,
+        ids,
+        retries=10,
+    )
+    results = {result.id: result for result in results}
+    assert results.keys() == set(ids)
+    assert all(result.ok for result in results.values())
+    assert any(result.attempts > 1 for result in results.values())
+    assert len(github.versions[OWNER, PACKAGE]) == len(versions) - 100
+
+
+def test_delete_package_versions_with_lost_responses(github, run):
+    # the versions are deleted, but the responses of some of them fail
+    github.lost_response_rate = 0.2
+    ids = [version["id"] for version in github.versions[OWNER, PACKAGE]][:100]
+    results = run(pkgs.delete_package_version_ids, OWNER, PACKAGE, ids, retries=10)
+    assert all(result.ok for result in results)
+    assert any(result.attempts > 1 for result in results)
+    remaining = {version["id"] for version in github.versions[OWNER, PACKAGE]}
+    assert not remaining & set(ids)
+
+
+def test_cleanup_packages(github, run):
+    github.add_package(OWNER, "conda/eq-other", num_versions=20)
+    github.add_package(OWNER, "conda/other", repository=f"{OWNER}/other")
+    github.add_package(OWNER, "conda/other-2", repository=f"{OWNER}/other")
+    github.add_package(OWNER, "docker/eq-devtools", num_versions=20)
+    results = run(
+        pkgs.cleanup_packages,
+        OWNER,
+        repository=f"{OWNER}/eq-devtools",
+        name_regex=r"^conda/",
+        max_age=-1,
+    )
+    assert list(results) == [PACKAGE]
+    assert all(result.ok for result in results[PACKAGE])
+    assert len(github.versions[OWNER, PACKAGE]) == 3
+    assert len(github.versions[OWNER, "conda/eq-other"]) == 20
+    assert len(github.versions[OWNER, "docker/eq-devtools"]) == 20
+
+    results = run(pkgs.cleanup_packages, OWNER, max_age=-1)
+    assert list(results) == sorted(name for _, name in github.packages)
+    assert not github.versions[OWNER, "conda/eq-other"]
+
+
+def test_get_package_memo(github, run):
+    path = f"/orgs/{OWNER}/packages/container/conda%2Feq-devtools"
+
+    async def main():
+        for _ in range(2):
+            versions = await pkgs.list_package_versions(OWNER, PACKAGE)
+            assert all(version.package.name == PACKAGE for version in versions)
+        assert github.requests.count(("GET", path, 200)) == 1
+
+        await pkgs.delete_package_version(OWNER, PACKAGE, version_id=versions[-1].id)
+        package = await pkgs.get_package(OWNER, PACKAGE)
+        assert package.name == PACKAGE
+        assert github.requests.count(("GET", path, 200)) == 2
+
+    run(main)
+
+
+def test_list_package_versions_projection(github, run):
+    model = list[version_projection("id", "tags")]
+    versions = run(pkgs.list_package_versions, OWNER, PACKAGE, model=model)
+    expected = [
+        (version["id"], version["metadata"]["container"]["tags"])
+        for version in github.versions[OWNER, PACKAGE]
+    ]
+    assert [(version.id, version.tags) for version in versions] == expected
+    assert not hasattr(versions[0], "updated_at")
+
+
+def test_mirror_package(github, run, monkeypatch):
+    tags = ["1.2", "1.1", "1.0"]
+    github.add_package(
+        "staging",
+        "conda/mirrored",
+        num_versions=3,
+        tags={idx: [tag] for idx, tag in enumerate(tags)},
+    )
+    github.add_package(OWNER, "conda/mirrored", num_versions=1, tags={0: ["1.0"]})
+
+    with FakeRegistry(token="token") as registry:
+        for tag in tags:
+            registry.add_artifact("staging/conda/mirrored", tag, tag.encode() * 1000)
+        registry.add_artifact(f"{OWNER}/conda/mirrored", "1.0", b"1.0" * 1000)
+
+        results = run(
+            pkgs.mirror_package,
+            "staging",
+            "conda/mirrored",
+            to_owner=OWNER,
+            registry_url=registry.url,
+        )
+        assert [result.tag for result in results] == ["1.2", "1.1"]
+        assert all(result.ok for result in results)
+        # the config is already there and the layers are mounted, not copied
+        assert {(r.existing, r.mounted, r.copied) for r in results} == {(1, 1, 0)}
+        for tag in ("1.2", "1.1"):
+            manifest = registry.manifests["staging/conda/mirrored", tag]
+            assert registry.manifests[f"{OWNER}/conda/mirrored", tag] == manifest
+        assert not any(method == "PATCH" for method, *_ in registry.requests)
+
+        # all of the tags are copied to an owner without the package
+        results = run(
+            pkgs.mirror_package,
+            "staging",
+            "conda/mirrored",
+            to_owner="other",
+            registry_url=registry.url,
+            max_parallel=1,
+        )
+        assert [result.tag for result in results] == tags
+        assert all(result.ok for result in results)
+        # the config is only mounted by the first of them
+        assert sum(result.mounted for result in results) == 4
+        assert sum(result.existing for result in results) == 2
+
+        # a source package which doesn't exist isn't mirrored successfully, and
+        # the error isn't wrapped in the exception group of a nursery (as it
+        # would be by default from trio 0.25)
+        monkeypatch.setattr(
+            trio, "run", partial(trio.run, strict_exception_groups=True)
+        )
+        with pytest.raises(GitHubError, match="404") as exc_info:
+            run(
+                pkgs.mirror_package,
+                "staging",
+                "conda/typo",
+                to_owner=OWNER,
+                registry_url=registry.url,
+            )
+        assert exc_info.value.status == 404
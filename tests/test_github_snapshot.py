@@ -0,0 +1,122 @@
+from datetime import timedelta as TimeDelta
+
+import pytest
+
+from eq.devtools.github import packages as pkgs
+from eq.devtools.github.client import GitHubError
+from eq.devtools.github.snapshot import Snapshot
+
+
+OWNER = "energy-quants"
+PACKAGE = "conda/eq-devtools"
+
+
+@pytest.fixture
+def github(github):
+    github.add_package(
+        OWNER,
+        PACKAGE,
+        num_versions=1050,
+        tags={0: ["latest"], 500: ["0.6.0"], 1000: ["0.1.0"]},
+        age=TimeDelta(days=20),
+    )
+    return github
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    with Snapshot(tmp_path / "snapshot.sqlite") as snapshot:
+        yield snapshot
+
+
+def test_sync(github, run, snapshot):
+    versions = github.versions[OWNER, PACKAGE]
+    stats = run(snapshot.sync, OWNER, PACKAGE)
+    assert (stats.pages, stats.added, stats.deleted) == (11, 1050, 0)
+    ids = [version.id for version in snapshot.list_versions(OWNER, PACKAGE)]
+    assert ids == [version["id"] for version in versions]
+    assert snapshot.get_package(OWNER, PACKAGE).name == PACKAGE
+
+    # a new version is pushed and a recent one deleted
+    new_version = dict(versions[0], id=versions[0]["id"] + 1)
+    versions.insert(0, new_version)
+    deleted = versions.pop(50)
+    stats = run(snapshot.sync, OWNER, PACKAGE)
+    assert (stats.pages, stats.added, stats.deleted) == (2, 1, 1)
+    ids = [version.id for version in snapshot.list_versions(OWNER, PACKAGE)]
+    assert ids == [version["id"] for version in versions]
+    assert deleted["id"] not in ids
+
+    # deletions of older versions are only detected by a full sync
+    versions.pop(500)
+    stats = run(snapshot.sync, OWNER, PACKAGE)
+    assert (stats.pages, stats.deleted) == (1, 0)
+    stats = run(snapshot.sync, OWNER, PACKAGE, full=True)
+    assert (stats.pages, stats.deleted) == (11, 1)
+
+    tagged = snapshot.list_versions(OWNER, PACKAGE, tag="0.1.0")
+    assert [version.metadata.tags for version in tagged] == [["0.1.0"]]
+
+
+def test_cleanup_package_versions_with_snapshot(github, run, snapshot):
+    run(snapshot.sync, OWNER, PACKAGE)
+    # an older version is tagged, which an incremental sync doesn't see
+    retagged = github.versions[OWNER, PACKAGE][900]
+    retagged["metadata"]["container"]["tags"] = ["1.0.0"]
+    github.requests.clear()
+    results = run(
+        pkgs.cleanup_package_versions,
+        OWNER,
+        PACKAGE,
+        max_age=10,
+        snapshot=snapshot,
+    )
+    assert results and all(result.ok for result in results)
+    assert retagged["id"] not in {result.id for result in results}
+    assert retagged in github.versions[OWNER, PACKAGE]
+    num_gets = sum(method == "GET" for method, *_ in github.requests)
+    # the package, the first (unchanged) page of versions and each candidate
+    assert num_gets == 2 + len(results) + 1
+    ids = {version.id for version in snapshot.list_versions(OWNER, PACKAGE)}
+    assert ids == {version["id"] for version in github.versions[OWNER, PACKAGE]}
+
+
+def test_cleanup_package_versions_with_snapshot_failures(
+    github,
+    run,
+    snapshot,
+    monkeypatch,
+):
+    run(snapshot.sync, OWNER, PACKAGE)
+    versions = github.versions[OWNER, PACKAGE]
+    forbidden, flaky = versions[-1]["id"], versions[-2]["id"]
+    get_package_version = pkgs.get_package_version
+    failed = set()
+
+    async def _get_package_version(owner, package, *, version_id, **kwargs):
+        # one candidate can't be fetched again and another fails once
+        if version_id == forbidden:
+            raise GitHubError("403 Forbidden", status=403)
+        if version_id == flaky and version_id not in failed:
+            failed.add(version_id)
+            raise GitHubError("502 Bad Gateway", status=502)
+        return await get_package_version(
+            owner, package, version_id=version_id, **kwargs
+        )
+
+    monkeypatch.setattr(pkgs, "get_package_version", _get_package_version)
+    results = run(
+        pkgs.cleanup_package_versions,
+        OWNER,
+        PACKAGE,
+        max_age=10,
+        snapshot=snapshot,
+    )
+    results = {result.id: result for result in results}
+    result = results.pop(forbidden)
+    assert result.error.startswith("403") and result.attempts == 1
+    assert results[flaky].ok
+    assert results and all(result.ok for result in results.values())
+    ids = {version.id for version in snapshot.list_versions(OWNER, PACKAGE)}
+    assert ids == {version["id"] for version in versions}
+    assert forbidden in ids
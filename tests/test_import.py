@@ -1 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
 from eq import devtools
+
+
+# the cumulative time (in microseconds) allowed to import the CLI
+IMPORT_TIME_BUDGET = 200_000
+
+HEAVY_MODULES = (
+    "gidgethub",
+    "hatch_requirements_txt",
+    "httpx",
+    "msgspec",
+    "rich",
+    "ruamel.yaml",
+    "trio",
+    "tzlocal",
+    "wrapt",
+    "yarl",
+)
+
+
+def import_times(code: str) -> dict[str, int]:
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in res.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import eq.devtools.cli",
+        "from eq.devtools.cli import cli; cli(['--version'], standalone_mode=0)",
+        "from eq.devtools.cli import cli; cli(['conda', '--help'], standalone_mode=0)",
+    ],
+)
+def test_cli_import_time(code):
+    times = import_times(code)
+    assert not [module for module in HEAVY_MODULES if module in times]
+    assert times["eq.devtools.cli"] < IMPORT_TIME_BUDGET
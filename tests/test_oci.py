@@ -0,0 +1,136 @@
+import json
+from functools import partial
+
+import pytest
+import trio
+
+from eq.devtools.oci import (
+    bytes_digest,
+    copy_artifact,
+    Registry,
+    RegistryError,
+)
+from eq.devtools.testing import FakeRegistry
+
+
+CONTENT = bytes(range(256)) * 40
+
+
+async def _upload(registry: FakeRegistry, source, **kwargs) -> str:
+    async with Registry(registry.url, username="user", password="token") as client:
+        return await client.upload_blob("owner/blob", source, **kwargs)
+
+
+def _statuses(registry: FakeRegistry, method: str) -> list[int]:
+    return [status for method_, _, status in registry.requests if method_ == method]
+
+
+def test_upload_blob(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(CONTENT)
+    progress = []
+
+    with FakeRegistry(token="token") as registry:
+        digest = trio.run(
+            partial(
+                _upload,
+                registry,
+                path,
+                chunk_size=4096,
+                on_progress=lambda *args: progress.append(args),
+            )
+        )
+
+        assert digest == bytes_digest(CONTENT)
+        assert registry.blobs[digest] == CONTENT
+        assert progress == [(4096, 10240), (8192, 10240), (10240, 10240)]
+        assert _statuses(registry, "PATCH") == [202, 202, 202]
+        assert _statuses(registry, "PUT") == [201]
+
+        # the blob isn't uploaded again
+        registry.requests.clear()
+        trio.run(_upload, registry, CONTENT)
+        assert _statuses(registry, "HEAD") == [401, 200]
+        assert _statuses(registry, "POST") == []
+
+
+def test_upload_blob_resume():
+    # the first chunks are interrupted half way, and resumed from there
+    with FakeRegistry(interrupt=2) as registry:
+        digest = trio.run(
+            partial(_upload, registry, CONTENT, chunk_size=4096, backoff=0)
+        )
+        assert registry.blobs[digest] == CONTENT
+        assert _statuses(registry, "PATCH") == [500, 500, 202, 202]
+
+    with FakeRegistry(interrupt=10) as registry:
+        with pytest.raises(RegistryError) as exc_info:
+            trio.run(
+                partial(
+                    _upload,
+                    registry,
+                    CONTENT,
+                    chunk_size=4096,
+                    retries=2,
+                    backoff=0,
+                )
+            )
+        assert exc_info.value.status == 500
+        assert registry.blobs == {}
+
+
+async def _push(registry: FakeRegistry, path) -> tuple[str, set[str]]:
+    async with Registry(registry.url) as client:
+        digest = await client.push_artifact(
+            "owner/example",
+            "1.0",
+            path,
+            media_type="application/vnd.conda.package.v2",
+            chunk_size=100,
+        )
+        return digest, await client.layer_digests("owner/example", "1.0")
+
+
+def test_push_artifact(tmp_path):
+    path = tmp_path / "example-1.0-0.conda"
+    path.write_bytes(b"0" * 1024)
+
+    with FakeRegistry() as registry:
+        digest, layers = trio.run(_push, registry, path)
+
+        manifest = registry.manifests["owner/example", "1.0"]
+        assert registry.manifests["owner/example", digest] == manifest
+        (layer,) = json.loads(manifest)["layers"]
+        assert layers == {layer["digest"]}
+        assert layer["size"] == 1024
+        assert registry.blobs[layer["digest"]] == path.read_bytes()
+
+
+async def _copy(source: FakeRegistry, destination: FakeRegistry, repository: str):
+    async with Registry(source.url) as src, Registry(destination.url) as dst:
+        return await copy_artifact(
+            src,
+            "owner/example",
+            "1.0",
+            destination=dst,
+            destination_repository=repository,
+        )
+
+
+def test_copy_artifact():
+    with FakeRegistry(mount=False) as registry, FakeRegistry() as other:
+        digest = registry.add_artifact("owner/example", "1.0", CONTENT)
+        manifest = registry.manifests["owner/example", "1.0"]
+
+        # the registry doesn't allow mounts, so the blobs are copied
+        result = trio.run(_copy, registry, registry, "prod/example")
+        assert result.digest == digest
+        assert result.count("copied") == 2
+        assert registry.manifests["prod/example", "1.0"] == manifest
+        assert _statuses(registry, "DELETE") == [204, 204]
+
+        # and to another registry
+        result = trio.run(_copy, registry, other, "prod/example")
+        assert result.count("copied") == 2
+        assert other.manifests["prod/example", digest] == manifest
+        assert other.blobs == registry.blobs